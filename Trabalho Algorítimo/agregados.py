@@ -0,0 +1,126 @@
+"""
+Módulo agregados
+----------------
+Totais diários de vendas (tabelas ``venda_diaria``, ``venda_diaria_produto``
+e ``venda_diaria_cliente``).
+
+Os totais são mantidos de forma incremental, dentro da mesma transação que
+insere ou exclui a venda (``repository.inserir_venda`` /
+``repository.deletar_venda``), então relatórios por período somam poucas
+linhas por dia em vez de varrer todas as vendas. ``reconstruir()`` recalcula
+tudo a partir das vendas, caso os totais fiquem inconsistentes.
+
+Uso: ``python agregados.py`` reconstrói os totais.
+"""
+
+from datetime import date, datetime
+
+from db import get_conn
+
+_SQL_DIA = """
+    INSERT INTO venda_diaria (dia, qtd_vendas, receita, itens) VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE qtd_vendas = qtd_vendas + %s, receita = receita + %s, itens = itens + %s
+"""
+_SQL_PRODUTO = """
+    INSERT INTO venda_diaria_produto (dia, id_produto, quantidade, receita) VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE quantidade = quantidade + %s, receita = receita + %s
+"""
+_SQL_CLIENTE = """
+    INSERT INTO venda_diaria_cliente (dia, id_cliente, qtd_vendas, receita) VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE qtd_vendas = qtd_vendas + %s, receita = receita + %s
+"""
+
+# Recalculo completo (mesmos comandos da carga inicial da migração 004)
+_SQL_RECONSTRUIR = [
+    "DELETE FROM venda_diaria",
+    "DELETE FROM venda_diaria_produto",
+    "DELETE FROM venda_diaria_cliente",
+    """INSERT INTO venda_diaria (dia, qtd_vendas, receita, itens)
+       SELECT DATE(v.data_venda), COUNT(*), SUM(v.valor_total), COALESCE(SUM(i.itens), 0)
+       FROM venda v
+       LEFT JOIN (SELECT id_venda, SUM(quantidade) AS itens FROM produto_venda GROUP BY id_venda) i
+              ON i.id_venda = v.id_venda
+       WHERE v.data_venda IS NOT NULL
+       GROUP BY DATE(v.data_venda)""",
+    """INSERT INTO venda_diaria_produto (dia, id_produto, quantidade, receita)
+       SELECT DATE(v.data_venda), pv.id_produto, SUM(pv.quantidade), SUM(pv.subtotal)
+       FROM venda v
+       JOIN produto_venda pv ON pv.id_venda = v.id_venda
+       WHERE v.data_venda IS NOT NULL
+       GROUP BY DATE(v.data_venda), pv.id_produto""",
+    """INSERT INTO venda_diaria_cliente (dia, id_cliente, qtd_vendas, receita)
+       SELECT DATE(v.data_venda), v.id_cliente, COUNT(*), SUM(v.valor_total)
+       FROM venda v
+       WHERE v.data_venda IS NOT NULL AND v.id_cliente IS NOT NULL
+       GROUP BY DATE(v.data_venda), v.id_cliente""",
+]
+
+def como_dia(valor):
+    """Converte datetime/date/texto ISO ('2024-05-01 10:00:00') em ``date``."""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+def registrar_venda(cur, data_venda, id_cliente, valor_total, itens, sinal=1):
+    """
+    Soma (ou, com ``sinal=-1``, desconta) uma venda nos totais diários.
+
+    Deve ser chamada com o cursor da transação que grava/exclui a venda,
+    para os totais nunca divergirem das vendas.
+
+    Parameters
+    ----------
+    cur : cursor
+        Cursor da transação em andamento.
+    data_venda : datetime | date | str
+        Data da venda.
+    id_cliente : int | None
+        Cliente da venda (vendas sem cliente não entram no total por cliente).
+    valor_total : número
+        Valor total da venda.
+    itens : list[tuple]
+        Tuplas (id_produto, quantidade, subtotal).
+    sinal : int
+        1 ao incluir a venda, -1 ao excluí-la.
+    """
+    dia = como_dia(data_venda)
+    valor_total = valor_total * sinal
+
+    # Um produto pode aparecer em mais de um item da venda
+    por_produto = {}
+    for id_produto, qtd, subtotal in itens:
+        q, r = por_produto.get(id_produto, (0, 0))
+        por_produto[id_produto] = (q + qtd * sinal, r + subtotal * sinal)
+    qtd_itens = sum(q for q, _ in por_produto.values())
+
+    cur.execute(_SQL_DIA, (dia, sinal, valor_total, qtd_itens, sinal, valor_total, qtd_itens))
+    if por_produto:
+        cur.executemany(_SQL_PRODUTO, [(dia, id_produto, q, r, q, r)
+                                       for id_produto, (q, r) in sorted(por_produto.items())])
+    if id_cliente is not None:
+        cur.execute(_SQL_CLIENTE, (dia, id_cliente, sinal, valor_total, sinal, valor_total))
+
+def reconstruir():
+    """Recalcula todos os totais diários a partir das vendas."""
+    conn = get_conn()
+    cur = None
+    try:
+        conn.start_transaction()
+        cur = conn.cursor()
+        for comando in _SQL_RECONSTRUIR:
+            cur.execute(comando)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if cur is not None:
+            cur.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    reconstruir()
+    print("Totais diários de vendas reconstruídos.")
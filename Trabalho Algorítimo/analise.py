@@ -0,0 +1,345 @@
+"""
+Módulo analise
+--------------
+Análises de vendas calculadas com NumPy: curva ABC (Pareto) dos produtos
+por receita, ranking de produtos e clientes num período, margem bruta e
+sugestão de compra (ponto de pedido e estoque de segurança).
+
+Os dados vêm dos totais diários (``venda_diaria_produto`` e
+``venda_diaria_cliente``, ver ``agregados``), lidos em colunas (um array
+por campo, sem criar um dicionário por linha) e agregados com operações
+vetorizadas (``bincount``, ``argsort``, ``cumsum``). O custo de cada
+produto é o preço médio de compra das entradas (``entrada_produto``),
+ponderado pela quantidade; produtos sem entradas ficam sem margem.
+
+O NumPy é instalado à parte: ``pip install numpy``.
+"""
+
+from datetime import date, timedelta
+from statistics import NormalDist
+
+from db import get_conn
+import agregados
+
+# Participação acumulada na receita até onde vão as classes A e B
+LIMITES_ABC = (0.80, 0.95)
+
+# Reposição: dias de vendas usados na demanda, chance de não faltar no
+# prazo de entrega, dias de demanda que cada pedido cobre e prazo de
+# entrega (dias) quando não há histórico de entradas
+JANELA_DEMANDA = 90
+NIVEL_SERVICO = 0.95
+COBERTURA_DIAS = 30
+PRAZO_PADRAO = 7
+# Dias de entradas usados para estimar o prazo de cada fornecedor
+HISTORICO_ENTRADAS = 365
+# Linhas lidas do banco por vez
+TAMANHO_LOTE = 50000
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError("As análises precisam do pacote numpy (pip install numpy).")
+    return numpy
+
+def _colunas(sql, params, tipos):
+    """
+    Lê o resultado de uma consulta como colunas NumPy.
+
+    Parameters
+    ----------
+    tipos : tuple
+        dtype de cada coluna do SELECT (ex: ``(int, float)``).
+
+    Returns
+    -------
+    list[numpy.ndarray]
+    """
+    np = _numpy()
+    partes = [[] for _ in tipos]
+    conn = get_conn()
+    cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        while True:
+            linhas = cur.fetchmany(TAMANHO_LOTE)
+            if not linhas:
+                break
+            for parte, coluna, tipo in zip(partes, zip(*linhas), tipos):
+                parte.append(np.array(coluna, dtype=tipo))
+    finally:
+        cur.close()
+        conn.close()
+    return [np.concatenate(p) if p else np.empty(0, dtype=t) for p, t in zip(partes, tipos)]
+
+def _somar_por_id(ids, *valores):
+    """Soma cada coluna de ``valores`` por id. Retorna (ids únicos, somas...)."""
+    np = _numpy()
+    unicos, posicao = np.unique(ids, return_inverse=True)
+    return (unicos,) + tuple(np.bincount(posicao, weights=v, minlength=len(unicos)) for v in valores)
+
+def _periodo(data_inicio, data_fim):
+    return agregados.como_dia(data_inicio), agregados.como_dia(data_fim)
+
+def _nomes(tabela, coluna_id, ids):
+    """Nome de cada id (só dos pedidos, em lotes)."""
+    nomes = {}
+    ids = [int(i) for i in ids]
+    conn = get_conn()
+    cur = conn.cursor()
+    try:
+        for i in range(0, len(ids), 1000):
+            lote = ids[i:i + 1000]
+            cur.execute(f"SELECT {coluna_id}, nome FROM {tabela} WHERE {coluna_id} IN ({','.join(['%s'] * len(lote))})",
+                        tuple(lote))
+            nomes.update(cur.fetchall())
+    finally:
+        cur.close()
+        conn.close()
+    return nomes
+
+def classificar_abc(receita, limites=LIMITES_ABC):
+    """
+    Classe ABC de cada valor, já ordenados do maior para o menor.
+
+    Um item é A enquanto a receita acumulada *antes* dele não passa de
+    ``limites[0]`` do total (assim o item que cruza os 80% ainda é A),
+    B até ``limites[1]`` e C no resto.
+
+    Returns
+    -------
+    numpy.ndarray
+        Array de "A"/"B"/"C".
+    """
+    np = _numpy()
+    total = receita.sum()
+    if total <= 0:
+        return np.full(len(receita), "C")
+    antes = (np.cumsum(receita) - receita) / total
+    return np.array(["A", "B", "C"])[np.searchsorted(np.asarray(limites), antes, side="left")]
+
+def curva_abc(data_inicio, data_fim):
+    """
+    Produtos vendidos no período, do de maior para o de menor receita.
+
+    Returns
+    -------
+    dict[str, numpy.ndarray]
+        Colunas ``id_produto``, ``quantidade``, ``receita``, ``participacao``
+        e ``acumulado`` (frações da receita), ``classe`` (A/B/C), ``custo``
+        e ``margem`` (NaN sem preço de compra) e ``margem_pct``.
+    """
+    np = _numpy()
+    de, ate = _periodo(data_inicio, data_fim)
+    ids, qtd, receita = _colunas(
+        "SELECT id_produto, quantidade, receita FROM venda_diaria_produto WHERE dia >= %s AND dia <= %s",
+        (de, ate), (np.int64, np.float64, np.float64))
+    ids, qtd, receita = _somar_por_id(ids, qtd, receita)
+
+    ordem = np.argsort(-receita, kind="stable")
+    ids, qtd, receita = ids[ordem], qtd[ordem], receita[ordem]
+    total = receita.sum()
+    participacao = receita / total if total else np.zeros_like(receita)
+
+    # Custo médio de compra (ponderado) das entradas até o fim do período
+    ids_custo, qtd_compra, valor_compra = _colunas(
+        """SELECT id_produto, quantidade, quantidade * preco_compra FROM entrada_produto
+           WHERE preco_compra IS NOT NULL AND quantidade > 0 AND data_entrada < %s""",
+        (ate + timedelta(days=1),), (np.int64, np.float64, np.float64))
+    custo_unit = np.full(len(ids), np.nan)
+    if len(ids_custo):
+        ids_custo, qtd_compra, valor_compra = _somar_por_id(ids_custo, qtd_compra, valor_compra)
+        pos = np.searchsorted(ids_custo, ids)
+        pos = np.minimum(pos, len(ids_custo) - 1)
+        tem = ids_custo[pos] == ids
+        custo_unit[tem] = valor_compra[pos[tem]] / qtd_compra[pos[tem]]
+    custo = qtd * custo_unit
+    margem = receita - custo
+    with np.errstate(divide="ignore", invalid="ignore"):
+        margem_pct = np.where(receita > 0, margem / receita, np.nan)
+
+    return {
+        "id_produto": ids, "quantidade": qtd.astype(np.int64), "receita": receita,
+        "participacao": participacao, "acumulado": np.cumsum(participacao),
+        "classe": classificar_abc(receita), "custo": custo, "margem": margem, "margem_pct": margem_pct,
+    }
+
+def top_clientes(data_inicio, data_fim, n=10):
+    """
+    Os ``n`` clientes que mais compraram no período.
+
+    Returns
+    -------
+    dict[str, numpy.ndarray]
+        Colunas ``id_cliente``, ``qtd_vendas``, ``receita`` e ``participacao``.
+    """
+    np = _numpy()
+    de, ate = _periodo(data_inicio, data_fim)
+    ids, vendas, receita = _colunas(
+        "SELECT id_cliente, qtd_vendas, receita FROM venda_diaria_cliente WHERE dia >= %s AND dia <= %s",
+        (de, ate), (np.int64, np.float64, np.float64))
+    ids, vendas, receita = _somar_por_id(ids, vendas, receita)
+    total = receita.sum()
+    # argpartition separa os n maiores sem ordenar tudo
+    if n < len(receita):
+        melhores = np.argpartition(-receita, n)[:n]
+    else:
+        melhores = np.arange(len(receita))
+    melhores = melhores[np.argsort(-receita[melhores], kind="stable")]
+    return {
+        "id_cliente": ids[melhores], "qtd_vendas": vendas[melhores].astype(np.int64),
+        "receita": receita[melhores], "participacao": receita[melhores] / total if total else receita[melhores] * 0,
+    }
+
+# region Reposição
+def _prazos(ids_produto, fornecedor, hoje):
+    """
+    Prazo de reposição (dias) de cada produto, estimado pelo intervalo
+    médio entre entregas (``entrada_produto`` não guarda a data do
+    pedido): do próprio produto, senão a média do fornecedor, senão
+    ``PRAZO_PADRAO``.
+    """
+    np = _numpy()
+    ids, dias = _colunas(
+        "SELECT id_produto, DATE(data_entrada) FROM entrada_produto WHERE data_entrada >= %s",
+        (hoje - timedelta(days=HISTORICO_ENTRADAS),), (np.int64, "datetime64[D]"))
+    prazo = np.full(len(ids_produto), np.nan)
+    if len(ids):
+        # Entregas de cada produto em ordem; intervalos entre dias diferentes do mesmo produto
+        ordem = np.lexsort((dias, ids))
+        ids, dias = ids[ordem], dias[ordem].astype(np.int64)
+        intervalo = np.diff(dias)
+        valido = (ids[1:] == ids[:-1]) & (intervalo > 0)
+        if valido.any():
+            com_prazo, soma, qtd = _somar_por_id(ids[1:][valido], intervalo[valido].astype(float),
+                                                 np.ones(valido.sum()))
+            pos = np.minimum(np.searchsorted(ids_produto, com_prazo), len(ids_produto) - 1)
+            existe = ids_produto[pos] == com_prazo
+            prazo[pos[existe]] = (soma / qtd)[existe]
+
+    # Sem intervalo próprio: média dos produtos do mesmo fornecedor
+    sem_prazo = np.isnan(prazo)
+    conhecido = ~sem_prazo & (fornecedor >= 0)
+    if conhecido.any() and sem_prazo.any():
+        forn, soma, qtd = _somar_por_id(fornecedor[conhecido], prazo[conhecido], np.ones(conhecido.sum()))
+        pos = np.minimum(np.searchsorted(forn, fornecedor), len(forn) - 1)
+        usa = sem_prazo & (forn[pos] == fornecedor)
+        prazo[usa] = (soma / qtd)[pos[usa]]
+    prazo[np.isnan(prazo)] = PRAZO_PADRAO
+    return prazo
+
+def reposicao(hoje=None, janela=JANELA_DEMANDA, nivel_servico=NIVEL_SERVICO, cobertura=COBERTURA_DIAS):
+    """
+    Ponto de pedido e quantidade sugerida de compra de todos os produtos.
+
+    A demanda diária (média e desvio, contando os dias sem venda como
+    zero) vem de ``venda_diaria_produto`` nos últimos ``janela`` dias.
+    Com o prazo de reposição L (``_prazos``):
+
+    - estoque de segurança = z x desvio x raiz(L), z do ``nivel_servico``;
+    - ponto de pedido = média x L + segurança (no mínimo o estoque mínimo
+      cadastrado);
+    - ao atingir o ponto de pedido, sugere comprar até ponto de pedido +
+      ``cobertura`` dias de demanda.
+
+    Returns
+    -------
+    dict[str, numpy.ndarray]
+        Uma posição por produto, ordenadas por fornecedor: ``id_produto``,
+        ``id_fornecedor`` (-1 sem fornecedor), ``estoque``, ``demanda_media``,
+        ``demanda_desvio``, ``prazo``, ``seguranca``, ``ponto_pedido`` e
+        ``sugestao`` (0 se ainda não precisa comprar).
+    """
+    np = _numpy()
+    if janela < 1:
+        raise ValueError("A janela de demanda precisa ter ao menos 1 dia.")
+    hoje = agregados.como_dia(hoje or date.today())
+    inicio = hoje - timedelta(days=janela - 1)
+
+    ids, estoque, minimo, fornecedor = _colunas(
+        """SELECT id_produto, quantidade, COALESCE(estoque_minimo, 0), COALESCE(id_fornecedor, -1)
+           FROM produto ORDER BY id_produto""",
+        (), (np.int64, np.float64, np.float64, np.int64))
+
+    # Soma e soma dos quadrados das vendas diárias de cada produto
+    vendidos, qtd = _colunas(
+        "SELECT id_produto, quantidade FROM venda_diaria_produto WHERE dia >= %s AND dia <= %s",
+        (inicio, hoje), (np.int64, np.float64))
+    soma = np.zeros(len(ids))
+    soma_quadrados = np.zeros(len(ids))
+    if len(vendidos):
+        pos = np.minimum(np.searchsorted(ids, vendidos), len(ids) - 1)
+        existe = ids[pos] == vendidos # produtos excluídos ainda aparecem nos agregados
+        soma = np.bincount(pos[existe], weights=qtd[existe], minlength=len(ids))
+        soma_quadrados = np.bincount(pos[existe], weights=qtd[existe] ** 2, minlength=len(ids))
+    media = soma / janela
+    desvio = np.sqrt(np.maximum(soma_quadrados / janela - media ** 2, 0))
+
+    prazo = _prazos(ids, fornecedor, hoje)
+    z = NormalDist().inv_cdf(nivel_servico)
+    seguranca = np.ceil(z * desvio * np.sqrt(prazo))
+    ponto_pedido = np.maximum(np.ceil(media * prazo) + seguranca, minimo)
+    alvo = ponto_pedido + np.ceil(media * cobertura)
+    sugestao = np.where(estoque <= ponto_pedido, np.maximum(alvo - estoque, 0), 0)
+
+    ordem = np.lexsort((ids, fornecedor))
+    return {
+        "id_produto": ids[ordem], "id_fornecedor": fornecedor[ordem], "estoque": estoque[ordem].astype(np.int64),
+        "demanda_media": media[ordem], "demanda_desvio": desvio[ordem], "prazo": prazo[ordem],
+        "seguranca": seguranca[ordem].astype(np.int64), "ponto_pedido": ponto_pedido[ordem].astype(np.int64),
+        "sugestao": sugestao[ordem].astype(np.int64),
+    }
+#endregion
+
+# region Linhas para relatórios
+# Frações que viram porcentagem nas linhas
+_PERCENTUAIS = ("participacao", "acumulado", "margem_pct")
+
+def _linhas(colunas):
+    """Converte colunas NumPy em dicionários (para relatórios/exportação)."""
+    np = _numpy()
+    colunas = {n: (v * 100 if n in _PERCENTUAIS else v) for n, v in colunas.items()}
+    nomes = list(colunas)
+    nulos = {n: np.isnan(v).tolist() for n, v in colunas.items() if v.dtype.kind == "f"}
+    for i, valores in enumerate(zip(*(colunas[n].tolist() for n in nomes))):
+        row = dict(zip(nomes, valores))
+        for n, nulo in nulos.items():
+            if nulo[i]: # NaN: sem preço de compra
+                row[n] = None
+        yield row
+
+def iterar_curva_abc(data_inicio, data_fim):
+    """Linhas da curva ABC com o nome do produto (frações em %, sem custo = None)."""
+    np = _numpy()
+    colunas = curva_abc(data_inicio, data_fim)
+    nomes = _nomes("produto", "id_produto", colunas["id_produto"])
+    colunas["posicao"] = np.arange(1, len(colunas["id_produto"]) + 1)
+    for row in _linhas(colunas):
+        row["nome"] = nomes.get(row["id_produto"], f"Produto {row['id_produto']}")
+        yield row
+
+def iterar_reposicao(hoje=None, janela=JANELA_DEMANDA):
+    """Só os produtos com compra sugerida, agrupados por fornecedor, com os nomes."""
+    np = _numpy()
+    colunas = reposicao(hoje, janela)
+    comprar = colunas["sugestao"] > 0
+    colunas = {n: v[comprar] for n, v in colunas.items()}
+    produtos = _nomes("produto", "id_produto", colunas["id_produto"])
+    fornecedores = _nomes("fornecedor", "id_fornecedor", np.unique(colunas["id_fornecedor"]))
+    for row in _linhas(colunas):
+        row["nome"] = produtos.get(row["id_produto"], f"Produto {row['id_produto']}")
+        row["fornecedor"] = fornecedores.get(row["id_fornecedor"], "(sem fornecedor)")
+        if row["id_fornecedor"] < 0:
+            row["id_fornecedor"] = None
+        yield row
+
+def iterar_top_clientes(data_inicio, data_fim, n=10):
+    colunas = top_clientes(data_inicio, data_fim, n)
+    nomes = _nomes("cliente", "id_cliente", colunas["id_cliente"])
+    for posicao, row in enumerate(_linhas(colunas), start=1):
+        row["posicao"] = posicao
+        row["nome"] = nomes.get(row["id_cliente"], f"Cliente {row['id_cliente']}")
+        yield row
+#endregion
@@ -3,23 +3,323 @@
 """
 
 Ponto de entrada principal do sistema da distribuidora.
+
+Sem argumentos abre a interface gráfica. Com um comando roda sem tela
+(ex: relatórios noturnos pelo cron em servidores sem display):
+
+    python app.py report periodo --de 2025-01-01 --ate 2025-01-31
+    python app.py report abc --de 2025-01-01 --ate 2025-03-31
+    python app.py export top-clientes --de 2025-01-01 -n 20 --saida top.csv
+    python app.py estoque-baixo
+    python app.py export reposicao --saida compras.xlsx
+    python app.py entrada nota.csv --fornecedor 3
+    python app.py report estoque-em --data 2025-01-31 --produto 7
+    python app.py fechar-estoque
+    python app.py enviar-pendentes
+    python app.py export cliente 12 --saida cliente12.xlsx
+    python app.py seed --perfil pequeno
+    python app.py migrar
+    python app.py --profile-startup
+
+O tkinter e o tkcalendar só são importados quando a interface abre.
 """
 
-import tkinter as tk
-from ui_main import App
+import time
+_INICIO = time.perf_counter()
+
+import argparse
+import sys
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime
+
+import db
+import migracoes
+
+_FIM_IMPORTACAO = time.perf_counter()
+
+
+def _data(texto):
+    """Aceita datas como 2025-01-31 ou 31/01/2025."""
+    for formato in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"data inválida: {texto} (use AAAA-MM-DD ou DD/MM/AAAA)")
+
+def _relatorio(args):
+    """Monta o relatório escolhido na linha de comando."""
+    import relatorios
+    if args.relatorio == "periodo":
+        return relatorios.vendas_periodo(args.de, args.ate or date.today())
+    if args.relatorio == "abc":
+        return relatorios.curva_abc(args.de, args.ate or date.today())
+    if args.relatorio == "top-clientes":
+        return relatorios.top_clientes(args.de, args.ate or date.today(), args.n)
+    if args.relatorio == "reposicao":
+        return relatorios.reposicao(args.dias) if args.dias is not None else relatorios.reposicao()
+    if args.relatorio == "estoque-em":
+        return relatorios.estoque_em(args.data, args.produto)
+    if args.relatorio == "divergencias":
+        return relatorios.divergencias_estoque()
+    if args.relatorio == "vendas-offline":
+        return relatorios.vendas_offline()
+    if args.relatorio == "cliente":
+        return relatorios.historico_cliente(args.id)
+    if args.relatorio == "produto":
+        return relatorios.historico_produto(args.id)
+    return relatorios.estoque_baixo()
+
+def _argumentos_relatorio(parser, comuns=()):
+    """Subcomandos de relatório; ``comuns`` são parsers com opções aceitas por todos."""
+    sub = parser.add_subparsers(dest="relatorio", required=True, metavar="RELATORIO")
+    p = sub.add_parser("periodo", help="vendas de um período", parents=comuns)
+    p.add_argument("--de", type=_data, required=True, help="data inicial")
+    p.add_argument("--ate", type=_data, help="data final (padrão: hoje)")
+    p = sub.add_parser("abc", help="curva ABC dos produtos por receita, com margem (requer numpy)", parents=comuns)
+    p.add_argument("--de", type=_data, required=True, help="data inicial")
+    p.add_argument("--ate", type=_data, help="data final (padrão: hoje)")
+    p = sub.add_parser("top-clientes", help="clientes que mais compraram no período (requer numpy)", parents=comuns)
+    p.add_argument("--de", type=_data, required=True, help="data inicial")
+    p.add_argument("--ate", type=_data, help="data final (padrão: hoje)")
+    p.add_argument("-n", type=int, default=10, help="quantidade de clientes (padrão: 10)")
+    p = sub.add_parser("reposicao", help="sugestão de compra por fornecedor (ponto de pedido, requer numpy)",
+                       parents=comuns)
+    p.add_argument("--dias", type=int, help="dias de vendas usados na demanda (padrão: 90)")
+    p = sub.add_parser("estoque-em", help="estoque de cada produto no fim de uma data", parents=comuns)
+    p.add_argument("--data", type=_data, required=True, help="data")
+    p.add_argument("--produto", type=int, help="só este produto")
+    sub.add_parser("divergencias", help="produtos com estoque diferente do livro de movimentações",
+                   parents=comuns)
+    sub.add_parser("vendas-offline", help="vendas do diário local ainda não enviadas (pendentes e conflitos)",
+                   parents=comuns)
+    sub.add_parser("cliente", help="histórico de compras de um cliente", parents=comuns).add_argument("id", type=int)
+    sub.add_parser("produto", help="histórico de vendas de um produto", parents=comuns).add_argument("id", type=int)
+    sub.add_parser("estoque-baixo", help="produtos no estoque mínimo ou abaixo", parents=comuns)
+    return sub
+
+class _PerfilInicio:
+    """
+    Tempos da inicialização da interface (``--profile-startup``).
+
+    Cada etapa é registrada com sua duração; ao final (todas as abas
+    carregadas) o relatório vai para a saída de erro e a janela fecha.
+    """
+
+    def __init__(self):
+        self.etapas = [("importação (db, migrações)", _FIM_IMPORTACAO - _INICIO, "")]
+        self.ao_concluir = None
+
+    @contextmanager
+    def medir(self, etapa):
+        inicio = time.perf_counter()
+        yield
+        self.registrar(etapa, time.perf_counter() - inicio)
+
+    def registrar(self, etapa, segundos, detalhe=""):
+        """``segundos`` None = tempo desde o início do processo."""
+        if segundos is None:
+            segundos, detalhe = time.perf_counter() - _INICIO, detalhe or "desde o início"
+        self.etapas.append((etapa, segundos, detalhe))
+
+    def concluir(self):
+        self.registrar("tudo carregado", None)
+        print("Perfil da inicialização:", file=sys.stderr)
+        for etapa, segundos, detalhe in self.etapas:
+            extra = f"  ({detalhe})" if detalhe else ""
+            print(f"  {etapa:<32}{segundos * 1000:10.1f} ms{extra}", file=sys.stderr)
+        if self.ao_concluir:
+            self.ao_concluir()
+
+def _medir(perfil, etapa):
+    return perfil.medir(etapa) if perfil else nullcontext()
+
+# region Comandos
+def cmd_gui(args):
+    perfil = _PerfilInicio() if args.profile_startup else None
+    with _medir(perfil, "importação (tkinter, interface)"):
+        import tkinter as tk
+        from tkinter import messagebox
+        from ui_main import App
 
-if __name__ == "__main__":
     root = tk.Tk()
-    app = App(root)
+    try:
+        with _medir(perfil, "conexão com o banco"):
+            db.iniciar_backend() # Abre as conexões do banco antes de montar a tela
+        with _medir(perfil, "verificação das migrações"):
+            migracoes.verificar_atualizado()
+    except migracoes.MigracaoPendenteError as e:
+        root.withdraw()
+        messagebox.showerror("Banco desatualizado", str(e))
+        return 1
+    except Exception as e:
+        if not db.servidor_indisponivel(e):
+            raise
+        # Abre com as grades do cache local; as vendas ficam no diário até o banco voltar
+        messagebox.showwarning("Sem conexão", f"Não foi possível conectar ao banco:\n{e}\n\n"
+                               "O sistema abre com os dados da última sessão e as vendas "
+                               "ficam guardadas neste caixa até o banco voltar.")
+    with _medir(perfil, "montagem da janela"):
+        app = App(root, perfil=perfil)
+    if perfil:
+        perfil.ao_concluir = app.fechar
     root.geometry("900x600")
     root.mainloop()
+    return 0
+
+def cmd_report(args):
+    import relatorios
+    relatorios.escrever_texto(_relatorio(args), sys.stdout)
+    return 0
+
+def cmd_estoque_baixo(args):
+    args.relatorio = "estoque-baixo"
+    return cmd_report(args)
+
+def cmd_export(args):
+    import exportacao
+    rel = _relatorio(args)
+    progresso = None
+    if args.progresso:
+        progresso = lambda n: print(f"{n} linhas...", file=sys.stderr)
+    total = exportacao.exportar(rel.linhas(), rel.colunas, args.saida, progresso=progresso, titulo=rel.titulo)
+    print(f"{total} linhas exportadas para {args.saida}", file=sys.stderr)
+    return 0
+
+def cmd_entrada(args):
+    import importacao
+    import repository as repo
+    entrada = repo.registrar_entrada(importacao.ler_entrada_csv(args.arquivo), args.fornecedor)
+    print(f"Entrada registrada: {entrada['linhas']} linhas, {len(entrada['produtos'])} produtos, "
+          f"{entrada['quantidade']} unidades, R$ {entrada['valor']:.2f}")
+    return 0
+
+def cmd_fechar_estoque(args):
+    import movimentos
+    fechados = movimentos.fechar(args.data)
+    if fechados is None:
+        print("Já existe fechamento nesse instante ou depois.")
+    elif fechados:
+        print(f"Estoque de {fechados} produtos fechado.")
+    else:
+        print("Nada a fechar: nenhum produto com movimentação até esse instante.")
+    return 0
+
+def cmd_enviar_pendentes(args):
+    import diario_vendas
+    total, conflitos = 0, 0
+    while True:
+        resultado = diario_vendas.reenviar()
+        total += len(resultado["enviadas"])
+        for venda in resultado["conflitos"]:
+            conflitos += 1
+            print(f"Conflito na venda {venda['chave']} ({venda['criada_em']}): {venda['erro']}", file=sys.stderr)
+        if not resultado["enviadas"] and not resultado["conflitos"]:
+            break
+    print(f"{total} vendas enviadas, {conflitos} com conflito, {resultado['pendentes']} pendentes.")
+    # Pendentes que sobraram: o banco não respondeu
+    return 1 if resultado["pendentes"] else 0
+
+def cmd_seed(args):
+    import gerador_dados
+    gerador_dados.gerar(gerador_dados.volumes_dos_argumentos(args), semente=args.semente, log=print)
+    return 0
+
+def cmd_migrar(args):
+    feitas = migracoes.aplicar_pendentes(log=print)
+    if not feitas:
+        print("O banco de dados já está atualizado.")
+    return 0
+
+def cmd_reconstruir_agregados(args):
+    import agregados
+    agregados.reconstruir()
+    print("Totais diários de vendas reconstruídos.")
+    return 0
+#endregion
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Sistema da distribuidora.")
+    parser.add_argument("--backend", choices=["mysql", "sqlite"],
+                        help="banco a usar (padrão: DB_BACKEND do .env)")
+    parser.add_argument("--sqlite-caminho", help="arquivo do banco SQLite (padrão: SQLITE_PATH do .env)")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="abre a interface, mede a inicialização (importações, conexão, cada aba), "
+                             "imprime os tempos na saída de erro e fecha")
+    sub = parser.add_subparsers(dest="comando", metavar="COMANDO")
+
+    sub.add_parser("gui", help="abre a interface gráfica (padrão)").set_defaults(func=cmd_gui)
+
+    p = sub.add_parser("report", help="imprime um relatório na saída padrão")
+    _argumentos_relatorio(p)
+    p.set_defaults(func=cmd_report)
+
+    sub.add_parser("estoque-baixo", help="atalho para 'report estoque-baixo'").set_defaults(func=cmd_estoque_baixo)
+
+    opcoes_export = argparse.ArgumentParser(add_help=False)
+    opcoes_export.add_argument("--saida", required=True, help="arquivo de destino (.csv ou .xlsx)")
+    opcoes_export.add_argument("--progresso", action="store_true", help="mostra o andamento na saída de erro")
+    p = sub.add_parser("export", help="exporta um relatório para CSV ou XLSX")
+    _argumentos_relatorio(p, [opcoes_export])
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("entrada", help="registra uma entrada de mercadorias a partir de um CSV "
+                                       "(id_produto;quantidade;preco_compra)")
+    p.add_argument("arquivo", help="arquivo CSV da nota")
+    p.add_argument("--fornecedor", type=int, help="id do fornecedor da entrega")
+    p.set_defaults(func=cmd_entrada)
+
+    p = sub.add_parser("fechar-estoque", help="grava o saldo de todos os produtos (rodar todas as noites)")
+    p.add_argument("--data", type=_data, help="fecha o estoque na meia-noite que inicia essa data (padrão: agora)")
+    p.set_defaults(func=cmd_fechar_estoque)
+
+    sub.add_parser("enviar-pendentes", help="envia ao banco as vendas guardadas no diário local deste caixa",
+                   ).set_defaults(func=cmd_enviar_pendentes)
+
+    import gerador_dados
+    p = sub.add_parser("seed", help="popula o banco com dados sintéticos")
+    gerador_dados.argumentos_volumes(p)
+    p.set_defaults(func=cmd_seed)
+
+    sub.add_parser("migrar", help="aplica as migrações pendentes").set_defaults(func=cmd_migrar)
+    sub.add_parser("reconstruir-agregados", help="recalcula os totais diários de vendas").set_defaults(
+        func=cmd_reconstruir_agregados)
+    return parser
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    if args.backend or args.sqlite_caminho:
+        # --sqlite-caminho sozinho já implica o backend SQLite
+        opcoes = {"caminho": args.sqlite_caminho} if args.sqlite_caminho else {}
+        db.configurar_backend(args.backend or ("sqlite" if args.sqlite_caminho else None), **opcoes)
+
+    func = getattr(args, "func", cmd_gui)
+    if func in (cmd_gui, cmd_migrar):
+        return func(args)
+
+    # Comandos sem tela: erro vai para a saída de erro, com código de saída != 0 (cron)
+    try:
+        db.iniciar_backend()
+        migracoes.verificar_atualizado()
+        return func(args)
+    except BrokenPipeError:
+        return 0
+    except Exception as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.get_backend().fechar()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
 
 """
-PARA TELA MAXIMIZADA: 
+PARA TELA MAXIMIZADA:
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = App(root)
     root.state('zoomed')  # Janela maximizada
     root.mainloop()
-    """
\ No newline at end of file
+    """
@@ -0,0 +1,311 @@
+"""
+Módulo benchmark
+----------------
+Micro-benchmark das funções do ``repository``.
+
+Popula o banco com dados sintéticos (``gerador_dados``), roda cada função
+com aquecimento e repetições e gera um JSON com latência (p50/p95/p99),
+linhas por segundo e pico de memória de cada uma. Dois JSONs podem ser
+comparados para achar regressões antes de uma versão ir para as lojas.
+
+Uso:
+    python benchmark.py --perfil pequeno --saida base.json
+    python benchmark.py --perfil pequeno --comparar base.json
+
+Por padrão usa um banco SQLite em memória; ``--backend mysql`` usa o
+banco do .env (de preferência um banco só para benchmark).
+
+As funções ``iterar_*`` entregam as linhas aos poucos: o caso consome o
+iterador inteiro dentro da medição (senão só a criação do gerador seria
+medida). Ficam de fora as funções de cadastro (``inserir_*``,
+``atualizar_*``, ``excluir_*`` de produtos, pessoas e endereços), que não
+estão no caminho crítico das lojas; as escritas medidas são a venda e a
+entrada de mercadorias (``ESCRITA``).
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import db
+import gerador_dados
+
+
+def _ids(tabela, coluna):
+    return [row[coluna] for row in db.fetchall(f"SELECT {coluna} FROM {tabela}")]
+
+def contexto_do_banco():
+    """Ids já existentes no banco (quando os dados não foram gerados agora)."""
+    fim = datetime.now()
+    return {
+        "clientes": _ids("cliente", "id_cliente"),
+        "fornecedores": _ids("fornecedor", "id_fornecedor"),
+        "produtos": _ids("produto", "id_produto"),
+        "vendas": _ids("venda", "id_venda"),
+        "inicio": fim - timedelta(days=365),
+        "fim": fim,
+    }
+
+def _periodo(ctx, rng, dias=30):
+    """Um intervalo de ``dias`` sorteado dentro do período das vendas."""
+    total = max(0, (ctx["fim"] - ctx["inicio"]).days - dias)
+    inicio = ctx["inicio"] + timedelta(days=rng.randint(0, total))
+    return inicio.date().isoformat(), (inicio + timedelta(days=dias)).date().isoformat()
+
+def _venda(ctx, rng):
+    itens = [(id_produto, 1) for id_produto in rng.sample(ctx["produtos"], min(3, len(ctx["produtos"])))]
+    return rng.choice(ctx["clientes"]), itens
+
+def _carrinho(ctx, rng):
+    return (_venda(ctx, rng)[1],)
+
+def _id_venda(ctx, rng):
+    # O contexto do gerador não traz as vendas: busca os ids uma vez
+    if "vendas" not in ctx:
+        ctx["vendas"] = _ids("venda", "id_venda")
+    return (rng.choice(ctx["vendas"]),)
+
+def _entrada(ctx, rng):
+    itens = [(id_produto, rng.randint(1, 20), round(rng.uniform(1, 100), 2))
+             for id_produto in rng.sample(ctx["produtos"], min(10, len(ctx["produtos"])))]
+    return itens, rng.choice(ctx["fornecedores"])
+
+# nome -> função que sorteia os argumentos da chamada a partir do contexto
+CASOS = {
+    "listar_produtos": lambda ctx, rng: (),
+    "listar_produtos_pagina": lambda ctx, rng: (),
+    "listar_clientes": lambda ctx, rng: (),
+    "listar_clientes_pagina": lambda ctx, rng: (),
+    "listar_fornecedores": lambda ctx, rng: (),
+    "listar_vendas": lambda ctx, rng: (),
+    "listar_vendas_pagina": lambda ctx, rng: (),
+    "listar_itens_venda": _id_venda,
+    "listar_produtos_estoque_baixo": lambda ctx, rng: (),
+    "iterar_produtos_estoque_baixo": lambda ctx, rng: (),
+    "buscar_produto": lambda ctx, rng: (rng.choice(ctx["produtos"]),),
+    "get_preco_produto": lambda ctx, rng: (rng.choice(ctx["produtos"]),),
+    "buscar_cliente": lambda ctx, rng: (rng.choice(ctx["clientes"]),),
+    "buscar_fornecedor": lambda ctx, rng: (rng.choice(ctx["fornecedores"]),),
+    "historico_vendas_por_cliente": lambda ctx, rng: (rng.choice(ctx["clientes"]),),
+    "total_consumido_por_cliente": lambda ctx, rng: (rng.choice(ctx["clientes"]),),
+    "historico_vendas_por_produto": lambda ctx, rng: (rng.choice(ctx["produtos"]),),
+    "historico_vendas_por_periodo": _periodo,
+    "iterar_historico_vendas_por_cliente": lambda ctx, rng: (rng.choice(ctx["clientes"]),),
+    "iterar_historico_vendas_por_produto": lambda ctx, rng: (rng.choice(ctx["produtos"]),),
+    "iterar_historico_vendas_por_periodo": _periodo,
+    "resumo_vendas_periodo": _periodo,
+    "vendas_diarias": _periodo,
+    "cotar_carrinho": _carrinho,
+    "inserir_venda": _venda,
+    "registrar_entrada": _entrada,
+}
+
+# Casos que alteram o banco
+ESCRITA = {"inserir_venda", "registrar_entrada"}
+
+
+def percentil(valores, p):
+    """Percentil ``p`` (0-100) por interpolação linear; ``valores`` ordenados."""
+    if not valores:
+        return None
+    pos = (len(valores) - 1) * p / 100
+    baixo = int(pos)
+    alto = min(baixo + 1, len(valores) - 1)
+    return valores[baixo] + (valores[alto] - valores[baixo]) * (pos - baixo)
+
+def _linhas(resultado):
+    if resultado is None:
+        return 0
+    if isinstance(resultado, (list, tuple)):
+        return len(resultado)
+    return 1
+
+def _consumir(func):
+    """Chama uma função ``iterar_*`` e percorre o iterador; devolve as linhas lidas."""
+    def chamar(*args):
+        return sum(1 for _ in func(*args))
+    return chamar
+
+def medir(func, gerar_args, aquecimento=3, repeticoes=30, contar=_linhas):
+    """
+    Mede uma função: latência de cada chamada e pico de memória.
+
+    A memória é medida numa chamada extra, fora das repetições, porque o
+    ``tracemalloc`` deixa as chamadas bem mais lentas. ``contar`` diz
+    quantas linhas um resultado tem.
+
+    Returns
+    -------
+    dict
+        p50/p95/p99/média/mínimo/máximo em milissegundos, linhas por
+        chamada, linhas por segundo e pico de memória em KiB.
+    """
+    for _ in range(aquecimento):
+        func(*gerar_args())
+
+    tempos = []
+    linhas = 0
+    for _ in range(repeticoes):
+        args = gerar_args()
+        inicio = time.perf_counter()
+        resultado = func(*args)
+        tempos.append(time.perf_counter() - inicio)
+        linhas += contar(resultado)
+
+    args = gerar_args()
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    tempos.sort()
+    total = sum(tempos)
+    return {
+        "repeticoes": repeticoes,
+        "p50_ms": percentil(tempos, 50) * 1000,
+        "p95_ms": percentil(tempos, 95) * 1000,
+        "p99_ms": percentil(tempos, 99) * 1000,
+        "media_ms": total / repeticoes * 1000,
+        "min_ms": tempos[0] * 1000,
+        "max_ms": tempos[-1] * 1000,
+        "linhas_por_chamada": linhas / repeticoes,
+        "linhas_por_s": linhas / total if total else None,
+        "pico_memoria_kib": pico / 1024,
+    }
+
+def executar(contexto, casos=None, aquecimento=3, repeticoes=30, semente=42, log=None):
+    """
+    Roda os casos de benchmark.
+
+    Parameters
+    ----------
+    contexto : dict
+        Ids disponíveis (retorno de ``gerador_dados.gerar`` ou ``contexto_do_banco``).
+    casos : list[str], optional
+        Nomes dos casos (padrão: todos de ``CASOS``).
+
+    Returns
+    -------
+    dict
+        nome do caso -> métricas (ver ``medir``).
+    """
+    import repository as repo
+
+    resultados = {}
+    for nome in casos or CASOS:
+        rng = random.Random(semente)
+        sortear = CASOS[nome]
+        if log:
+            log(f"{nome}...")
+        func = getattr(repo, nome)
+        if nome.startswith("iterar_"):
+            resultados[nome] = medir(_consumir(func), lambda: sortear(contexto, rng),
+                                     aquecimento, repeticoes, contar=lambda linhas: linhas)
+        else:
+            resultados[nome] = medir(func, lambda: sortear(contexto, rng), aquecimento, repeticoes)
+    return resultados
+
+def comparar(base, atual, tolerancia=0.2, metrica="p95_ms"):
+    """
+    Compara dois relatórios do benchmark.
+
+    Returns
+    -------
+    list[tuple]
+        (caso, valor base, valor atual, variação) dos casos que pioraram
+        mais que ``tolerancia`` (0.2 = 20%).
+    """
+    regressoes = []
+    for nome, metricas in atual["resultados"].items():
+        anterior = base["resultados"].get(nome)
+        if not anterior or not anterior.get(metrica):
+            continue
+        variacao = metricas[metrica] / anterior[metrica] - 1
+        if variacao > tolerancia:
+            regressoes.append((nome, anterior[metrica], metricas[metrica], variacao))
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark das funções do repository.")
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--sqlite-caminho", default=":memory:",
+                        help="arquivo do banco SQLite (padrão: em memória)")
+    parser.add_argument("--sem-gerar", action="store_true",
+                        help="usa os dados que já estão no banco, sem gerar novos")
+    gerador_dados.argumentos_volumes(parser)
+    parser.add_argument("--casos", nargs="+", choices=sorted(CASOS), help="roda só esses casos")
+    parser.add_argument("--somente-leitura", action="store_true", help="pula os casos que alteram o banco")
+    parser.add_argument("--aquecimento", type=int, default=3)
+    parser.add_argument("--repeticoes", type=int, default=30)
+    parser.add_argument("--saida", help="arquivo JSON do relatório (padrão: imprime na tela)")
+    parser.add_argument("--comparar", metavar="BASE_JSON", help="compara com um relatório anterior")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="piora de p95 aceita na comparação (padrão: 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    def log(msg):
+        print(msg, file=sys.stderr)
+
+    if args.backend == "sqlite":
+        db.configurar_backend("sqlite", caminho=args.sqlite_caminho)
+    else:
+        db.configurar_backend("mysql")
+    db.iniciar_backend()
+
+    volumes = gerador_dados.volumes_dos_argumentos(args)
+    if args.sem_gerar:
+        contexto = contexto_do_banco()
+    else:
+        inicio = time.perf_counter()
+        contexto = gerador_dados.gerar(volumes, semente=args.semente, log=log)
+        log(f"Dados gerados em {time.perf_counter() - inicio:.1f}s")
+
+    casos = args.casos or list(CASOS)
+    if args.somente_leitura:
+        casos = [c for c in casos if c not in ESCRITA]
+
+    relatorio = {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "backend": args.backend,
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "volumes": None if args.sem_gerar else volumes,
+            "semente": args.semente,
+            "aquecimento": args.aquecimento,
+            "repeticoes": args.repeticoes,
+        },
+        "resultados": executar(contexto, casos, args.aquecimento, args.repeticoes, args.semente, log),
+    }
+
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+    db.get_backend().fechar()
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        regressoes = comparar(base, relatorio, args.tolerancia)
+        for nome, antes, depois, variacao in regressoes:
+            log(f"REGRESSÃO {nome}: p95 {antes:.2f} ms -> {depois:.2f} ms (+{variacao:.0%})")
+        if regressoes:
+            return 1
+        log("Nenhuma regressão acima da tolerância.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
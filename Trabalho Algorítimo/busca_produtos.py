@@ -0,0 +1,300 @@
+"""
+Módulo busca_produtos
+---------------------
+Índice em memória para buscar produtos enquanto se digita (tela de venda).
+
+Cada produto é quebrado em palavras (nome e categoria, sem acentos e em
+minúsculas) e em trigramas. A busca:
+
+- por um número, acha o produto pelo id;
+- por palavras, acha os produtos em que cada palavra digitada é o começo
+  de alguma palavra do produto ("cafe pil" encontra "Café Pilão 500g");
+- se nada for encontrado assim, compara trigramas, tolerando erros de
+  digitação ("cafe pilao" ~ "cafe pillao").
+
+Os resultados são ordenados por relevância (palavra do nome vale mais que
+da categoria, palavra inteira mais que começo). O índice é lido do banco
+uma vez, relido após ``VALIDADE`` segundos (produtos alterados em outro
+terminal) e atualizado pelas funções de escrita de produto do
+``repository``. A releitura é feita pelo ``carregar``, fora da thread da
+interface; enquanto ela não termina, a busca usa o índice anterior.
+"""
+
+import bisect
+import heapq
+import threading
+import time
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+
+from catalogo import normalizar_nome
+from db import fetchall
+
+# Segundos até o índice ser relido do banco
+VALIDADE = 300
+# Fração mínima de trigramas em comum para a busca aproximada
+SIMILARIDADE_MINIMA = 0.5
+
+_lock = threading.RLock()
+_indice = None
+_carregado_em = 0.0
+# Uma releitura do banco por vez
+_carga = threading.Lock()
+# Durante uma releitura: (id_produto, produto ou None se removido) gravados nesse meio
+# tempo, reaplicados no índice novo (a leitura pode ter sido feita antes deles)
+_alteracoes = None
+
+
+def _trigramas(palavras):
+    grams = set()
+    for p in palavras:
+        p = f" {p} "
+        grams.update(p[i:i + 3] for i in range(len(p) - 2))
+    return grams
+
+
+class _Indice:
+    """Palavras e trigramas -> ids de produto."""
+
+    def __init__(self):
+        self.produtos = {}      # id -> {"id_produto", "nome", "categoria", "preco"}
+        self.palavras = {}      # id -> (palavras do nome, palavras da categoria, nome normalizado)
+        self.ids_palavra = {}   # palavra (do nome ou da categoria) -> {ids}
+        self.ids_nome = {}      # palavra do nome -> {ids}
+        self.ordenadas = []     # palavras do índice em ordem (busca por prefixo com bisect)
+        self.ids_trigrama = {}  # trigrama -> {ids}
+        # Desempate: nomes mais curtos (mais próximos do digitado) primeiro, depois alfabética
+        self.desempate = {}     # id -> (tamanho do nome, nome normalizado)
+        # Nomes normalizados em ordem, e os ids na mesma ordem (nomes que começam com o texto)
+        self.nomes = []
+        self.ids_nomes = []
+
+    def adicionar(self, produto):
+        id_produto = produto["id_produto"]
+        self.remover(id_produto)
+        nome = normalizar_nome(produto["nome"] or "")
+        do_nome = tuple(nome.split())
+        da_categoria = tuple(normalizar_nome(produto.get("categoria") or "").split())
+        self.produtos[id_produto] = {"id_produto": id_produto, "nome": produto["nome"],
+                                     "categoria": produto.get("categoria"), "preco": produto.get("preco")}
+        self.palavras[id_produto] = (do_nome, da_categoria, nome)
+        self.desempate[id_produto] = (len(nome), nome)
+        pos = bisect.bisect(self.nomes, nome)
+        self.nomes.insert(pos, nome)
+        self.ids_nomes.insert(pos, id_produto)
+        for palavra in set(do_nome + da_categoria):
+            ids = self.ids_palavra.get(palavra)
+            if ids is None:
+                ids = self.ids_palavra[palavra] = set()
+                bisect.insort(self.ordenadas, palavra)
+            ids.add(id_produto)
+        for palavra in do_nome:
+            self.ids_nome.setdefault(palavra, set()).add(id_produto)
+        for grama in _trigramas(do_nome + da_categoria):
+            self.ids_trigrama.setdefault(grama, set()).add(id_produto)
+
+    def remover(self, id_produto):
+        if id_produto not in self.produtos:
+            return
+        do_nome, da_categoria, nome = self.palavras.pop(id_produto)
+        del self.produtos[id_produto]
+        del self.desempate[id_produto]
+        pos = bisect.bisect_left(self.nomes, nome)
+        while self.ids_nomes[pos] != id_produto: # nomes iguais: procura o id
+            pos += 1
+        del self.nomes[pos]
+        del self.ids_nomes[pos]
+        for palavra in set(do_nome + da_categoria):
+            ids = self.ids_palavra[palavra]
+            ids.discard(id_produto)
+            if not ids:
+                del self.ids_palavra[palavra]
+                del self.ordenadas[bisect.bisect_left(self.ordenadas, palavra)]
+        for palavra in set(do_nome):
+            ids = self.ids_nome[palavra]
+            ids.discard(id_produto)
+            if not ids:
+                del self.ids_nome[palavra]
+        for grama in _trigramas(do_nome + da_categoria):
+            ids = self.ids_trigrama[grama]
+            ids.discard(id_produto)
+            if not ids:
+                del self.ids_trigrama[grama]
+
+    def _com_prefixo(self, termo):
+        """(ids com alguma palavra começando com ``termo``, ids em que essa palavra é do nome)."""
+        inicio = bisect.bisect_left(self.ordenadas, termo)
+        fim = bisect.bisect_left(self.ordenadas, termo + "\uffff", inicio)
+        ids, do_nome = set(), set()
+        for palavra in self.ordenadas[inicio:fim]:
+            ids |= self.ids_palavra[palavra]
+            do_nome |= self.ids_nome.get(palavra, frozenset())
+        return ids, do_nome
+
+    def _melhores(self, candidatos, faixas, texto, limite):
+        # Todo candidato tem 1 ponto por palavra; os extras são contados com
+        # operações de conjunto (rápidas mesmo com milhares de candidatos)
+        extras = Counter()
+        for exatos, do_nome in faixas:
+            extras.update(do_nome & candidatos)
+            extras.update(candidatos.intersection(exatos))
+        # Nome começando com o texto digitado: +2
+        inicio = bisect.bisect_left(self.nomes, texto)
+        fim = bisect.bisect_left(self.nomes, texto + "\uffff", inicio)
+        comeca = candidatos.intersection(self.ids_nomes[inicio:fim])
+        extras.update(comeca)
+        extras.update(comeca)
+
+        # Do grupo de mais pontos para o de menos, até completar o limite
+        resultado = []
+        grupos = groupby(extras.most_common(), key=itemgetter(1))
+        for _, grupo in grupos:
+            resultado += heapq.nsmallest(limite - len(resultado), map(itemgetter(0), grupo),
+                                         key=self.desempate.__getitem__)
+            if len(resultado) >= limite:
+                break
+        else:
+            resultado += heapq.nsmallest(limite - len(resultado), candidatos.difference(extras),
+                                         key=self.desempate.__getitem__)
+        return [self.produtos[i] for i in resultado]
+
+    def buscar(self, texto, limite):
+        texto = normalizar_nome(texto)
+        if not texto:
+            return []
+        if texto.isdigit() and int(texto) in self.produtos:
+            return [self.produtos[int(texto)]]
+
+        # Todas as palavras digitadas precisam aparecer (como começo de palavra)
+        termos = sorted(set(texto.split()), key=len, reverse=True)
+        candidatos = None
+        # Pontos por palavra: inteira no nome 3, começo de palavra do nome 2, na categoria 1
+        faixas = []
+        for termo in termos:
+            ids, do_nome = self._com_prefixo(termo)
+            candidatos = ids if candidatos is None else candidatos & ids
+            if not candidatos:
+                break
+            faixas.append((self.ids_nome.get(termo, frozenset()), do_nome))
+        if candidatos:
+            return self._melhores(candidatos, faixas, texto, limite)
+
+        # Nada exato: aproxima pelos trigramas em comum
+        gramas = _trigramas(termos)
+        contagem = Counter()
+        for grama in gramas:
+            contagem.update(self.ids_trigrama.get(grama, ()))
+        minimo = max(1, SIMILARIDADE_MINIMA * len(gramas))
+        melhores = heapq.nsmallest(
+            limite, (i for i, qtd in contagem.items() if qtd >= minimo),
+            key=lambda i: (-contagem[i], self.desempate[i]))
+        return [self.produtos[i] for i in melhores]
+
+
+def _valido():
+    return _indice is not None and time.monotonic() - _carregado_em <= VALIDADE
+
+def _carregar():
+    global _indice, _carregado_em, _alteracoes
+    if _valido():
+        return _indice
+    # Se já há um índice, quem chega durante outra releitura fica com ele
+    if not _carga.acquire(blocking=_indice is None):
+        return _indice
+    try:
+        if _valido():
+            return _indice
+        with _lock:
+            _alteracoes = []
+        # Montado fora do lock: a busca continua usando o índice anterior enquanto isso
+        novo = _Indice()
+        for p in fetchall("SELECT id_produto, nome, categoria, preco FROM produto"):
+            novo.adicionar(p)
+        with _lock:
+            for id_produto, produto in _alteracoes:
+                if produto is None:
+                    novo.remover(id_produto)
+                else:
+                    novo.adicionar(produto)
+            _indice, _carregado_em = novo, time.monotonic()
+        return novo
+    finally:
+        with _lock:
+            _alteracoes = None
+        _carga.release()
+
+def carregar():
+    """Lê (ou relê, se vencido) o índice do banco. Chame fora da thread da interface."""
+    _carregar()
+
+def carregar_de(produtos):
+    """
+    Monta o índice com produtos já em memória (ex: a grade da tela), se ele
+    ainda não foi lido do banco; usado quando o banco está fora do ar. O
+    próximo ``carregar`` relê o banco.
+    """
+    global _indice, _carregado_em
+    novo = _Indice()
+    for p in produtos:
+        novo.adicionar(p)
+    with _lock:
+        if _indice is None and novo.produtos:
+            _indice, _carregado_em = novo, float("-inf")
+
+def carregado():
+    """Se o índice já foi lido (a busca funciona mesmo com o banco fora do ar)."""
+    return _indice is not None
+
+def buscar(texto, limite=20):
+    """
+    Produtos que correspondem ao texto digitado, do mais ao menos relevante.
+
+    Parameters
+    ----------
+    texto : str
+        Id do produto ou palavras (começos) do nome/categoria.
+    limite : int
+        Quantidade máxima de resultados.
+
+    Returns
+    -------
+    list[dict]
+        ``{"id_produto", "nome", "categoria", "preco"}`` de cada produto (o
+        preço é o da leitura do índice; a venda usa o do banco).
+    """
+    # Vencido ou não: quem relê é o ``carregar``; só lê aqui se nunca foi lido
+    indice = _indice or _carregar()
+    with _lock:
+        return indice.buscar(texto, limite)
+
+def buscar_por_id(id_produto):
+    indice = _indice or _carregar()
+    with _lock:
+        return indice.produtos.get(id_produto)
+
+def registrar_produto(id_produto, nome, categoria, preco=None):
+    """Inclui/atualiza no índice um produto inserido ou alterado no banco."""
+    produto = {"id_produto": id_produto, "nome": nome, "categoria": categoria, "preco": preco}
+    with _lock:
+        if _indice is not None:
+            _indice.adicionar(produto)
+        if _alteracoes is not None:
+            _alteracoes.append((id_produto, produto))
+
+def remover_produto(id_produto):
+    """Tira do índice um produto excluído do banco."""
+    with _lock:
+        if _indice is not None:
+            _indice.remover(id_produto)
+        if _alteracoes is not None:
+            _alteracoes.append((id_produto, None))
+
+def invalidar():
+    """
+    Marca o índice como vencido: o próximo ``carregar`` relê o banco e,
+    até lá, a busca continua com o índice atual.
+    """
+    global _carregado_em
+    with _lock:
+        _carregado_em = float("-inf")
@@ -0,0 +1,97 @@
+"""
+Módulo cache_local
+------------------
+Cópia local das grades (produtos, clientes, fornecedores, vendas) para
+abrir o sistema instantaneamente.
+
+Ao fechar (e periodicamente, para sobreviver a uma queda) o conteúdo
+visível das grades é gravado num arquivo JSON compactado com gzip. Na
+próxima abertura as grades são preenchidas com ele antes de qualquer
+consulta, e em seguida reconciliadas com o banco em segundo plano
+(``GradeVirtual.recarregar`` aplica só as diferenças).
+
+O arquivo é ``cache_grades.json.gz`` (ou o ``CACHE_LOCAL`` do .env; vazio
+desliga o cache). Um cache de outro banco é ignorado.
+"""
+
+import gzip
+import json
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+import db
+
+# Versão do formato do arquivo (cache de versão diferente é ignorado)
+VERSAO_FORMATO = 1
+# Linhas guardadas por grade (o início de cada uma)
+LINHAS_POR_GRADE = 1000
+
+
+def caminho_cache():
+    """Arquivo do cache, ou None se desligado."""
+    return os.getenv("CACHE_LOCAL", "cache_grades.json.gz") or None
+
+def _codificar(valor):
+    # Tipos do banco que o JSON não tem: gravados com uma marca para voltarem iguais
+    if isinstance(valor, Decimal):
+        return {"$dec": str(valor)}
+    if isinstance(valor, datetime):
+        return {"$dt": valor.isoformat()}
+    if isinstance(valor, date):
+        return {"$d": valor.isoformat()}
+    raise TypeError(f"Tipo não suportado no cache: {type(valor).__name__}")
+
+def _decodificar(obj):
+    if len(obj) == 1:
+        if "$dec" in obj:
+            return Decimal(obj["$dec"])
+        if "$dt" in obj:
+            return datetime.fromisoformat(obj["$dt"])
+        if "$d" in obj:
+            return date.fromisoformat(obj["$d"])
+    return obj
+
+def salvar(grades, caminho=None):
+    """
+    Grava o conteúdo das grades no cache local.
+
+    Parameters
+    ----------
+    grades : dict
+        nome da grade -> retorno de ``GradeVirtual.instantaneo()``.
+    caminho : str, optional
+        Arquivo (padrão: ``caminho_cache()``).
+    """
+    caminho = caminho or caminho_cache()
+    banco = db.identificacao_backend()
+    if not caminho or banco.endswith(":memory:"):
+        return
+    conteudo = {"versao": VERSAO_FORMATO, "banco": banco, "grades": grades}
+    temporario = caminho + ".tmp"
+    # compresslevel baixo: o arquivo é pequeno e gravar rápido importa mais
+    with gzip.open(temporario, "wt", encoding="utf-8", compresslevel=5) as f:
+        json.dump(conteudo, f, default=_codificar, separators=(",", ":"), ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+def carregar(caminho=None):
+    """
+    Lê o cache local.
+
+    Returns
+    -------
+    dict
+        nome da grade -> dados para ``GradeVirtual.restaurar()``. Vazio se
+        não houver cache, se ele for de outro banco ou estiver corrompido.
+    """
+    caminho = caminho or caminho_cache()
+    if not caminho or not os.path.exists(caminho):
+        return {}
+    try:
+        with gzip.open(caminho, "rt", encoding="utf-8") as f:
+            conteudo = json.load(f, object_hook=_decodificar)
+    except (OSError, ValueError, EOFError):
+        return {}
+    if conteudo.get("versao") != VERSAO_FORMATO or conteudo.get("banco") != db.identificacao_backend():
+        return {}
+    return conteudo.get("grades", {})
@@ -0,0 +1,175 @@
+"""
+Módulo catalogo
+---------------
+Cache em memória dos dados de referência: estados, cidades e fornecedores.
+
+Cada tabela é lida do banco uma única vez (as cidades, por estado) e as
+buscas por id ou nome passam a ser consultas a dicionários. As funções de
+escrita do ``repository`` (inserir_cidade, inserir/atualizar/deletar
+fornecedor) mantêm o cache atualizado.
+
+As cidades também têm um índice por prefixo, sem diferenciar acentos e
+maiúsculas ("sao j" encontra "São João del-Rei"), usado no autocompletar
+do cadastro de endereço.
+"""
+
+import bisect
+import threading
+import unicodedata
+from db import fetchall
+
+_lock = threading.RLock()
+_estados = None             # id_estado -> {"id_estado", "nome", "sigla"}
+_estados_por_nome = None    # nome -> estado
+_cidades = {}               # id_estado -> {nome: {"id_cidade", "nome", "id_estado"}}
+_indices_cidades = {}       # id_estado -> (nomes normalizados em ordem, cidades na mesma ordem)
+_fornecedores = None        # id_fornecedor -> {"id_fornecedor", "nome"}
+_fornecedores_por_nome = None
+
+def normalizar_nome(texto):
+    """Forma usada nas buscas: sem acentos, minúsculas e espaços simples."""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acento = "".join(ch for ch in decomposto if not unicodedata.combining(ch))
+    return " ".join(sem_acento.casefold().split())
+
+# region Estado
+def _carregar_estados():
+    global _estados, _estados_por_nome
+    with _lock:
+        if _estados is None:
+            rows = fetchall("SELECT id_estado, nome, sigla FROM estado ORDER BY nome")
+            _estados = {e["id_estado"]: e for e in rows}
+            _estados_por_nome = {e["nome"]: e for e in rows}
+    return _estados
+
+def listar_estados():
+    """Estados ordenados por nome."""
+    return sorted(_carregar_estados().values(), key=lambda e: e["nome"])
+
+def buscar_estado(id_estado):
+    return _carregar_estados().get(id_estado)
+
+def buscar_estado_por_nome(nome):
+    _carregar_estados()
+    return _estados_por_nome.get(nome)
+#endregion
+
+# region Cidade
+def _carregar_cidades(id_estado):
+    with _lock:
+        cidades = _cidades.get(id_estado)
+        if cidades is None:
+            rows = fetchall("SELECT id_cidade, nome, id_estado FROM cidade WHERE id_estado=%s ORDER BY nome",
+                            (id_estado,))
+            cidades = _cidades[id_estado] = {c["nome"]: c for c in rows}
+    return cidades
+
+def listar_cidades(id_estado):
+    """Cidades de um estado, ordenadas por nome."""
+    return sorted(_carregar_cidades(id_estado).values(), key=lambda c: c["nome"])
+
+def _indice_cidades(id_estado):
+    with _lock:
+        indice = _indices_cidades.get(id_estado)
+        if indice is None:
+            pares = sorted(((normalizar_nome(c["nome"]), c) for c in _carregar_cidades(id_estado).values()),
+                           key=lambda par: par[0])
+            indice = _indices_cidades[id_estado] = ([n for n, _ in pares], [c for _, c in pares])
+    return indice
+
+def buscar_cidades_por_prefixo(id_estado, prefixo, limite=None):
+    """
+    Cidades do estado cujo nome começa com ``prefixo`` (sem diferenciar
+    acentos e maiúsculas), em ordem alfabética.
+
+    Parameters
+    ----------
+    id_estado : int
+    prefixo : str
+        Texto digitado; vazio retorna todas.
+    limite : int, optional
+        Quantidade máxima de cidades.
+    """
+    nomes, cidades = _indice_cidades(id_estado)
+    chave = normalizar_nome(prefixo)
+    inicio = bisect.bisect_left(nomes, chave)
+    fim = bisect.bisect_left(nomes, chave + "\uffff", inicio)
+    if limite is not None:
+        fim = min(fim, inicio + limite)
+    return cidades[inicio:fim]
+
+def buscar_cidade_por_nome(id_estado, nome):
+    """Cidade pelo nome exato ou, se não houver, pelo nome sem acentos/maiúsculas."""
+    cidade = _carregar_cidades(id_estado).get(nome)
+    if cidade is None:
+        nomes, cidades = _indice_cidades(id_estado)
+        chave = normalizar_nome(nome)
+        pos = bisect.bisect_left(nomes, chave)
+        if pos < len(nomes) and nomes[pos] == chave:
+            cidade = cidades[pos]
+    return cidade
+
+def registrar_cidade(id_cidade, nome, id_estado):
+    """Inclui no cache uma cidade recém-inserida no banco."""
+    with _lock:
+        if id_estado in _cidades:
+            cidade = _cidades[id_estado][nome] = {"id_cidade": id_cidade, "nome": nome, "id_estado": id_estado}
+            indice = _indices_cidades.get(id_estado)
+            if indice is not None:
+                chave = normalizar_nome(nome)
+                pos = bisect.bisect(indice[0], chave)
+                indice[0].insert(pos, chave)
+                indice[1].insert(pos, cidade)
+#endregion
+
+# region Fornecedor
+def _carregar_fornecedores():
+    global _fornecedores, _fornecedores_por_nome
+    with _lock:
+        if _fornecedores is None:
+            rows = fetchall("SELECT id_fornecedor, nome FROM fornecedor ORDER BY nome")
+            _fornecedores = {f["id_fornecedor"]: f for f in rows}
+            _fornecedores_por_nome = {f["nome"]: f for f in rows}
+    return _fornecedores
+
+def listar_fornecedores():
+    """Fornecedores (id e nome) ordenados por nome."""
+    return sorted(_carregar_fornecedores().values(), key=lambda f: f["nome"])
+
+def buscar_fornecedor(id_fornecedor):
+    return _carregar_fornecedores().get(id_fornecedor)
+
+def buscar_fornecedor_por_nome(nome):
+    _carregar_fornecedores()
+    return _fornecedores_por_nome.get(nome)
+
+def registrar_fornecedor(id_fornecedor, nome):
+    """Inclui/atualiza no cache um fornecedor inserido ou alterado no banco."""
+    with _lock:
+        if _fornecedores is not None:
+            remover_fornecedor(id_fornecedor)
+            _fornecedores[id_fornecedor] = _fornecedores_por_nome[nome] = {"id_fornecedor": id_fornecedor, "nome": nome}
+
+def remover_fornecedor(id_fornecedor):
+    """Tira do cache um fornecedor excluído do banco."""
+    with _lock:
+        if _fornecedores is not None:
+            antigo = _fornecedores.pop(id_fornecedor, None)
+            if antigo and _fornecedores_por_nome.get(antigo["nome"]) is antigo:
+                del _fornecedores_por_nome[antigo["nome"]]
+#endregion
+
+def invalidar_fornecedores():
+    """Descarta o cache de fornecedores (ex: alterados em outro terminal)."""
+    global _fornecedores, _fornecedores_por_nome
+    with _lock:
+        _fornecedores = _fornecedores_por_nome = None
+
+def invalidar():
+    """Descarta todo o cache (a próxima consulta relê o banco)."""
+    global _estados, _estados_por_nome, _fornecedores, _fornecedores_por_nome
+    with _lock:
+        _estados = _estados_por_nome = None
+        _fornecedores = _fornecedores_por_nome = None
+        _cidades.clear()
+        _indices_cidades.clear()
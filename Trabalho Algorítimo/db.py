@@ -1,15 +1,22 @@
 """
-Responsável pela conexão com o banco de dados MySQL e execução de consultas.
-"""
+Responsável pela conexão com o banco de dados e execução de consultas.
 
-import mysql.connector
+O banco padrão é o MySQL; definindo ``DB_BACKEND=sqlite`` no .env as
+mesmas funções passam a usar um banco SQLite embarcado (``db_sqlite``).
+"""
 
 #Carregando as variáveis de ambiente com as credenciais do banco
 
 from dotenv import load_dotenv
 import os
+import queue
+import sqlite3
+import threading
+import time
 from pathlib import Path
 
+import instrumentacao
+
 # Carrega as variáveis do arquivo ./.env e coloca dentro do ambiente do Python
 load_dotenv()
 
@@ -18,19 +25,357 @@ DB_CONFIG = {
     'user': os.getenv("USER"),
     'password': os.getenv("PASSWORD"),
     'database': os.getenv("DATABASE"),
-    'raise_on_warnings': True
+    'raise_on_warnings': True,
+    # Servidor fora do ar falha logo (a venda vai para o diário local) em vez de travar o caixa
+    'connection_timeout': int(os.getenv("DB_CONNECT_TIMEOUT", "5")),
 }
 
+# Backend de armazenamento: "mysql" (padrão) ou "sqlite"
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+# Arquivo do banco SQLite (":memory:" para um banco só em memória)
+SQLITE_PATH = os.getenv("SQLITE_PATH", "distribuidora.db")
+
+# Tamanho do pool de conexões (pode ser ajustado no .env)
+POOL_SIZE = int(os.getenv("POOL_SIZE", "5"))
+# Tempo máximo (segundos) esperando uma conexão livre do pool
+POOL_TIMEOUT = float(os.getenv("POOL_TIMEOUT", "10"))
+# Conexões paradas há mais tempo que isso (segundos) são testadas com ping na retirada
+POOL_PING_OCIOSA = float(os.getenv("POOL_PING_OCIOSA", "30"))
+
+# Medição das consultas para a aba Diagnóstico ("0" desliga)
+DB_INSTRUMENTACAO = os.getenv("DB_INSTRUMENTACAO", "1") != "0"
+# Arquivo do log de consultas lentas (desligado se vazio) e o limite, em ms
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+
+# region Pool de conexões
+class ConexaoPool:
+    """
+    Conexão emprestada do pool.
+
+    Repassa tudo para a conexão real, mas ``close()`` devolve a conexão
+    ao pool em vez de encerrá-la. Assim o código que já fazia
+    ``conn.close()`` continua funcionando sem alterações.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def close(self):
+        if self._conn is not None:
+            self._pool.devolver(self._conn)
+            self._conn = None
+
+
+class PoolConexoes:
+    """
+    Pool simples de conexões MySQL.
+
+    As conexões são criadas sob demanda até ``tamanho`` e reaproveitadas
+    entre as consultas, evitando o handshake TCP + autenticação a cada
+    comando. Na retirada a conexão é verificada (``ping``) e recriada se
+    o servidor a tiver derrubado. O ping só é feito em conexões que
+    ficaram ociosas mais que ``ping_ociosa`` segundos, para não somar um
+    round trip extra a cada consulta.
+    """
+
+    nome = "mysql"
+
+    def __init__(self, config, tamanho=POOL_SIZE, timeout=POOL_TIMEOUT, ping_ociosa=POOL_PING_OCIOSA):
+        self.config = config
+        self.tamanho = tamanho
+        self.timeout = timeout
+        self.ping_ociosa = ping_ociosa
+        self._livres = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._abertas = 0
+        self._stats = {
+            "criadas": 0,
+            "emprestimos": 0,
+            "reusos": 0,
+            "descartadas": 0,
+            "esperas": 0,
+            "tempo_espera": 0.0,
+        }
+
+    def _nova_conexao(self):
+        import mysql.connector
+        conn = mysql.connector.connect(**self.config)
+        with self._lock:
+            self._stats["criadas"] += 1
+        return conn
+
+    def aquecer(self, quantidade=None):
+        """Abre conexões antecipadamente (na inicialização do sistema)."""
+        quantidade = self.tamanho if quantidade is None else min(quantidade, self.tamanho)
+        while True:
+            with self._lock:
+                if self._abertas >= quantidade:
+                    break
+                self._abertas += 1
+            try:
+                self._livres.put((self._nova_conexao(), time.monotonic()))
+            except Exception:
+                with self._lock:
+                    self._abertas -= 1
+                raise
+
+    def _saudavel(self, conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def obter(self):
+        """
+        Retira uma conexão do pool (criando uma nova se ainda houver vaga).
+
+        Returns
+        -------
+        ConexaoPool
+            Conexão que volta para o pool ao ser fechada.
+        """
+        inicio = time.perf_counter()
+        conn = None
+        ultimo_uso = None
+        try:
+            conn, ultimo_uso = self._livres.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                pode_criar = self._abertas < self.tamanho
+                if pode_criar:
+                    self._abertas += 1
+            if pode_criar:
+                try:
+                    conn = self._nova_conexao()
+                except Exception:
+                    with self._lock:
+                        self._abertas -= 1
+                    raise
+            else:
+                with self._lock:
+                    self._stats["esperas"] += 1
+                try:
+                    conn, ultimo_uso = self._livres.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError("Nenhuma conexão livre no pool de conexões.")
+        else:
+            with self._lock:
+                self._stats["reusos"] += 1
+
+        # Health-check: conexão derrubada pelo servidor é substituída
+        ociosa = ultimo_uso is not None and time.monotonic() - ultimo_uso > self.ping_ociosa
+        if ociosa and not self._saudavel(conn):
+            self._descartar(conn)
+            with self._lock:
+                self._abertas += 1
+            try:
+                conn = self._nova_conexao()
+            except Exception:
+                with self._lock:
+                    self._abertas -= 1
+                raise
+
+        with self._lock:
+            self._stats["emprestimos"] += 1
+            self._stats["tempo_espera"] += time.perf_counter() - inicio
+        return ConexaoPool(self, conn)
+
+    def devolver(self, conn):
+        """Devolve a conexão ao pool, desfazendo transação pendente."""
+        try:
+            if conn.unread_result:
+                conn.consume_results()
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self._descartar(conn)
+            return
+        self._livres.put((conn, time.monotonic()))
+
+    def _descartar(self, conn):
+        with self._lock:
+            self._abertas -= 1
+            self._stats["descartadas"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def fechar(self):
+        """Encerra todas as conexões livres do pool."""
+        while True:
+            try:
+                conn, _ = self._livres.get_nowait()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._abertas -= 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def estatisticas(self):
+        """Retorna um dicionário com os contadores do pool."""
+        with self._lock:
+            stats = {"backend": self.nome, **self._stats}
+            stats["tamanho"] = self.tamanho
+            stats["abertas"] = self._abertas
+        stats["livres"] = self._livres.qsize()
+        return stats
+#endregion
+
+# region Backend
+_backend = None
+_backend_lock = threading.Lock()
+
+def criar_backend(nome=None, **opcoes):
+    """
+    Cria o backend de armazenamento pelo nome.
+
+    Parameters
+    ----------
+    nome : str, optional
+        "mysql" ou "sqlite". Usa ``DB_BACKEND`` se omitido.
+    **opcoes
+        ``tamanho`` (mysql) ou ``caminho`` (sqlite).
+    """
+    nome = (nome or DB_BACKEND).lower()
+    if nome == "mysql":
+        return PoolConexoes(DB_CONFIG, opcoes.get("tamanho") or POOL_SIZE)
+    if nome == "sqlite":
+        from db_sqlite import BackendSQLite
+        return BackendSQLite(opcoes.get("caminho", SQLITE_PATH))
+    raise ValueError(f"Backend de banco desconhecido: {nome}")
+
+def configurar_backend(nome=None, **opcoes):
+    """Troca o backend global (fechando o anterior) e o retorna."""
+    global _backend
+    novo = criar_backend(nome, **opcoes)
+    with _backend_lock:
+        antigo, _backend = _backend, novo
+    if antigo is not None:
+        antigo.fechar()
+    return novo
+
+def get_backend():
+    """Retorna o backend global, criando-o na primeira chamada."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = criar_backend()
+    return _backend
+
+def iniciar_backend():
+    """
+    Prepara o backend na inicialização do app: pré-aquece o pool do
+    MySQL ou abre (e cria, se preciso) o banco SQLite.
+    """
+    backend = get_backend()
+    backend.aquecer()
+    return backend
+
+def estatisticas_backend():
+    """Retorna as estatísticas de uso do backend (pool de conexões)."""
+    return get_backend().estatisticas()
+
+def identificacao_backend():
+    """
+    Texto que identifica o banco em uso (ex: "mysql:root@localhost/distribuidora"),
+    para caches locais não misturarem dados de bancos diferentes.
+    """
+    backend = get_backend()
+    if backend.nome == "sqlite":
+        caminho = backend.caminho
+        return f"sqlite:{caminho if caminho == ':memory:' else os.path.abspath(caminho)}"
+    cfg = backend.config
+    return f"mysql:{cfg.get('user')}@{cfg.get('host')}:{cfg.get('port', 3306)}/{cfg.get('database')}"
+
+def servidor_indisponivel(erro):
+    """
+    Se o erro indica que o banco não pôde ser alcançado (servidor fora do
+    ar, conexão perdida, pool esgotado), e não uma falha da própria operação.
+    """
+    if isinstance(erro, (TimeoutError, ConnectionError)):
+        return True
+    # Erros do cliente MySQL (2000-2999): CR_CONNECTION_ERROR, CR_SERVER_GONE_ERROR, CR_SERVER_LOST...
+    errno = getattr(erro, "errno", None)
+    return hasattr(erro, "sqlstate") and isinstance(errno, int) and 2000 <= errno < 3000
+
+def conflito_transitorio(erro):
+    """
+    Se a transação falhou por disputa de bloqueios (deadlock, tempo de
+    espera esgotado) e pode ser desfeita e repetida.
+    """
+    # ER_LOCK_WAIT_TIMEOUT (1205) e ER_LOCK_DEADLOCK (1213) do MySQL
+    if hasattr(erro, "sqlstate") and getattr(erro, "errno", None) in (1205, 1213):
+        return True
+    # SQLite: banco travado por outro processo
+    return isinstance(erro, sqlite3.OperationalError) and ("locked" in str(erro) or "busy" in str(erro))
+#endregion
+
+# region Instrumentação
+_observadores = ()
+
+def adicionar_observador(observador):
+    """
+    Registra um observador das consultas (ver ``instrumentacao``).
+
+    Parameters
+    ----------
+    observador : object
+        Objeto com ``consulta(sql, duracao, linhas, local)`` e
+        ``conexao(duracao)``.
+    """
+    global _observadores
+    if observador not in _observadores:
+        _observadores = _observadores + (observador,)
+
+def remover_observador(observador):
+    global _observadores
+    _observadores = tuple(o for o in _observadores if o is not observador)
+
+# Estatísticas das consultas desde o início do app (aba Diagnóstico)
+coletor = None
+if DB_INSTRUMENTACAO:
+    coletor = instrumentacao.Coletor()
+    adicionar_observador(coletor)
+if SLOW_QUERY_LOG:
+    adicionar_observador(instrumentacao.LogConsultasLentas(SLOW_QUERY_LOG, SLOW_QUERY_MS))
+#endregion
+
 def get_conn():
     """
-    Cria e retorna uma nova conexão com o banco de dados MySQL.
+    Retorna uma conexão do backend configurado.
+
+    A conexão deve ser fechada com ``close()`` depois do uso, o que a
+    devolve ao pool. Com observadores registrados, a conexão é
+    instrumentada e o tempo para obtê-la é medido.
     
     Returns
     -------
-    mysql.connector.connection_cext.CMySQLConnection
+    ConexaoPool or db_sqlite.ConexaoSQLite or instrumentacao.ConexaoInstrumentada
         Objeto de conexão.
     """
-    return mysql.connector.connect(**DB_CONFIG)
+    observadores = _observadores
+    if not observadores:
+        return get_backend().obter()
+    inicio = time.perf_counter()
+    conn = get_backend().obter()
+    duracao = time.perf_counter() - inicio
+    for obs in observadores:
+        try:
+            obs.conexao(duracao)
+        except Exception:
+            pass
+    return instrumentacao.ConexaoInstrumentada(conn, observadores)
 
 def fetchall(query, params=None):
     """
@@ -49,12 +394,14 @@ def fetchall(query, params=None):
         Lista de registros em formato dicionário.
     """
     conn = get_conn()
-    cur = conn.cursor(dictionary=True)
-    cur.execute(query, params or ())
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    return rows
+    try:
+        cur = conn.cursor(dictionary=True)
+        cur.execute(query, params or ())
+        rows = cur.fetchall()
+        cur.close()
+        return rows
+    finally:
+        conn.close()
 
 def fetchone(query, params=None):
     """
@@ -63,10 +410,54 @@ def fetchone(query, params=None):
     conn = get_conn()
     try:
         cur = conn.cursor(dictionary=True)
-        cur.execute(query, params or ())
-        return cur.fetchone()
+        try:
+            cur.execute(query, params or ())
+            return cur.fetchone()
+        finally:
+            cur.close()
+    finally:
+        conn.close()
+
+def iter_rows(query, params=None, tamanho_lote=500):
+    """
+    Executa uma consulta SELECT e entrega os registros aos poucos.
+
+    O cursor não é bufferizado: o MySQL manda as linhas conforme são lidas
+    (``fetchmany`` em lotes), então só um lote fica em memória por vez.
+    A conexão fica presa até o gerador terminar ou ser fechado
+    (``close()``/fim do ``for``), e só então volta ao pool.
+
+    Parameters
+    ----------
+    query : str
+        Comando SQL.
+    params : tuple, optional
+        Parâmetros da query.
+    tamanho_lote : int
+        Linhas lidas do servidor a cada ``fetchmany``.
+
+    Yields
+    ------
+    dict
+        Um registro por vez.
+    """
+    conn = get_conn()
+    try:
+        cur = conn.cursor(dictionary=True)
+        try:
+            cur.execute(query, params or ())
+            while True:
+                rows = cur.fetchmany(tamanho_lote)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            try:
+                cur.close()
+            except Exception:
+                # Leitura interrompida: o pool descarta o resto do resultado na devolução
+                pass
     finally:
-        cur.close()
         conn.close()
 
 
@@ -89,11 +480,13 @@ def execute(query, params=None, commit=True):
         Último ID inserido (se houver).
     """
     conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(query, params or ())
-    if commit:
-        conn.commit()
-    lastid = cur.lastrowid
-    cur.close()
-    conn.close()
-    return lastid
+    try:
+        cur = conn.cursor()
+        cur.execute(query, params or ())
+        if commit:
+            conn.commit()
+        lastid = cur.lastrowid
+        cur.close()
+        return lastid
+    finally:
+        conn.close()
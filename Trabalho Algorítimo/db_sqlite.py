@@ -0,0 +1,220 @@
+"""
+Módulo db_sqlite
+----------------
+Backend SQLite embarcado (arquivo local ou ``:memory:``).
+
+Expõe conexões e cursores com a mesma interface usada do
+``mysql.connector`` (``cursor(dictionary=True)``, ``start_transaction()``,
+``lastrowid``...), traduzindo o dialeto MySQL das consultas do
+``repository`` para SQLite. O schema é criado pelas mesmas migrações do
+MySQL (``migracoes``), traduzidas com ``traduzir_ddl``.
+"""
+
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+
+# region Conversões de tipos
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime, lambda v: v.isoformat(" ", "seconds"))
+sqlite3.register_adapter(date, lambda v: v.isoformat())
+sqlite3.register_converter("DECIMAL", lambda v: Decimal(v.decode()))
+sqlite3.register_converter("DATETIME", lambda v: datetime.fromisoformat(v.decode()))
+sqlite3.register_converter("DATE", lambda v: date.fromisoformat(v.decode()[:10]))
+#endregion
+
+# region Tradução de dialeto
+_TRADUCOES = [
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\s+FOR\s+UPDATE\b", re.IGNORECASE), ""),
+    (re.compile(r"\bNOW\(\)", re.IGNORECASE), "datetime('now','localtime')"),
+    (re.compile(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", re.IGNORECASE), "ON CONFLICT DO UPDATE SET"),
+]
+
+@lru_cache(maxsize=512)
+def traduzir_sql(query):
+    """
+    Traduz uma consulta no dialeto MySQL para SQLite.
+
+    - ``%s`` vira ``?``;
+    - ``FOR UPDATE`` é removido (o SQLite trava o banco inteiro na transação);
+    - ``NOW()`` vira ``datetime('now','localtime')``;
+    - ``ON DUPLICATE KEY UPDATE`` vira ``ON CONFLICT DO UPDATE SET`` (só
+      em ``INSERT ... VALUES``, com as colunas sem qualificar).
+    """
+    for padrao, troca in _TRADUCOES:
+        query = padrao.sub(troca, query)
+    return query
+
+_DDL_TRADUCOES = [
+    (re.compile(r"\bINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", re.IGNORECASE), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+    (re.compile(r"\bDEFAULT\s+CURRENT_TIMESTAMP\b", re.IGNORECASE), "DEFAULT (datetime('now','localtime'))"),
+    (re.compile(r"\bNOW\(\)", re.IGNORECASE), "datetime('now','localtime')"),
+]
+_ADD_UNIQUE = re.compile(
+    r"ALTER\s+TABLE\s+(\w+)\s+ADD\s+CONSTRAINT\s+(\w+)\s+UNIQUE\s*\(([^)]*)\)", re.IGNORECASE)
+
+def traduzir_ddl(comando):
+    """
+    Traduz um comando das migrações (dialeto MySQL) para SQLite.
+
+    ``ALTER TABLE ... ADD CONSTRAINT ... UNIQUE`` vira ``CREATE UNIQUE
+    INDEX``; nos demais comandos são trocados ``AUTO_INCREMENT``,
+    ``DEFAULT CURRENT_TIMESTAMP`` e ``NOW()`` (cargas iniciais).
+    """
+    comando = comando.strip()
+    m = _ADD_UNIQUE.match(comando)
+    if m:
+        tabela, nome, colunas = m.groups()
+        return f"CREATE UNIQUE INDEX {nome} ON {tabela} ({colunas})"
+    for padrao, troca in _DDL_TRADUCOES:
+        comando = padrao.sub(troca, comando)
+    return comando
+#endregion
+
+# region Conexão e cursor
+class CursorSQLite:
+    """Cursor com a interface do cursor do mysql.connector."""
+
+    def __init__(self, cur, dictionary=False):
+        self._cur = cur
+        self._dictionary = dictionary
+
+    def _linha(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip((d[0] for d in self._cur.description), row))
+
+    def execute(self, query, params=()):
+        self._cur.execute(traduzir_sql(query), tuple(params or ()))
+
+    def executemany(self, query, seq_params):
+        self._cur.executemany(traduzir_sql(query), [tuple(p) for p in seq_params])
+
+    def fetchone(self):
+        return self._linha(self._cur.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._linha(r) for r in self._cur.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._linha(r) for r in self._cur.fetchall()]
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    def close(self):
+        self._cur.close()
+
+
+class ConexaoSQLite:
+    """
+    Conexão emprestada do backend SQLite.
+
+    Todas as conexões compartilham a mesma conexão ``sqlite3`` protegida
+    por um lock; ``close()`` libera o lock (e desfaz uma transação
+    pendente, como o pool do MySQL).
+    """
+
+    def __init__(self, backend):
+        self._backend = backend
+        self._conn = backend._conn
+
+    def cursor(self, dictionary=False, buffered=None):
+        return CursorSQLite(self._conn.cursor(), dictionary)
+
+    def start_transaction(self):
+        # IMMEDIATE reserva a escrita já no início, como o FOR UPDATE do MySQL
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        if self._backend is not None:
+            self._backend.devolver()
+            self._backend = None
+
+
+class BackendSQLite:
+    """
+    Backend SQLite: banco em arquivo ou em memória (``:memory:``).
+
+    O SQLite só permite um escritor por vez, então uma única conexão é
+    compartilhada e serializada por um ``RLock`` (reentrante, para uma
+    transação poder chamar ``fetchall``/``fetchone`` na mesma thread).
+    """
+
+    nome = "sqlite"
+
+    def __init__(self, caminho=":memory:"):
+        self.caminho = str(caminho)
+        self._conn = None
+        self._lock = threading.RLock()
+        self._profundidade = 0
+        self._stats = {"emprestimos": 0}
+
+    def aquecer(self):
+        """Abre o banco e aplica as migrações pendentes (cria o schema)."""
+        import migracoes
+        with self._lock:
+            if self._conn is not None:
+                return
+            conn = sqlite3.connect(self.caminho, detect_types=sqlite3.PARSE_DECLTYPES,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA foreign_keys = ON")
+            if self.caminho != ":memory:":
+                conn.execute("PRAGMA journal_mode = WAL")
+            self._conn = conn
+            # Banco embarcado: o próprio app mantém o schema atualizado
+            try:
+                migracoes.aplicar_pendentes(self)
+            except Exception:
+                self._conn = None
+                conn.close()
+                raise
+
+    def obter(self):
+        """Retorna a conexão, bloqueando até que ela esteja livre."""
+        self.aquecer()
+        self._lock.acquire()
+        self._profundidade += 1
+        self._stats["emprestimos"] += 1
+        return ConexaoSQLite(self)
+
+    def devolver(self):
+        try:
+            self._profundidade -= 1
+            if self._profundidade == 0 and self._conn.in_transaction:
+                self._conn.rollback()
+        finally:
+            self._lock.release()
+
+    def fechar(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def estatisticas(self):
+        return {"backend": self.nome, "caminho": self.caminho, **self._stats}
+#endregion
@@ -0,0 +1,269 @@
+"""
+Módulo diario_vendas
+--------------------
+Diário local das vendas do caixa, para vender mesmo com o banco central
+fora do ar (ou lento demais).
+
+Toda venda é gravada primeiro num arquivo SQLite local (modo WAL,
+``synchronous=FULL``: a venda sobrevive a uma queda do computador) com uma
+chave de idempotência, e só depois enviada ao banco
+(``repository.inserir_venda``). Se o banco não responder, a venda fica
+pendente e é reenviada em segundo plano (``reenviar``), em lotes, das
+mais antigas para as mais novas.
+
+A chave fica gravada na venda (``venda.chave_idempotencia``, com índice
+único): reenviar uma venda que o banco já gravou (a resposta se perdeu)
+não a duplica. No reenvio valem os preços e o estoque do banco nesse
+momento, e a data da venda é a do registro no caixa. Uma venda que o banco
+recusa (ex: estoque insuficiente, cliente excluído) fica como conflito,
+para ser conferida (``conflitos``, ``python app.py report vendas-offline``)
+e descartada.
+
+O arquivo é ``diario_vendas.db`` (ou o ``DIARIO_VENDAS`` do .env).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import db
+import repository as repo
+
+# Situações de uma venda no diário
+PENDENTE = "pendente"
+ENVIADA = "enviada"
+CONFLITO = "conflito"
+# Retorno de ``enviar`` quando outra chamada já está enviando a venda
+EM_ENVIO = "em_envio"
+
+# Vendas enviadas por vez no reenvio em segundo plano
+LOTE_REENVIO = 50
+# Dias que as vendas já enviadas ficam no diário (conferência) antes de apagadas
+DIAS_HISTORICO = 30
+
+_lock = threading.Lock()
+_conn = None
+# Chaves sendo enviadas agora (o reenvio periódico não pega a mesma venda)
+_em_envio = set()
+# Chaves registradas com ``enviar_depois``: só quem registrou as envia (o reenvio as pula)
+_reservadas = set()
+
+
+def caminho_diario():
+    return os.getenv("DIARIO_VENDAS", "diario_vendas.db")
+
+def _conexao():
+    """Conexão única com o diário (criado na primeira vez). Use com ``_lock``."""
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(caminho_diario(), check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.execute("""CREATE TABLE IF NOT EXISTS venda_pendente (
+                            chave TEXT PRIMARY KEY,
+                            id_cliente INTEGER NOT NULL,
+                            itens TEXT NOT NULL,
+                            sessao TEXT,
+                            criada_em TEXT NOT NULL,
+                            situacao TEXT NOT NULL DEFAULT 'pendente',
+                            tentativas INTEGER NOT NULL DEFAULT 0,
+                            erro TEXT,
+                            id_venda INTEGER,
+                            enviada_em TEXT)""")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_venda_pendente_situacao ON venda_pendente (situacao, criada_em)")
+        _conn = conn
+    return _conn
+
+def _agora():
+    return datetime.now().isoformat(sep=" ", timespec="seconds")
+
+def _registro(row):
+    venda = dict(row)
+    venda["itens"] = [tuple(it) for it in json.loads(venda["itens"])]
+    return venda
+
+def fechar():
+    """Fecha a conexão com o diário (a próxima chamada reabre)."""
+    global _conn
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+def registrar(id_cliente, itens, sessao=None, enviar_depois=False):
+    """
+    Grava uma venda no diário (não acessa o banco central).
+
+    Parameters
+    ----------
+    id_cliente : int
+        Cliente da venda.
+    itens : list[tuple]
+        (id_produto, quantidade) ou (id_produto, quantidade, preço mostrado
+        na tela); o preço fica só como referência.
+    sessao : str, optional
+        Sessão do carrinho (``reservas``), cujas reservas viram a venda.
+    enviar_depois : bool
+        Quem registra vai chamar ``enviar`` em seguida: até lá o reenvio em
+        segundo plano não pega a venda (ela seria enviada como reenvio, com
+        a data do caixa, e o ``enviar`` não saberia o resultado).
+
+    Returns
+    -------
+    str
+        Chave de idempotência da venda.
+    """
+    chave = uuid.uuid4().hex
+    itens = [[it[0], it[1]] + ([str(it[2])] if len(it) > 2 and it[2] is not None else []) for it in itens]
+    with _lock:
+        _conexao().execute(
+            "INSERT INTO venda_pendente (chave, id_cliente, itens, sessao, criada_em) VALUES (?, ?, ?, ?, ?)",
+            (chave, id_cliente, json.dumps(itens), sessao, _agora())
+        )
+        if enviar_depois:
+            _reservadas.add(chave)
+    return chave
+
+def buscar(chave):
+    with _lock:
+        row = _conexao().execute("SELECT * FROM venda_pendente WHERE chave = ?", (chave,)).fetchone()
+    return _registro(row) if row else None
+
+def _marcar(chave, situacao, id_venda=None, erro=None):
+    with _lock:
+        _conexao().execute(
+            """UPDATE venda_pendente SET situacao = ?, id_venda = ?, erro = ?, tentativas = tentativas + 1,
+                   enviada_em = CASE WHEN ? = 'enviada' THEN ? ELSE enviada_em END
+               WHERE chave = ?""",
+            (situacao, id_venda, erro, situacao, _agora(), chave)
+        )
+
+def enviar(chave, reenvio=False):
+    """
+    Envia uma venda do diário ao banco central.
+
+    No envio logo após o registro vale a hora do servidor; num reenvio
+    (``reenvio=True`` ou depois de uma tentativa que falhou), a data da
+    venda é a do registro no caixa.
+
+    Returns
+    -------
+    int | None | str
+        Id da venda no banco, None se o banco não pôde ser alcançado (a
+        venda continua pendente) ou ``EM_ENVIO`` se outra chamada já está
+        enviando essa venda.
+
+    Raises
+    ------
+    Exception
+        O erro do banco ao recusar a venda (ex: estoque insuficiente); ela
+        fica como conflito no diário.
+    """
+    venda = buscar(chave)
+    if venda is None:
+        raise ValueError(f"Venda {chave} não está no diário.")
+    if venda["situacao"] == ENVIADA:
+        return venda["id_venda"]
+    with _lock:
+        if chave in _reservadas:
+            _reservadas.discard(chave) # quem registrou assume o envio
+        elif chave in _em_envio:
+            return EM_ENVIO
+        _em_envio.add(chave)
+    try:
+        data_venda = venda["criada_em"] if reenvio or venda["tentativas"] else None
+        try:
+            id_venda = repo.inserir_venda(venda["id_cliente"], venda["itens"], sessao=venda["sessao"],
+                                          chave=chave, data_venda=data_venda)
+        except Exception as e:
+            if db.servidor_indisponivel(e):
+                _marcar(chave, PENDENTE, erro=str(e))
+                return None
+            # Gravada por outro envio ao mesmo tempo (índice único da chave)?
+            try:
+                id_venda = repo.buscar_venda_por_chave(chave)
+            except Exception as e2:
+                if not db.servidor_indisponivel(e2):
+                    raise
+                _marcar(chave, PENDENTE, erro=str(e2))
+                return None
+            if id_venda is None:
+                _marcar(chave, CONFLITO, erro=str(e))
+                raise e
+        _marcar(chave, ENVIADA, id_venda=id_venda)
+        return id_venda
+    finally:
+        with _lock:
+            _em_envio.discard(chave)
+
+def reenviar(limite=LOTE_REENVIO):
+    """
+    Envia as vendas pendentes mais antigas (até ``limite``), uma transação
+    por venda; para no primeiro sinal de que o banco continua fora do ar.
+    Pula as vendas que outra chamada está enviando (ou vai enviar:
+    ``registrar(..., enviar_depois=True)``).
+    Também apaga as vendas enviadas há mais de ``DIAS_HISTORICO`` dias.
+
+    Returns
+    -------
+    dict
+        ``enviadas`` (ids no banco), ``conflitos`` (vendas recusadas neste
+        reenvio, com o ``erro``) e ``pendentes`` (o que ainda falta enviar).
+    """
+    with _lock:
+        chaves = [r["chave"] for r in _conexao().execute(
+            "SELECT chave FROM venda_pendente WHERE situacao = ? ORDER BY criada_em, rowid LIMIT ?",
+            (PENDENTE, limite + len(_reservadas) + len(_em_envio)))
+            if r["chave"] not in _reservadas and r["chave"] not in _em_envio][:limite]
+    enviadas, recusadas = [], []
+    for chave in chaves:
+        try:
+            id_venda = enviar(chave, reenvio=True)
+        except Exception:
+            recusadas.append(buscar(chave))
+            continue
+        if id_venda is None:
+            break # banco fora do ar: tenta de novo no próximo reenvio
+        if id_venda != EM_ENVIO:
+            enviadas.append(id_venda)
+
+    limite_historico = (datetime.now() - timedelta(days=DIAS_HISTORICO)).isoformat(sep=" ", timespec="seconds")
+    with _lock:
+        _conexao().execute("DELETE FROM venda_pendente WHERE situacao = ? AND enviada_em < ?",
+                           (ENVIADA, limite_historico))
+    return {"enviadas": enviadas, "conflitos": recusadas, "pendentes": contar()[PENDENTE]}
+
+def descartar(chave):
+    """Tira uma venda do diário (conflito conferido, ou venda recusada na hora)."""
+    with _lock:
+        _conexao().execute("DELETE FROM venda_pendente WHERE chave = ? AND situacao <> ?", (chave, ENVIADA))
+
+def contar():
+    """Quantidade de vendas no diário por situação."""
+    with _lock:
+        rows = _conexao().execute("SELECT situacao, COUNT(*) AS qtd FROM venda_pendente GROUP BY situacao")
+        qtd = {PENDENTE: 0, ENVIADA: 0, CONFLITO: 0}
+        qtd.update({r["situacao"]: r["qtd"] for r in rows})
+    return qtd
+
+def nao_enviadas():
+    """Vendas pendentes e em conflito, das mais antigas para as mais novas."""
+    with _lock:
+        rows = _conexao().execute(
+            "SELECT * FROM venda_pendente WHERE situacao <> ? ORDER BY criada_em, rowid", (ENVIADA,)).fetchall()
+    return [_registro(r) for r in rows]
+
+def conflitos():
+    """Vendas recusadas pelo banco, para conferência."""
+    return [v for v in nao_enviadas() if v["situacao"] == CONFLITO]
+
+def iterar_nao_enviadas():
+    """Linhas do relatório de vendas não enviadas (uma por venda)."""
+    for v in nao_enviadas():
+        yield {"criada_em": v["criada_em"], "chave": v["chave"], "id_cliente": v["id_cliente"],
+               "itens": len(v["itens"]), "quantidade": sum(it[1] for it in v["itens"]),
+               "situacao": v["situacao"], "tentativas": v["tentativas"], "erro": v["erro"] or ""}
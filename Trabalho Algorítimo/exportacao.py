@@ -0,0 +1,168 @@
+"""
+Módulo exportacao
+-----------------
+Exporta relatórios para CSV ou XLSX direto do cursor do banco.
+
+As linhas são lidas de um iterador (``repository.iterar_*``) e gravadas
+uma a uma, então a memória usada não depende do tamanho do relatório. O
+XLSX usa o modo ``write_only`` do openpyxl (instalado à parte:
+``pip install openpyxl``); o CSV não depende de nada.
+
+O arquivo é gravado com a extensão ``.parcial`` e só é renomeado no fim,
+assim uma exportação cancelada ou com erro não deixa um arquivo pela metade.
+"""
+
+import csv
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+# Colunas de cada relatório: (campo do registro, título)
+COLUNAS_HISTORICO_CLIENTE = [
+    ("id_venda", "Venda"), ("data_venda", "Data"), ("valor_total", "Total da venda"),
+    ("produto", "Produto"), ("quantidade", "Quantidade"), ("preco_unitario", "Preço unitário"),
+    ("subtotal", "Subtotal"),
+]
+COLUNAS_HISTORICO_PRODUTO = [
+    ("id_venda", "Venda"), ("data_venda", "Data"), ("cliente", "Cliente"),
+    ("valor_total", "Total da venda"), ("quantidade", "Quantidade"),
+    ("preco_unitario", "Preço unitário"), ("subtotal", "Subtotal"),
+]
+COLUNAS_HISTORICO_PERIODO = [
+    ("id_venda", "Venda"), ("data_venda", "Data"), ("cliente", "Cliente"), ("valor_total", "Total"),
+]
+COLUNAS_ESTOQUE_BAIXO = [
+    ("id_produto", "ID"), ("nome", "Produto"), ("categoria", "Categoria"), ("fornecedor", "Fornecedor"),
+    ("quantidade", "Quantidade"), ("estoque_minimo", "Estoque mínimo"),
+]
+COLUNAS_CURVA_ABC = [
+    ("posicao", "Posição"), ("id_produto", "ID"), ("nome", "Produto"), ("classe", "Classe"),
+    ("quantidade", "Quantidade"), ("receita", "Receita"), ("participacao", "% da receita"),
+    ("acumulado", "% acumulado"), ("custo", "Custo"), ("margem", "Margem"), ("margem_pct", "% margem"),
+]
+COLUNAS_TOP_CLIENTES = [
+    ("posicao", "Posição"), ("id_cliente", "ID"), ("nome", "Cliente"), ("qtd_vendas", "Vendas"),
+    ("receita", "Receita"), ("participacao", "% da receita"),
+]
+COLUNAS_REPOSICAO = [
+    ("fornecedor", "Fornecedor"), ("id_produto", "ID"), ("nome", "Produto"), ("estoque", "Estoque"),
+    ("demanda_media", "Demanda diária"), ("demanda_desvio", "Desvio diário"), ("prazo", "Prazo (dias)"),
+    ("seguranca", "Estoque de segurança"), ("ponto_pedido", "Ponto de pedido"), ("sugestao", "Comprar"),
+]
+COLUNAS_ESTOQUE_EM = [("id_produto", "ID"), ("nome", "Produto"), ("quantidade", "Quantidade")]
+COLUNAS_DIVERGENCIAS = [
+    ("id_produto", "ID"), ("nome", "Produto"), ("quantidade", "Estoque"), ("saldo", "Saldo do livro"),
+    ("diferenca", "Diferença"),
+]
+COLUNAS_VENDAS_OFFLINE = [
+    ("criada_em", "Registrada em"), ("chave", "Chave"), ("id_cliente", "ID Cliente"), ("itens", "Itens"),
+    ("quantidade", "Quantidade"), ("situacao", "Situação"), ("tentativas", "Tentativas"), ("erro", "Erro"),
+]
+
+# A cada quantas linhas o progresso é informado
+INTERVALO_PROGRESSO = 1000
+
+
+class ExportacaoCancelada(Exception):
+    """A exportação foi interrompida pelo usuário."""
+
+
+def _valor_csv(valor):
+    """Formata para o Excel em português (vírgula decimal, data legível)."""
+    if valor is None:
+        return ""
+    if isinstance(valor, (Decimal, float)):
+        return f"{valor:.2f}".replace(".", ",")
+    if isinstance(valor, datetime):
+        return valor.strftime("%d/%m/%Y %H:%M:%S")
+    if isinstance(valor, date):
+        return valor.strftime("%d/%m/%Y")
+    return valor
+
+def _gravar_csv(caminho, linhas, colunas, passo):
+    # utf-8-sig e ";" para o Excel abrir com acentos e colunas certas
+    with open(caminho, "w", newline="", encoding="utf-8-sig") as f:
+        escritor = csv.writer(f, delimiter=";")
+        escritor.writerow([titulo for _, titulo in colunas])
+        for row in linhas:
+            escritor.writerow([_valor_csv(row.get(campo)) for campo, _ in colunas])
+            passo()
+
+def _gravar_xlsx(caminho, linhas, colunas, passo, titulo):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise RuntimeError("A exportação para XLSX precisa do pacote openpyxl (pip install openpyxl).")
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=(titulo or "Relatório")[:31])
+    ws.append([t for _, t in colunas])
+    for row in linhas:
+        ws.append([row.get(campo) for campo, _ in colunas])
+        passo()
+    wb.save(caminho)
+
+def exportar(linhas, colunas, caminho, progresso=None, cancelado=None, titulo=None):
+    """
+    Grava as linhas de um relatório em CSV ou XLSX (pela extensão do arquivo).
+
+    Parameters
+    ----------
+    linhas : iterable[dict]
+        Registros do relatório (de preferência um gerador do ``iter_rows``).
+    colunas : list[tuple[str, str]]
+        (campo, título) das colunas, na ordem do arquivo.
+    caminho : str
+        Arquivo de destino (``.csv`` ou ``.xlsx``).
+    progresso : callable, optional
+        Recebe a quantidade de linhas já gravadas (a cada ``INTERVALO_PROGRESSO``).
+    cancelado : threading.Event, optional
+        Se for sinalizado, a exportação para e o arquivo não é criado.
+    titulo : str, optional
+        Nome da planilha (XLSX).
+
+    Returns
+    -------
+    int
+        Quantidade de linhas exportadas.
+
+    Raises
+    ------
+    ExportacaoCancelada
+        Se ``cancelado`` for sinalizado durante a gravação.
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in (".csv", ".xlsx"):
+        raise ValueError("Formato não suportado: use .csv ou .xlsx.")
+
+    total = 0
+
+    def passo():
+        nonlocal total
+        total += 1
+        if total % INTERVALO_PROGRESSO == 0:
+            if cancelado is not None and cancelado.is_set():
+                raise ExportacaoCancelada()
+            if progresso:
+                progresso(total)
+
+    parcial = caminho + ".parcial"
+    try:
+        if extensao == ".csv":
+            _gravar_csv(parcial, linhas, colunas, passo)
+        else:
+            _gravar_xlsx(parcial, linhas, colunas, passo, titulo)
+        if cancelado is not None and cancelado.is_set():
+            raise ExportacaoCancelada()
+        os.replace(parcial, caminho)
+    except BaseException:
+        if os.path.exists(parcial):
+            os.remove(parcial)
+        raise
+    finally:
+        # Fecha o cursor do gerador (devolve a conexão) mesmo se interrompido
+        if hasattr(linhas, "close"):
+            linhas.close()
+    if progresso:
+        progresso(total)
+    return total
@@ -0,0 +1,280 @@
+"""
+Módulo gerador_dados
+--------------------
+Popula o banco com dados sintéticos em volume configurável, para
+benchmarks (``benchmark.py``) e testes de carga.
+
+Os registros são inseridos em lote (``executemany``) com ids explícitos,
+continuando a partir do maior id de cada tabela. Clientes e fornecedores
+são distribuídos pelos estados conforme a população de cada um, e as
+vendas se concentram nos produtos mais populares.
+
+Uso: ``python gerador_dados.py --perfil pequeno`` (com o backend do .env).
+"""
+
+import argparse
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import agregados
+import movimentos
+from db import get_conn
+
+# Volumes padrão (~5 milhões de itens de venda)
+VOLUMES_PADRAO = {
+    "fornecedores": 200,
+    "produtos": 10_000,
+    "clientes": 100_000,
+    "cidades": 2_000,
+    "vendas": 1_000_000,
+    "itens_por_venda": 5,
+    "dias": 365,
+}
+
+PERFIS = {
+    "pequeno": {"fornecedores": 20, "produtos": 500, "clientes": 2_000, "cidades": 200,
+                "vendas": 10_000, "itens_por_venda": 3, "dias": 90},
+    "medio": {"fornecedores": 100, "produtos": 5_000, "clientes": 20_000, "cidades": 1_000,
+              "vendas": 200_000, "itens_por_venda": 4, "dias": 365},
+    "grande": VOLUMES_PADRAO,
+}
+
+# Participação aproximada de cada estado na população brasileira (%)
+POPULACAO_ESTADOS = {
+    "SP": 21.9, "MG": 10.0, "RJ": 7.9, "BA": 6.9, "PR": 5.6, "RS": 5.3, "PE": 4.5,
+    "CE": 4.3, "PA": 4.0, "SC": 3.7, "GO": 3.5, "MA": 3.3, "PB": 2.0, "AM": 1.9,
+    "ES": 1.9, "MT": 1.8, "RN": 1.6, "PI": 1.6, "AL": 1.5, "DF": 1.4, "MS": 1.4,
+    "SE": 1.1, "RO": 0.8, "TO": 0.7, "AC": 0.4, "AP": 0.4, "RR": 0.3,
+}
+
+CAPITAIS = {
+    "AC": "Rio Branco", "AL": "Maceió", "AP": "Macapá", "AM": "Manaus", "BA": "Salvador",
+    "CE": "Fortaleza", "DF": "Brasília", "ES": "Vitória", "GO": "Goiânia", "MA": "São Luís",
+    "MT": "Cuiabá", "MS": "Campo Grande", "MG": "Belo Horizonte", "PA": "Belém",
+    "PB": "João Pessoa", "PR": "Curitiba", "PE": "Recife", "PI": "Teresina",
+    "RJ": "Rio de Janeiro", "RN": "Natal", "RS": "Porto Alegre", "RO": "Porto Velho",
+    "RR": "Boa Vista", "SC": "Florianópolis", "SP": "São Paulo", "SE": "Aracaju", "TO": "Palmas",
+}
+
+CATEGORIAS = ["Grãos", "Bebidas", "Laticínios", "Limpeza", "Higiene", "Mercearia",
+              "Congelados", "Hortifruti", "Padaria", "Pet"]
+NOMES = ["Ana", "Bruno", "Carla", "Diego", "Eduarda", "Felipe", "Gabriela", "Higor", "Isabela",
+         "João", "Larissa", "Marcos", "Natália", "Otávio", "Paula", "Rafael", "Sofia", "Thiago"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves",
+              "Pereira", "Lima", "Gomes", "Ribeiro", "Carvalho", "Andrade", "Martins"]
+
+# Estoque de cada produto gerado (as vendas geradas não o baixam)
+ESTOQUE_INICIAL = 1_000_000
+# Linhas por executemany/commit
+TAMANHO_LOTE = 5_000
+
+
+def _proximo_id(cur, tabela, coluna):
+    cur.execute(f"SELECT COALESCE(MAX({coluna}), 0) FROM {tabela}")
+    return int(cur.fetchone()[0]) + 1
+
+def _inserir(conn, cur, sql, linhas):
+    """Insere ``linhas`` (iterável) em lotes, com commit a cada lote."""
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= TAMANHO_LOTE:
+            cur.executemany(sql, lote)
+            conn.commit()
+            lote = []
+    if lote:
+        cur.executemany(sql, lote)
+        conn.commit()
+
+def _centavos(valor):
+    return Decimal(valor) / 100
+
+def _indice_popular(rng, n):
+    """Índice em [0, n) com viés para os primeiros (poucos itens vendem muito)."""
+    return int(n * rng.random() ** 3)
+
+def _gerar_cidades(conn, cur, rng, quantidade):
+    """Cria as cidades por estado (proporcional à população); retorna ids e pesos."""
+    cur.execute("SELECT id_estado, sigla FROM estado")
+    estados = {sigla: id_estado for id_estado, sigla in cur.fetchall()}
+    total_pop = sum(POPULACAO_ESTADOS.get(s, 0.5) for s in estados)
+
+    proximo = _proximo_id(cur, "cidade", "id_cidade")
+    linhas, ids, pesos = [], [], []
+    for sigla, id_estado in sorted(estados.items()):
+        populacao = POPULACAO_ESTADOS.get(sigla, 0.5)
+        qtd = max(1, round(quantidade * populacao / total_pop))
+        for i in range(qtd):
+            nome = CAPITAIS.get(sigla, f"Capital {sigla}") if i == 0 else f"Cidade {sigla} {i:04d}"
+            linhas.append((proximo, nome, id_estado))
+            ids.append(proximo)
+            # Dentro do estado, a população cai com o "tamanho" da cidade (Zipf)
+            pesos.append(populacao / (i + 1))
+            proximo += 1
+    _inserir(conn, cur, "INSERT INTO cidade (id_cidade, nome, id_estado) VALUES (%s, %s, %s)", linhas)
+    return ids, pesos
+
+def _gerar_pessoas(conn, cur, rng, tabela, coluna, quantidade, cidades, pesos):
+    """Cria clientes ou fornecedores, cada um com um endereço; retorna os ids."""
+    id_endereco = _proximo_id(cur, "endereco", "id_endereco")
+    id_pessoa = _proximo_id(cur, tabela, coluna)
+    cidades_sorteadas = rng.choices(cidades, weights=pesos, k=quantidade)
+
+    enderecos = ((id_endereco + i, f"Rua {rng.choice(SOBRENOMES)}", str(rng.randint(1, 3000)),
+                  "Centro", f"{rng.randint(10000000, 99999999)}", cidades_sorteadas[i])
+                 for i in range(quantidade))
+    _inserir(conn, cur, """INSERT INTO endereco (id_endereco, rua, numero, bairro, cep, id_cidade)
+                           VALUES (%s, %s, %s, %s, %s, %s)""", enderecos)
+
+    def pessoa(i):
+        nome = f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {i}"
+        if tabela == "fornecedor":
+            nome = f"Distribuidora {rng.choice(SOBRENOMES)} {i}"
+        return (id_pessoa + i, nome, f"(31) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+                f"contato{id_pessoa + i}@exemplo.com.br", id_endereco + i)
+    _inserir(conn, cur, f"""INSERT INTO {tabela} ({coluna}, nome, telefone, email, id_endereco)
+                            VALUES (%s, %s, %s, %s, %s)""", (pessoa(i) for i in range(quantidade)))
+    return list(range(id_pessoa, id_pessoa + quantidade))
+
+def _gerar_produtos(conn, cur, rng, quantidade, fornecedores, desde):
+    """
+    Cria os produtos; retorna lista de (id_produto, preço).
+
+    O estoque inicial entra no livro de movimentações (``movimentos``) em
+    ``desde``, o começo do período das vendas (que não baixam o estoque).
+    """
+    proximo = _proximo_id(cur, "produto", "id_produto")
+    produtos = [(proximo + i, _centavos(rng.randint(150, 50_000))) for i in range(quantidade)]
+    linhas = ((id_produto, f"Produto {id_produto} {rng.choice(CATEGORIAS)}", rng.choice(CATEGORIAS), preco,
+               ESTOQUE_INICIAL, rng.randint(1, 50), rng.choice(fornecedores))
+              for id_produto, preco in produtos)
+    _inserir(conn, cur, """INSERT INTO produto (id_produto, nome, categoria, preco, quantidade,
+                                                estoque_minimo, id_fornecedor)
+                           VALUES (%s, %s, %s, %s, %s, %s, %s)""", linhas)
+    _inserir(conn, cur, """INSERT INTO movimento_estoque (id_produto, data_movimento, quantidade, tipo)
+                           VALUES (%s, %s, %s, %s)""",
+             ((id_produto, desde, ESTOQUE_INICIAL, movimentos.INICIAL) for id_produto, _ in produtos))
+    return produtos
+
+def _gerar_vendas(conn, cur, rng, quantidade, itens_por_venda, dias, clientes, produtos):
+    """Cria as vendas e seus itens, lote a lote (sem manter tudo em memória)."""
+    id_venda = _proximo_id(cur, "venda", "id_venda")
+    fim = datetime.now().replace(microsecond=0)
+    inicio = fim - timedelta(days=dias)
+    segundos = int((fim - inicio).total_seconds())
+
+    sql_venda = "INSERT INTO venda (id_venda, id_cliente, data_venda, valor_total) VALUES (%s, %s, %s, %s)"
+    sql_item = """INSERT INTO produto_venda (id_venda, id_produto, quantidade, preco_unitario, subtotal)
+                  VALUES (%s, %s, %s, %s, %s)"""
+    feitas = 0
+    while feitas < quantidade:
+        vendas, itens = [], []
+        for _ in range(min(TAMANHO_LOTE, quantidade - feitas)):
+            total = Decimal(0)
+            # Entre 1 e 2*média-1 itens: a média fica em itens_por_venda
+            for _ in range(rng.randint(1, max(1, 2 * itens_por_venda - 1))):
+                id_produto, preco = produtos[_indice_popular(rng, len(produtos))]
+                qtd = rng.randint(1, 10)
+                itens.append((id_venda, id_produto, qtd, preco, qtd * preco))
+                total += qtd * preco
+            data = inicio + timedelta(seconds=rng.randrange(segundos))
+            vendas.append((id_venda, rng.choice(clientes), data, total))
+            id_venda += 1
+        cur.executemany(sql_venda, vendas)
+        for i in range(0, len(itens), TAMANHO_LOTE):
+            cur.executemany(sql_item, itens[i:i + TAMANHO_LOTE])
+        conn.commit()
+        feitas += len(vendas)
+        yield feitas
+
+def gerar(volumes=None, semente=42, log=None):
+    """
+    Popula o banco com dados sintéticos.
+
+    Parameters
+    ----------
+    volumes : dict, optional
+        Quantidades por entidade (chaves de ``VOLUMES_PADRAO``); as
+        omitidas usam o padrão.
+    semente : int
+        Semente do gerador aleatório (mesma semente, mesmos dados).
+    log : callable, optional
+        Recebe mensagens de progresso.
+
+    Returns
+    -------
+    dict
+        Ids gerados: "clientes", "fornecedores", "produtos" (listas de ids),
+        "cidades" e o período das vendas ("inicio", "fim").
+    """
+    v = {**VOLUMES_PADRAO, **(volumes or {})}
+    rng = random.Random(semente)
+    log = log or (lambda msg: None)
+
+    conn = get_conn()
+    cur = None
+    try:
+        cur = conn.cursor(buffered=True)
+        log(f"Gerando {v['cidades']} cidades...")
+        cidades, pesos = _gerar_cidades(conn, cur, rng, v["cidades"])
+        log(f"Gerando {v['fornecedores']} fornecedores...")
+        fornecedores = _gerar_pessoas(conn, cur, rng, "fornecedor", "id_fornecedor",
+                                      v["fornecedores"], cidades, pesos)
+        log(f"Gerando {v['clientes']} clientes...")
+        clientes = _gerar_pessoas(conn, cur, rng, "cliente", "id_cliente", v["clientes"], cidades, pesos)
+        log(f"Gerando {v['produtos']} produtos...")
+        produtos = _gerar_produtos(conn, cur, rng, v["produtos"], fornecedores,
+                                   datetime.now().replace(microsecond=0) - timedelta(days=v["dias"]))
+
+        log(f"Gerando {v['vendas']} vendas (~{v['vendas'] * v['itens_por_venda']} itens)...")
+        passo = max(1, v["vendas"] // 10)
+        ultimo = 0
+        for feitas in _gerar_vendas(conn, cur, rng, v["vendas"], v["itens_por_venda"], v["dias"],
+                                    clientes, produtos):
+            if feitas - ultimo >= passo or feitas == v["vendas"]:
+                log(f"  {feitas}/{v['vendas']} vendas")
+                ultimo = feitas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if cur is not None:
+            cur.close()
+        conn.close()
+
+    log("Recalculando totais diários...")
+    agregados.reconstruir()
+    fim = datetime.now()
+    return {
+        "clientes": clientes,
+        "fornecedores": fornecedores,
+        "produtos": [id_produto for id_produto, _ in produtos],
+        "cidades": cidades,
+        "inicio": fim - timedelta(days=v["dias"]),
+        "fim": fim,
+    }
+
+def argumentos_volumes(parser):
+    """Adiciona ao ``parser`` as opções de volume (--perfil, --produtos, ...)."""
+    parser.add_argument("--perfil", choices=sorted(PERFIS), default="pequeno",
+                        help="volumes pré-definidos (padrão: pequeno)")
+    for chave in VOLUMES_PADRAO:
+        parser.add_argument(f"--{chave.replace('_', '-')}", dest=chave, type=int,
+                            help=f"sobrepõe o volume de {chave}")
+    parser.add_argument("--semente", type=int, default=42)
+
+def volumes_dos_argumentos(args):
+    """Volumes do perfil escolhido, com as sobreposições da linha de comando."""
+    volumes = dict(PERFIS[args.perfil])
+    for chave in VOLUMES_PADRAO:
+        if getattr(args, chave, None) is not None:
+            volumes[chave] = getattr(args, chave)
+    return volumes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Popula o banco com dados sintéticos.")
+    argumentos_volumes(parser)
+    args = parser.parse_args()
+    gerar(volumes_dos_argumentos(args), semente=args.semente, log=print)
@@ -0,0 +1,83 @@
+"""
+Módulo importacao
+-----------------
+Lê arquivos CSV de entrada de mercadorias (notas com centenas de linhas)
+para ``repository.registrar_entrada``.
+
+Cada linha tem ``id_produto;quantidade;preco_compra`` (o preço é
+opcional). Aceita o CSV do Excel em português (";" e vírgula decimal,
+como o gravado por ``exportacao``) ou com "," e ponto decimal, com ou sem
+linha de cabeçalho.
+"""
+
+import csv
+from decimal import Decimal, InvalidOperation
+
+# Erros listados na mensagem (o resto é só contado)
+MAX_ERROS = 20
+
+
+def _inteiro(texto, campo):
+    try:
+        return int(texto)
+    except ValueError:
+        raise ValueError(f"{campo} inválido: '{texto}'")
+
+def ler_preco(texto):
+    """Preço digitado ("12,50", "1.234,56", "R$ 3.99") em ``Decimal``."""
+    valor = texto.replace("R$", "").replace(" ", "")
+    if "," in valor:
+        # 1.234,56 -> 1234.56
+        valor = valor.replace(".", "").replace(",", ".")
+    try:
+        preco = Decimal(valor)
+    except InvalidOperation:
+        preco = None
+    if preco is None or not preco.is_finite() or preco < 0:
+        raise ValueError(f"preço inválido: '{texto}'")
+    return preco
+
+def ler_entrada_csv(caminho):
+    """
+    Lê as linhas de uma entrada de mercadorias.
+
+    Returns
+    -------
+    list[tuple]
+        (id_produto, quantidade, preco_compra ou None) de cada linha.
+
+    Raises
+    ------
+    ValueError
+        Com o número de cada linha inválida (nada é retornado).
+    """
+    with open(caminho, newline="", encoding="utf-8-sig") as f:
+        amostra = f.readline()
+        f.seek(0)
+        delimitador = ";" if ";" in amostra else ","
+        itens, erros = [], []
+        for num, campos in enumerate(csv.reader(f, delimiter=delimitador), start=1):
+            campos = [c.strip() for c in campos]
+            if not any(campos):
+                continue
+            if num == 1 and not campos[0].isdigit():
+                continue # cabeçalho
+            try:
+                if len(campos) < 2:
+                    raise ValueError("informe id do produto e quantidade")
+                id_produto = _inteiro(campos[0], "id do produto")
+                qtd = _inteiro(campos[1], "quantidade")
+                if qtd <= 0:
+                    raise ValueError("quantidade deve ser maior que zero")
+                preco = ler_preco(campos[2]) if len(campos) > 2 and campos[2] else None
+            except ValueError as e:
+                erros.append(f"linha {num}: {e}")
+                continue
+            itens.append((id_produto, qtd, preco))
+
+    if erros:
+        extra = f"\n... e mais {len(erros) - MAX_ERROS}" if len(erros) > MAX_ERROS else ""
+        raise ValueError("Arquivo com linhas inválidas:\n" + "\n".join(erros[:MAX_ERROS]) + extra)
+    if not itens:
+        raise ValueError("Nenhum item encontrado no arquivo.")
+    return itens
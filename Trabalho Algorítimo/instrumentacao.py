@@ -0,0 +1,302 @@
+"""
+Módulo instrumentacao
+---------------------
+Medição das consultas ao banco.
+
+O ``db`` entrega cada conexão embrulhada em ``ConexaoInstrumentada``: os
+cursores medem o tempo de cada comando (execução + leitura das linhas), a
+quantidade de linhas e o local do código que o disparou, e avisam os
+observadores registrados com ``db.adicionar_observador``. Um observador é
+qualquer objeto com os métodos ``consulta(sql, duracao, linhas, local)`` e
+``conexao(duracao)`` (tempo para obter a conexão do pool).
+
+Observadores prontos:
+
+- ``Coletor``: agrega por comando (histograma de latência, linhas,
+  locais de chamada); é o que alimenta a aba "Diagnóstico";
+- ``LogConsultasLentas``: grava num arquivo os comandos acima de um limite.
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+
+# Limites (ms) das faixas do histograma de latência; a última faixa é "acima de 2500"
+FAIXAS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Arquivos que não contam como "local da chamada"
+_ARQUIVOS_INTERNOS = {"db.py", "db_sqlite.py", "instrumentacao.py", "tarefas.py"}
+
+_origem = threading.local()
+
+
+# region Local da chamada
+def _local_do_frame(frame):
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+def local_chamada(profundidade=1, pular_privadas=False):
+    """
+    Descreve quem está chamando, ignorando os módulos de acesso ao banco.
+
+    Parameters
+    ----------
+    profundidade : int
+        Quantos frames do chamador incluir (do mais interno para fora).
+    pular_privadas : bool
+        Ignora funções ``_privadas`` (ex: ``GradeVirtual._executar``).
+
+    Returns
+    -------
+    str
+        Ex: "repository.py:64 listar_produtos_pagina".
+    """
+    frame = sys._getframe(1)
+    locais = []
+    while frame is not None and len(locais) < profundidade:
+        nome = frame.f_code.co_name
+        if (os.path.basename(frame.f_code.co_filename) not in _ARQUIVOS_INTERNOS
+                and not (pular_privadas and nome.startswith("_"))):
+            locais.append(_local_do_frame(frame))
+        frame = frame.f_back
+    return " < ".join(locais)
+
+def definir_origem(origem):
+    """
+    Define a origem (tela/ação) das consultas feitas pela thread atual.
+
+    Usado pelo ``ExecutorTk``: a consulta roda numa thread de trabalho, mas
+    a origem registrada é o código da interface que a agendou.
+    """
+    _origem.valor = origem
+
+def origem_atual():
+    return getattr(_origem, "valor", None)
+#endregion
+
+
+@lru_cache(maxsize=1024)
+def normalizar_sql(sql):
+    """
+    Forma canônica de um comando, para agrupar execuções equivalentes.
+
+    Espaços são colapsados e listas ``IN (%s,%s,...)`` viram ``IN (...)``.
+    """
+    sql = " ".join(sql.split())
+    return re.sub(r"IN \((?:%s,\s*)*%s\)", "IN (...)", sql, flags=re.IGNORECASE)
+
+
+# region Conexão e cursor instrumentados
+class CursorInstrumentado:
+    """
+    Cursor que mede cada comando.
+
+    O comando só é registrado quando o próximo começa ou o cursor é
+    fechado, para incluir o tempo de leitura das linhas (``fetch*``).
+    """
+
+    def __init__(self, cur, observadores):
+        self._cur = cur
+        self._observadores = observadores
+        self._atual = None   # [sql, duração, linhas lidas, local]
+
+    def __getattr__(self, nome):
+        return getattr(self._cur, nome)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def _registrar(self):
+        if self._atual is None:
+            return
+        sql, duracao, linhas, local = self._atual
+        self._atual = None
+        if linhas is None:
+            try:
+                linhas = max(self._cur.rowcount, 0)
+            except Exception:
+                linhas = 0
+        for obs in self._observadores:
+            try:
+                obs.consulta(sql, duracao, linhas, local)
+            except Exception:
+                pass
+
+    def _rodar(self, metodo, sql, *args):
+        self._registrar()
+        local = local_chamada(pular_privadas=True)
+        origem = origem_atual()
+        if origem:
+            local = f"{local} < {origem}"
+        inicio = time.perf_counter()
+        try:
+            return metodo(sql, *args)
+        finally:
+            self._atual = [sql, time.perf_counter() - inicio, None, local]
+
+    def execute(self, query, params=None):
+        return self._rodar(self._cur.execute, query, params)
+
+    def executemany(self, query, seq_params):
+        return self._rodar(self._cur.executemany, query, seq_params)
+
+    def _ler(self, metodo, *args):
+        inicio = time.perf_counter()
+        resultado = metodo(*args)
+        if self._atual is not None:
+            self._atual[1] += time.perf_counter() - inicio
+            if resultado is not None:
+                qtd = len(resultado) if isinstance(resultado, list) else 1
+                self._atual[2] = (self._atual[2] or 0) + qtd
+        return resultado
+
+    def fetchone(self):
+        return self._ler(self._cur.fetchone)
+
+    def fetchmany(self, size=1):
+        return self._ler(self._cur.fetchmany, size)
+
+    def fetchall(self):
+        return self._ler(self._cur.fetchall)
+
+    def close(self):
+        self._registrar()
+        return self._cur.close()
+
+
+class ConexaoInstrumentada:
+    """Conexão cujos cursores são instrumentados; o resto é repassado."""
+
+    def __init__(self, conn, observadores):
+        self._conn = conn
+        self._observadores = observadores
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+    def cursor(self, *args, **kwargs):
+        return CursorInstrumentado(self._conn.cursor(*args, **kwargs), self._observadores)
+
+    def close(self):
+        return self._conn.close()
+#endregion
+
+
+# region Observadores
+class _Estatistica:
+    __slots__ = ("chamadas", "tempo_total", "tempo_max", "linhas", "faixas", "locais")
+
+    def __init__(self):
+        self.chamadas = 0
+        self.tempo_total = 0.0
+        self.tempo_max = 0.0
+        self.linhas = 0
+        self.faixas = [0] * (len(FAIXAS_MS) + 1)
+        self.locais = Counter()
+
+    def adicionar(self, duracao, linhas=0, local=None):
+        ms = duracao * 1000
+        self.chamadas += 1
+        self.tempo_total += duracao
+        self.tempo_max = max(self.tempo_max, duracao)
+        self.linhas += linhas
+        i = 0
+        while i < len(FAIXAS_MS) and ms > FAIXAS_MS[i]:
+            i += 1
+        self.faixas[i] += 1
+        if local:
+            self.locais[local] += 1
+
+    def percentil_ms(self, p):
+        """Estimativa do percentil pelo histograma (limite superior da faixa)."""
+        alvo = self.chamadas * p / 100
+        acumulado = 0
+        for i, qtd in enumerate(self.faixas):
+            acumulado += qtd
+            if qtd and acumulado >= alvo:
+                return FAIXAS_MS[i] if i < len(FAIXAS_MS) else self.tempo_max * 1000
+        return 0.0
+
+    def resumo(self):
+        return {
+            "chamadas": self.chamadas,
+            "tempo_total_ms": self.tempo_total * 1000,
+            "media_ms": self.tempo_total / self.chamadas * 1000 if self.chamadas else 0.0,
+            "p95_ms": self.percentil_ms(95),
+            "max_ms": self.tempo_max * 1000,
+            "linhas": self.linhas,
+            "histograma": dict(zip([f"<={f}ms" for f in FAIXAS_MS] + [f">{FAIXAS_MS[-1]}ms"], self.faixas)),
+            "locais": self.locais.most_common(5),
+        }
+
+
+class Coletor:
+    """Agrega as consultas por comando (em memória)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self._lock:
+            self._por_sql = {}
+            self._conexoes = _Estatistica()
+            self.desde = datetime.now()
+
+    def consulta(self, sql, duracao, linhas, local):
+        chave = normalizar_sql(sql)
+        with self._lock:
+            est = self._por_sql.get(chave)
+            if est is None:
+                est = self._por_sql[chave] = _Estatistica()
+            est.adicionar(duracao, linhas, local)
+
+    def conexao(self, duracao):
+        with self._lock:
+            self._conexoes.adicionar(duracao)
+
+    def resumo(self, limite=20, ordenar="tempo_total_ms"):
+        """
+        Os comandos mais custosos.
+
+        Returns
+        -------
+        list[dict]
+            Um dicionário por comando ("sql" + as métricas), do maior para
+            o menor valor de ``ordenar``.
+        """
+        with self._lock:
+            itens = [{"sql": sql, **est.resumo()} for sql, est in self._por_sql.items()]
+        itens.sort(key=lambda r: r[ordenar], reverse=True)
+        return itens[:limite]
+
+    def resumo_conexoes(self):
+        """Tempo para obter conexões do backend (espera pelo pool)."""
+        with self._lock:
+            return self._conexoes.resumo()
+
+
+class LogConsultasLentas:
+    """Grava em arquivo os comandos que demoram mais que ``limite_ms``."""
+
+    def __init__(self, caminho, limite_ms=500):
+        self.caminho = caminho
+        self.limite = limite_ms / 1000
+        self._lock = threading.Lock()
+
+    def consulta(self, sql, duracao, linhas, local):
+        if duracao < self.limite:
+            return
+        linha = (f"{datetime.now().isoformat(sep=' ', timespec='seconds')} | {duracao * 1000:.1f} ms | "
+                 f"{linhas} linhas | {local} | {' '.join(sql.split())}\n")
+        with self._lock:
+            with open(self.caminho, "a", encoding="utf-8") as f:
+                f.write(linha)
+
+    def conexao(self, duracao):
+        pass
+#endregion
@@ -0,0 +1,166 @@
+"""
+Módulo migracoes
+----------------
+Migrações versionadas do schema do banco.
+
+Cada arquivo ``migracoes/NNN_descricao.sql`` é uma migração; o número
+``NNN`` é a versão. As versões já aplicadas ficam na tabela
+``schema_versao``. Os arquivos são escritos no dialeto MySQL e traduzidos
+quando o backend é o SQLite.
+
+Uso: ``python migracoes.py`` aplica as migrações pendentes.
+"""
+
+import re
+from pathlib import Path
+
+import db
+
+PASTA_MIGRACOES = Path(__file__).with_name("migracoes")
+
+# Bancos criados pelo db_programa.sql antigo já têm as migrações até esta versão
+VERSAO_BASE = 2
+
+_SQL_TABELA_VERSAO = """
+    CREATE TABLE IF NOT EXISTS schema_versao (
+        versao INT PRIMARY KEY,
+        nome VARCHAR(200) NOT NULL,
+        aplicada_em DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+class MigracaoPendenteError(RuntimeError):
+    """O banco não está na versão esperada pelo sistema."""
+
+
+def listar_migracoes(pasta=PASTA_MIGRACOES):
+    """
+    Lista os arquivos de migração em ordem de versão.
+
+    Returns
+    -------
+    list[tuple[int, str, Path]]
+        (versão, nome do arquivo, caminho).
+    """
+    migracoes = []
+    for caminho in Path(pasta).glob("*.sql"):
+        m = re.match(r"(\d+)_", caminho.name)
+        if m:
+            migracoes.append((int(m.group(1)), caminho.name, caminho))
+    return sorted(migracoes)
+
+def comandos_sql(texto):
+    """Separa um script SQL em comandos, ignorando comentários de linha."""
+    linhas = [l for l in texto.splitlines() if not l.strip().startswith("--")]
+    return [c.strip() for c in "\n".join(linhas).split(";") if c.strip()]
+
+def _traduzir(backend, comando):
+    if backend.nome == "sqlite":
+        from db_sqlite import traduzir_ddl
+        return traduzir_ddl(comando)
+    return comando
+
+def _tabela_existe(cur, tabela):
+    try:
+        cur.execute(f"SELECT 1 FROM {tabela} LIMIT 1")
+        cur.fetchall()
+        return True
+    except Exception:
+        return False
+
+def versoes_aplicadas(backend=None):
+    """Retorna o conjunto de versões já aplicadas no banco."""
+    backend = backend or db.get_backend()
+    conn = backend.obter()
+    try:
+        cur = conn.cursor()
+        if not _tabela_existe(cur, "schema_versao"):
+            return set()
+        cur.execute("SELECT versao FROM schema_versao")
+        return {row[0] for row in cur.fetchall()}
+    finally:
+        conn.close()
+
+def pendentes(backend=None):
+    """Migrações ainda não aplicadas, em ordem de versão."""
+    aplicadas = versoes_aplicadas(backend)
+    return [m for m in listar_migracoes() if m[0] not in aplicadas]
+
+def aplicar_pendentes(backend=None, log=None):
+    """
+    Aplica, em ordem, as migrações ainda não aplicadas.
+
+    Se o banco já tem as tabelas (criado pelo db_programa.sql antigo) mas
+    ainda não tem ``schema_versao``, as migrações até ``VERSAO_BASE`` são
+    apenas registradas como aplicadas.
+
+    Parameters
+    ----------
+    backend : optional
+        Backend do ``db`` (usa o global se omitido).
+    log : callable, optional
+        Recebe uma mensagem por migração aplicada.
+
+    Returns
+    -------
+    list[str]
+        Nomes das migrações aplicadas.
+    """
+    backend = backend or db.get_backend()
+    conn = backend.obter()
+    aplicadas = []
+    try:
+        cur = conn.cursor()
+        if not _tabela_existe(cur, "schema_versao"):
+            legado = _tabela_existe(cur, "produto")
+            cur.execute(_traduzir(backend, _SQL_TABELA_VERSAO))
+            if legado:
+                for versao, nome, _ in listar_migracoes():
+                    if versao <= VERSAO_BASE:
+                        cur.execute("INSERT INTO schema_versao (versao, nome) VALUES (%s, %s)", (versao, nome))
+            conn.commit()
+
+        cur.execute("SELECT versao FROM schema_versao")
+        ja_aplicadas = {row[0] for row in cur.fetchall()}
+
+        for versao, nome, caminho in listar_migracoes():
+            if versao in ja_aplicadas:
+                continue
+            # DDL no MySQL faz commit implícito; cada migração é registrada logo após rodar
+            for comando in comandos_sql(caminho.read_text(encoding="utf-8")):
+                cur.execute(_traduzir(backend, comando))
+            cur.execute("INSERT INTO schema_versao (versao, nome) VALUES (%s, %s)", (versao, nome))
+            conn.commit()
+            aplicadas.append(nome)
+            if log:
+                log(f"Migração aplicada: {nome}")
+        return aplicadas
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def verificar_atualizado(backend=None):
+    """
+    Confere na inicialização se o banco está com todas as migrações.
+
+    Raises
+    ------
+    MigracaoPendenteError
+        Se houver migrações pendentes.
+    """
+    faltando = pendentes(backend)
+    if faltando:
+        nomes = ", ".join(nome for _, nome, _ in faltando)
+        raise MigracaoPendenteError(
+            f"O banco de dados está desatualizado. Migrações pendentes: {nomes}.\n"
+            "Execute 'python migracoes.py' para aplicá-las."
+        )
+
+
+if __name__ == "__main__":
+    feitas = aplicar_pendentes(log=print)
+    if not feitas:
+        print("O banco de dados já está atualizado.")
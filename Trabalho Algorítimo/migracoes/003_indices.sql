@@ -0,0 +1,32 @@
+-- Índices para as consultas do repository.py
+
+-- listar_vendas / listar_vendas_pagina (ORDER BY data_venda, id_venda) e
+-- historico_vendas_por_periodo (BETWEEN): cobre id_cliente e valor_total
+CREATE INDEX idx_venda_data ON venda (data_venda, id_venda, id_cliente, valor_total);
+
+-- historico_vendas_por_cliente (WHERE id_cliente ORDER BY data_venda) e
+-- total_consumido_por_cliente (SUM(valor_total))
+CREATE INDEX idx_venda_cliente_data ON venda (id_cliente, data_venda, valor_total);
+
+-- listar_itens_venda (WHERE id_venda)
+CREATE INDEX idx_produto_venda_venda ON produto_venda (id_venda, id_produto, quantidade, preco_unitario);
+
+-- historico_vendas_por_produto (WHERE id_produto)
+CREATE INDEX idx_produto_venda_produto ON produto_venda (id_produto, id_venda, quantidade, preco_unitario, subtotal);
+
+-- listar_produtos / listar_produtos_pagina (ORDER BY nome, id_produto)
+CREATE INDEX idx_produto_nome ON produto (nome, id_produto);
+
+-- buscar_produto_por_nome_fornecedor
+CREATE INDEX idx_produto_nome_fornecedor ON produto (nome, id_fornecedor);
+
+-- listar_clientes_pagina / listar_fornecedores_pagina (ORDER BY nome, id)
+CREATE INDEX idx_cliente_nome ON cliente (nome, id_cliente);
+CREATE INDEX idx_fornecedor_nome ON fornecedor (nome, id_fornecedor);
+
+-- listar_cidades (WHERE id_estado ORDER BY nome)
+CREATE INDEX idx_cidade_estado_nome ON cidade (id_estado, nome);
+
+-- joins por chave estrangeira (o SQLite não cria esses índices sozinho)
+CREATE INDEX idx_endereco_cidade ON endereco (id_cidade);
+CREATE INDEX idx_entrada_produto_produto ON entrada_produto (id_produto, data_entrada);
@@ -0,0 +1,49 @@
+-- Agregados diários de vendas, mantidos por inserir_venda / deletar_venda
+
+CREATE TABLE venda_diaria (
+    dia DATE PRIMARY KEY,
+    qtd_vendas INT NOT NULL DEFAULT 0,
+    receita DECIMAL(14,2) NOT NULL DEFAULT 0,
+    itens INT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE venda_diaria_produto (
+    dia DATE NOT NULL,
+    id_produto INT NOT NULL,
+    quantidade INT NOT NULL DEFAULT 0,
+    receita DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, id_produto)
+);
+
+CREATE TABLE venda_diaria_cliente (
+    dia DATE NOT NULL,
+    id_cliente INT NOT NULL,
+    qtd_vendas INT NOT NULL DEFAULT 0,
+    receita DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, id_cliente)
+);
+
+CREATE INDEX idx_venda_diaria_produto_produto ON venda_diaria_produto (id_produto, dia);
+CREATE INDEX idx_venda_diaria_cliente_cliente ON venda_diaria_cliente (id_cliente, dia);
+
+-- Carga inicial com as vendas já existentes
+INSERT INTO venda_diaria (dia, qtd_vendas, receita, itens)
+SELECT DATE(v.data_venda), COUNT(*), SUM(v.valor_total), COALESCE(SUM(i.itens), 0)
+FROM venda v
+LEFT JOIN (SELECT id_venda, SUM(quantidade) AS itens FROM produto_venda GROUP BY id_venda) i
+       ON i.id_venda = v.id_venda
+WHERE v.data_venda IS NOT NULL
+GROUP BY DATE(v.data_venda);
+
+INSERT INTO venda_diaria_produto (dia, id_produto, quantidade, receita)
+SELECT DATE(v.data_venda), pv.id_produto, SUM(pv.quantidade), SUM(pv.subtotal)
+FROM venda v
+JOIN produto_venda pv ON pv.id_venda = v.id_venda
+WHERE v.data_venda IS NOT NULL
+GROUP BY DATE(v.data_venda), pv.id_produto;
+
+INSERT INTO venda_diaria_cliente (dia, id_cliente, qtd_vendas, receita)
+SELECT DATE(v.data_venda), v.id_cliente, COUNT(*), SUM(v.valor_total)
+FROM venda v
+WHERE v.data_venda IS NOT NULL AND v.id_cliente IS NOT NULL
+GROUP BY DATE(v.data_venda), v.id_cliente;
@@ -0,0 +1,15 @@
+-- Reservas de estoque dos carrinhos em andamento (ver reservas.py)
+
+CREATE TABLE reserva_estoque (
+    id_reserva INT AUTO_INCREMENT PRIMARY KEY,
+    sessao CHAR(32) NOT NULL,
+    id_produto INT NOT NULL,
+    quantidade INT NOT NULL,
+    criada_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expira_em DATETIME NOT NULL,
+    FOREIGN KEY (id_produto) REFERENCES produto(id_produto) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_reserva_produto ON reserva_estoque (id_produto, expira_em);
+CREATE INDEX idx_reserva_sessao ON reserva_estoque (sessao);
+CREATE INDEX idx_reserva_expira ON reserva_estoque (expira_em);
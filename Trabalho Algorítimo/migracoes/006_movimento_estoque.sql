@@ -0,0 +1,24 @@
+-- Livro de movimentações de estoque e fechamentos periódicos (ver movimentos.py)
+
+CREATE TABLE movimento_estoque (
+    id_movimento INT AUTO_INCREMENT PRIMARY KEY,
+    id_produto INT NOT NULL,
+    data_movimento DATETIME NOT NULL,
+    quantidade INT NOT NULL,
+    tipo VARCHAR(20) NOT NULL,
+    referencia INT
+);
+
+CREATE INDEX idx_movimento_produto ON movimento_estoque (id_produto, data_movimento);
+CREATE INDEX idx_movimento_data ON movimento_estoque (data_movimento);
+
+CREATE TABLE estoque_fechamento (
+    data_fechamento DATETIME NOT NULL,
+    id_produto INT NOT NULL,
+    quantidade INT NOT NULL,
+    PRIMARY KEY (data_fechamento, id_produto)
+);
+
+-- Saldo de abertura: o estoque atual de cada produto
+INSERT INTO movimento_estoque (id_produto, data_movimento, quantidade, tipo)
+SELECT id_produto, NOW(), quantidade, 'inicial' FROM produto;
@@ -0,0 +1,6 @@
+-- Chave de idempotência das vendas: uma venda reenviada pelo diário offline
+-- (ver diario_vendas.py) não é gravada duas vezes
+
+ALTER TABLE venda ADD COLUMN chave_idempotencia CHAR(32);
+
+CREATE UNIQUE INDEX uq_venda_chave ON venda (chave_idempotencia);
@@ -0,0 +1,214 @@
+"""
+Módulo movimentos
+-----------------
+Livro de movimentações de estoque (``movimento_estoque``) e fechamentos
+periódicos (``estoque_fechamento``).
+
+Toda alteração de ``produto.quantidade`` feita pelo ``repository`` grava,
+na mesma transação, uma movimentação com a variação (positiva ou
+negativa), o tipo e a referência (ex: o id da venda). O livro só recebe
+inserções.
+
+Um fechamento guarda o saldo de cada produto num instante (por padrão o
+momento em que roda, todas as noites: ``python app.py fechar-estoque``).
+O estoque numa data qualquer é o último fechamento antes dela somado às
+movimentações desde então, sem reler o histórico inteiro.
+
+Alterações feitas direto no banco não passam pelo livro; ``divergencias``
+lista os produtos cujo estoque não bate com o saldo do livro.
+"""
+
+from datetime import date, datetime, time
+
+from db import fetchall, fetchone, get_conn
+
+# Tipos de movimentação
+INICIAL = "inicial"         # cadastro do produto (ou carga inicial da migração)
+VENDA = "venda"
+ENTRADA = "entrada"         # recebimento de mercadorias
+AJUSTE = "ajuste"           # quantidade alterada na edição do produto
+EXCLUSAO = "exclusao"       # produto excluído (zera o saldo)
+
+# Antes de qualquer movimentação (limite inferior quando ainda não há fechamento)
+_INICIO = datetime(1900, 1, 1)
+# Depois de qualquer movimentação (saldo atual)
+_FIM = datetime(9999, 12, 31)
+
+
+def _placeholders(n):
+    return ",".join(["%s"] * n)
+
+def _momento(valor, fim_do_dia=True):
+    """datetime/date/texto ISO em datetime; uma data sozinha é o fim (ou o início) do dia."""
+    if isinstance(valor, datetime):
+        return valor
+    if not isinstance(valor, date):
+        texto = str(valor)
+        if len(texto) > 10:
+            return datetime.fromisoformat(texto)
+        valor = date.fromisoformat(texto)
+    return datetime.combine(valor, time(23, 59, 59) if fim_do_dia else time())
+
+# region Dentro de uma transação
+def registrar(cur, data, tipo, variacoes, referencia=None):
+    """
+    Grava movimentações (chamada nas transações do ``repository``).
+
+    Parameters
+    ----------
+    cur : cursor
+        Cursor da transação que altera o estoque.
+    data : datetime
+        Momento da movimentação (o mesmo gravado na venda/entrada).
+    tipo : str
+        ``VENDA``, ``ENTRADA``, ``AJUSTE``...
+    variacoes : iterable[tuple]
+        (id_produto, variação da quantidade); variações zero são ignoradas.
+    referencia : int, optional
+        Id do registro que originou a movimentação (ex: a venda).
+    """
+    linhas = [(id_produto, data, qtd, tipo, referencia) for id_produto, qtd in variacoes if qtd]
+    if linhas:
+        cur.executemany(
+            """INSERT INTO movimento_estoque (id_produto, data_movimento, quantidade, tipo, referencia)
+               VALUES (%s, %s, %s, %s, %s)""",
+            linhas
+        )
+#endregion
+
+def ultimo_fechamento(antes_de=None):
+    """Instante do último fechamento (até ``antes_de``, se informado), ou None."""
+    if antes_de is None:
+        row = fetchone("SELECT MAX(data_fechamento) AS f FROM estoque_fechamento")
+    else:
+        row = fetchone("SELECT MAX(data_fechamento) AS f FROM estoque_fechamento WHERE data_fechamento <= %s",
+                       (antes_de,))
+    return row["f"] if row else None
+
+def fechar(momento=None):
+    """
+    Grava o saldo de todos os produtos em ``momento`` (padrão: agora, pela
+    hora do servidor), a partir do fechamento anterior e das movimentações
+    desde então, num único INSERT ... SELECT.
+
+    As movimentações até ``momento`` (exclusive) entram no fechamento; uma
+    data sozinha é a meia-noite que a inicia. Se outro fechamento for
+    gravado ao mesmo tempo, a chave primária impede a duplicata.
+
+    Returns
+    -------
+    int | None
+        Produtos fechados (0 se não há nada a fechar: nenhum produto com
+        movimentação até ``momento``), ou None se já havia fechamento nesse
+        instante ou depois (nada é gravado).
+    """
+    conn = get_conn()
+    cur = None
+    try:
+        conn.start_transaction()
+        cur = conn.cursor(dictionary=True)
+        if momento:
+            momento = _momento(momento, fim_do_dia=False)
+        else:
+            # Hora do servidor: a mesma usada nas movimentações
+            cur.execute("SELECT NOW() AS agora")
+            momento = _momento(cur.fetchone()["agora"])
+        cur.execute("SELECT MAX(data_fechamento) AS f FROM estoque_fechamento")
+        anterior = cur.fetchone()["f"]
+        if anterior is not None and _momento(anterior) >= momento:
+            conn.rollback()
+            return None
+        cur.execute(
+            """INSERT INTO estoque_fechamento (data_fechamento, id_produto, quantidade)
+               SELECT %s, id_produto, SUM(quantidade) FROM (
+                   SELECT id_produto, quantidade FROM estoque_fechamento WHERE data_fechamento = %s
+                   UNION ALL
+                   SELECT id_produto, quantidade FROM movimento_estoque
+                   WHERE data_movimento >= %s AND data_movimento < %s
+               ) saldos
+               GROUP BY id_produto""",
+            (momento, anterior or _INICIO, anterior or _INICIO, momento)
+        )
+        fechados = cur.rowcount
+        conn.commit()
+        return fechados
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        if cur is not None:
+            cur.close()
+        conn.close()
+
+def estoque_em(momento, ids=None):
+    """
+    Estoque de cada produto num instante: o último fechamento até ele mais
+    as movimentações entre os dois.
+
+    Parameters
+    ----------
+    momento : datetime | date | str
+        Instante; uma data sem hora é o fim do dia.
+    ids : list[int], optional
+        Só esses produtos (padrão: todos).
+
+    Returns
+    -------
+    dict
+        id_produto -> quantidade (produtos sem nenhuma movimentação até lá
+        ficam de fora).
+    """
+    momento = _momento(momento)
+    fechamento = ultimo_fechamento(momento)
+    filtro, params_ids = "", ()
+    if ids is not None:
+        if not ids:
+            return {}
+        filtro, params_ids = f" AND id_produto IN ({_placeholders(len(ids))})", tuple(ids)
+    rows = fetchall(
+        f"""SELECT id_produto, SUM(quantidade) AS quantidade FROM (
+                SELECT id_produto, quantidade FROM estoque_fechamento WHERE data_fechamento = %s{filtro}
+                UNION ALL
+                SELECT id_produto, quantidade FROM movimento_estoque
+                WHERE data_movimento >= %s AND data_movimento <= %s{filtro}
+            ) saldos
+            GROUP BY id_produto""",
+        (fechamento or _INICIO,) + params_ids + (fechamento or _INICIO, momento) + params_ids
+    )
+    return {r["id_produto"]: int(r["quantidade"]) for r in rows}
+
+def movimentacoes(id_produto, de, ate):
+    """Movimentações de um produto no período, em ordem."""
+    return fetchall(
+        """SELECT id_movimento, data_movimento, quantidade, tipo, referencia FROM movimento_estoque
+           WHERE id_produto = %s AND data_movimento >= %s AND data_movimento <= %s
+           ORDER BY data_movimento, id_movimento""",
+        (id_produto, _momento(de, fim_do_dia=False), _momento(ate))
+    )
+
+def divergencias():
+    """
+    Produtos cujo estoque atual difere do saldo do livro (alterados fora
+    do sistema).
+
+    Returns
+    -------
+    list[dict]
+        ``id_produto``, ``nome``, ``quantidade`` (estoque), ``saldo`` (livro)
+        e ``diferenca``, em ordem de id.
+    """
+    saldos = estoque_em(_FIM)
+    resultado = []
+    for p in fetchall("SELECT id_produto, nome, quantidade FROM produto ORDER BY id_produto"):
+        saldo = saldos.pop(p["id_produto"], 0)
+        if saldo != p["quantidade"]:
+            resultado.append({"id_produto": p["id_produto"], "nome": p["nome"], "quantidade": p["quantidade"],
+                              "saldo": saldo, "diferenca": p["quantidade"] - saldo})
+    return resultado
+
+def iterar_estoque_em(momento, id_produto=None):
+    """Linhas ``id_produto``, ``nome`` e ``quantidade`` do estoque num instante, em ordem de id."""
+    saldos = estoque_em(momento, None if id_produto is None else [id_produto])
+    nomes = {p["id_produto"]: p["nome"] for p in fetchall("SELECT id_produto, nome FROM produto")}
+    for id_prod in sorted(saldos):
+        yield {"id_produto": id_prod, "nome": nomes.get(id_prod, "(produto excluído)"), "quantidade": saldos[id_prod]}
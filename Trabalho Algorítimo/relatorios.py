@@ -0,0 +1,207 @@
+"""
+Módulo relatorios
+-----------------
+Definição dos relatórios, sem depender da interface gráfica.
+
+Cada relatório diz de onde vêm as linhas (um gerador ``repository.iterar_*``),
+como cada linha vira texto, o cabeçalho/rodapé e as colunas da exportação.
+A aba Relatórios (``ui_main``) e a linha de comando (``app.py report``/
+``app.py export``) usam as mesmas definições.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import analise
+import diario_vendas
+import exportacao
+import movimentos
+import repository as repo
+
+
+@dataclass
+class Relatorio:
+    """Um relatório pronto para exibir ou exportar."""
+    titulo: str
+    linhas: Callable            # sem argumentos; retorna o iterador de registros
+    formatar: Callable          # registro -> texto
+    colunas: list               # (campo, título) para exportação
+    cabecalho: str = ""         # texto antes do primeiro registro
+    rodape: Optional[Callable] = None   # quantidade de registros -> texto final
+
+
+def estoque_baixo():
+    return Relatorio(
+        titulo="Estoque baixo",
+        linhas=repo.iterar_produtos_estoque_baixo,
+        formatar=lambda r: f"{r['id_produto']} - {r['nome']} | Qtd {r['quantidade']} | Min {r['estoque_minimo']}\n",
+        colunas=exportacao.COLUNAS_ESTOQUE_BAIXO,
+        rodape=lambda qtd: "" if qtd else "Nenhum produto com estoque baixo\n",
+    )
+
+def historico_cliente(id_cliente):
+    def rodape(qtd):
+        if not qtd:
+            return "Nenhuma venda encontrada.\n"
+        total_historico = repo.total_consumido_por_cliente(id_cliente)["SUM(valor_total)"]
+        return f"Total consumido: {total_historico:.2f}\n"
+
+    return Relatorio(
+        titulo=f"Cliente {id_cliente}",
+        linhas=lambda: repo.iterar_historico_vendas_por_cliente(id_cliente),
+        formatar=lambda r: (
+            f"Venda {r['id_venda']} | Data: {r['data_venda']} | Total: R$ {r['valor_total']:.2f}\n"
+            f"   Produto: {r['produto']} x{r['quantidade']} @ {r['preco_unitario']:.2f} = {r['subtotal']:.2f}\n\n"),
+        colunas=exportacao.COLUNAS_HISTORICO_CLIENTE,
+        cabecalho=f"Histórico de vendas do Cliente {id_cliente}:\n\n",
+        rodape=rodape,
+    )
+
+def historico_produto(id_produto):
+    return Relatorio(
+        titulo=f"Produto {id_produto}",
+        linhas=lambda: repo.iterar_historico_vendas_por_produto(id_produto),
+        formatar=lambda r: (
+            f"Venda {r['id_venda']} | Data: {r['data_venda']} | Cliente: {r['cliente']} | Total: R$ {r['valor_total']:.2f}\n"
+            f"   Quantidade: {r['quantidade']} @ {r['preco_unitario']:.2f} = {r['subtotal']:.2f}\n\n"),
+        colunas=exportacao.COLUNAS_HISTORICO_PRODUTO,
+        cabecalho=f"Histórico de vendas do Produto {id_produto}:\n\n",
+        rodape=lambda qtd: "" if qtd else "Nenhuma venda encontrada.\n",
+    )
+
+def vendas_periodo(data_inicio, data_fim):
+    def rodape(qtd):
+        # O total vem dos agregados diários, sem somar venda por venda
+        resumo = repo.resumo_vendas_periodo(data_inicio, data_fim)
+        if not qtd and not resumo["qtd_vendas"]:
+            return "Nenhuma venda encontrada nesse período.\n"
+        return (f"\nVendas no período: {resumo['qtd_vendas']} | Itens vendidos: {resumo['itens']}\n"
+                f"Total faturado no período: R$ {resumo['receita']:.2f}\n")
+
+    return Relatorio(
+        titulo=f"Vendas {data_inicio} a {data_fim}",
+        linhas=lambda: repo.iterar_historico_vendas_por_periodo(data_inicio, data_fim),
+        formatar=lambda r: (f"Venda {r['id_venda']} | Cliente: {r['cliente']} | "
+                            f"Total: R$ {r['valor_total']:.2f} | Data: {r['data_venda']}\n"),
+        colunas=exportacao.COLUNAS_HISTORICO_PERIODO,
+        rodape=rodape,
+    )
+
+def _moeda(valor):
+    return "-" if valor is None else f"R$ {valor:.2f}"
+
+def curva_abc(data_inicio, data_fim):
+    def rodape(qtd):
+        if not qtd:
+            return "Nenhuma venda encontrada nesse período.\n"
+        resumo = repo.resumo_vendas_periodo(data_inicio, data_fim)
+        return f"\n{qtd} produtos vendidos | Total faturado: R$ {resumo['receita']:.2f}\n"
+
+    return Relatorio(
+        titulo=f"Curva ABC {data_inicio} a {data_fim}",
+        linhas=lambda: analise.iterar_curva_abc(data_inicio, data_fim),
+        formatar=lambda r: (
+            f"{r['posicao']:>4}. [{r['classe']}] {r['id_produto']} - {r['nome']} | Qtd {r['quantidade']} | "
+            f"R$ {r['receita']:.2f} ({r['participacao']:.1f}%, acum. {r['acumulado']:.1f}%) | "
+            f"Margem: {_moeda(r['margem'])}" + ("" if r["margem_pct"] is None else f" ({r['margem_pct']:.1f}%)") + "\n"),
+        colunas=exportacao.COLUNAS_CURVA_ABC,
+        cabecalho=f"Curva ABC dos produtos de {data_inicio} a {data_fim} (A: até 80% da receita, B: até 95%):\n\n",
+        rodape=rodape,
+    )
+
+def top_clientes(data_inicio, data_fim, n=10):
+    return Relatorio(
+        titulo=f"Top {n} clientes {data_inicio} a {data_fim}",
+        linhas=lambda: analise.iterar_top_clientes(data_inicio, data_fim, n),
+        formatar=lambda r: (f"{r['posicao']:>4}. {r['id_cliente']} - {r['nome']} | Vendas: {r['qtd_vendas']} | "
+                            f"R$ {r['receita']:.2f} ({r['participacao']:.1f}%)\n"),
+        colunas=exportacao.COLUNAS_TOP_CLIENTES,
+        cabecalho=f"Os {n} clientes que mais compraram de {data_inicio} a {data_fim}:\n\n",
+        rodape=lambda qtd: "" if qtd else "Nenhuma venda encontrada nesse período.\n",
+    )
+
+def reposicao(janela=analise.JANELA_DEMANDA):
+    fornecedor_atual = [None]
+
+    def formatar(r):
+        # Os produtos vêm agrupados por fornecedor: título a cada novo fornecedor
+        titulo = ""
+        if r["fornecedor"] != fornecedor_atual[0]:
+            fornecedor_atual[0] = r["fornecedor"]
+            titulo = f"\n{r['fornecedor']}\n"
+        return titulo + (f"   {r['id_produto']} - {r['nome']} | Estoque {r['estoque']} | "
+                         f"Ponto de pedido {r['ponto_pedido']} (segurança {r['seguranca']}) | "
+                         f"Demanda {r['demanda_media']:.1f}/dia, prazo {r['prazo']:.0f} dias | "
+                         f"Comprar: {r['sugestao']}\n")
+
+    def linhas():
+        fornecedor_atual[0] = None
+        return analise.iterar_reposicao(janela=janela)
+
+    return Relatorio(
+        titulo="Sugestão de compra",
+        linhas=linhas,
+        formatar=formatar,
+        colunas=exportacao.COLUNAS_REPOSICAO,
+        cabecalho=f"Sugestão de compra (demanda dos últimos {janela} dias, "
+                  f"{analise.NIVEL_SERVICO:.0%} de nível de serviço):\n",
+        rodape=lambda qtd: f"\n{qtd} produtos a comprar.\n" if qtd else "Nenhum produto precisa de reposição.\n",
+    )
+
+def estoque_em(momento, id_produto=None):
+    return Relatorio(
+        titulo=f"Estoque em {momento}",
+        linhas=lambda: movimentos.iterar_estoque_em(momento, id_produto),
+        formatar=lambda r: f"{r['id_produto']} - {r['nome']} | Qtd {r['quantidade']}\n",
+        colunas=exportacao.COLUNAS_ESTOQUE_EM,
+        cabecalho=f"Estoque em {momento}:\n\n",
+        rodape=lambda qtd: "" if qtd else "Nenhuma movimentação até essa data.\n",
+    )
+
+def divergencias_estoque():
+    return Relatorio(
+        titulo="Divergências de estoque",
+        linhas=lambda: iter(movimentos.divergencias()),
+        formatar=lambda r: (f"{r['id_produto']} - {r['nome']} | Estoque {r['quantidade']} | "
+                            f"Livro {r['saldo']} | Diferença {r['diferenca']:+d}\n"),
+        colunas=exportacao.COLUNAS_DIVERGENCIAS,
+        cabecalho="Produtos com estoque diferente do livro de movimentações (alterados fora do sistema):\n\n",
+        rodape=lambda qtd: "" if qtd else "Nenhuma divergência: o estoque confere com o livro.\n",
+    )
+
+def vendas_offline():
+    return Relatorio(
+        titulo="Vendas não enviadas",
+        linhas=diario_vendas.iterar_nao_enviadas,
+        formatar=lambda r: (f"{r['criada_em']} | Cliente {r['id_cliente']} | {r['itens']} itens, "
+                            f"{r['quantidade']} unidades | {r['situacao']}"
+                            + (f" | {r['erro']}" if r["situacao"] == diario_vendas.CONFLITO else "") + "\n"),
+        colunas=exportacao.COLUNAS_VENDAS_OFFLINE,
+        cabecalho="Vendas do diário local deste caixa ainda não gravadas no banco:\n\n",
+        rodape=lambda qtd: "" if qtd else "Nenhuma venda pendente: todas foram enviadas ao banco.\n",
+    )
+
+def escrever_texto(relatorio, saida):
+    """
+    Escreve o relatório em texto num arquivo aberto (ex: ``sys.stdout``),
+    linha a linha, sem carregar o resultado inteiro.
+
+    Returns
+    -------
+    int
+        Quantidade de registros.
+    """
+    qtd = 0
+    linhas = relatorio.linhas()
+    try:
+        for row in linhas:
+            if qtd == 0 and relatorio.cabecalho:
+                saida.write(relatorio.cabecalho)
+            saida.write(relatorio.formatar(row))
+            qtd += 1
+    finally:
+        if hasattr(linhas, "close"):
+            linhas.close()
+    if relatorio.rodape is not None:
+        saida.write(relatorio.rodape(qtd))
+    return qtd
@@ -5,29 +5,149 @@ Módulo repository
 -----------------
 CRUD e regras de negócio (interação com o banco).
 """
-from db import fetchall, execute, fetchone
-from datetime import datetime
-import mysql.connector
-from db import DB_CONFIG
+from db import fetchall, execute, fetchone, get_conn, iter_rows
+import db
+import catalogo
+import agregados
+import busca_produtos
+import movimentos
+import reservas
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+# Tamanho padrão das páginas das listagens paginadas
+TAMANHO_PAGINA = 200
+
+def _pagina(sql, ordem, apos=None, limite=TAMANHO_PAGINA, desc=False):
+    """
+    Executa uma consulta paginada por keyset (seek).
+
+    Em vez de OFFSET, a próxima página começa logo depois da chave do
+    último registro já lido, então o custo de cada página é o mesmo
+    independentemente de quantas já foram carregadas.
+
+    Parameters
+    ----------
+    sql : str
+        SELECT sem ORDER BY/LIMIT (e sem WHERE).
+    ordem : tuple[str, str]
+        Colunas da ordenação, ex: ("p.nome", "p.id_produto"). A última
+        deve ser única (chave primária) para desempatar.
+    apos : tuple, optional
+        Valores de ``ordem`` do último registro da página anterior.
+    limite : int
+        Quantidade máxima de registros.
+    desc : bool
+        Ordenação decrescente.
+
+    Returns
+    -------
+    list[dict]
+    """
+    col, chave = ordem
+    op = "<" if desc else ">"
+    direcao = " DESC" if desc else ""
+    params = ()
+    if apos is not None:
+        sql += f" WHERE ({col} {op} %s OR ({col} = %s AND {chave} {op} %s))"
+        params = (apos[0], apos[0], apos[1])
+    sql += f" ORDER BY {col}{direcao}, {chave}{direcao} LIMIT %s"
+    return fetchall(sql, params + (limite,))
 
 # region Produto
-def listar_produtos():
-    return fetchall("""
+_SQL_PRODUTOS = """
         SELECT p.id_produto, p.nome, p.categoria, p.preco, p.quantidade,
                f.nome AS fornecedor, p.estoque_minimo
         FROM produto p
         LEFT JOIN fornecedor f ON p.id_fornecedor=f.id_fornecedor
-        ORDER BY p.nome
-    """)
+"""
+
+def listar_produtos():
+    return fetchall(_SQL_PRODUTOS + " ORDER BY p.nome")
+
+def listar_produtos_pagina(apos=None, limite=TAMANHO_PAGINA):
+    """
+    Página de produtos ordenada por nome.
+
+    ``apos`` é a tupla (nome, id_produto) do último produto da página anterior.
+    """
+    return _pagina(_SQL_PRODUTOS, ("p.nome", "p.id_produto"), apos, limite)
+
+def buscar_linha_produto(id_produto):
+    """Um produto no mesmo formato de ``listar_produtos`` (para atualizar uma linha da grade)."""
+    return fetchone(_SQL_PRODUTOS + " WHERE p.id_produto = %s", (id_produto,))
+
+_SQL_ESTOQUE_BAIXO = _SQL_PRODUTOS + " WHERE p.quantidade <= p.estoque_minimo ORDER BY p.nome"
+
+def listar_produtos_estoque_baixo():
+    """Produtos com quantidade igual ou abaixo do estoque mínimo (filtrados no banco)."""
+    return fetchall(_SQL_ESTOQUE_BAIXO)
+
+def iterar_produtos_estoque_baixo():
+    """Como ``listar_produtos_estoque_baixo``, mas entrega as linhas aos poucos (``iter_rows``)."""
+    return iter_rows(_SQL_ESTOQUE_BAIXO)
+
+def _alterar_produto(id_produto, sql, params, tipo, nova_qtd):
+    """
+    Executa um comando sobre um produto e grava no livro (``movimentos``) a
+    diferença entre o estoque anterior e ``nova_qtd``, na mesma transação.
+    """
+    conn = get_conn()
+    cur = None
+    try:
+        conn.start_transaction()
+        cur = conn.cursor(dictionary=True)
+        cur.execute("SELECT quantidade, NOW() AS agora FROM produto WHERE id_produto = %s FOR UPDATE",
+                    (id_produto,))
+        atual = cur.fetchone()
+        cur.execute(sql, params)
+        resultado = cur.rowcount
+        if atual is not None:
+            movimentos.registrar(cur, atual["agora"], tipo, [(id_produto, nova_qtd - atual["quantidade"])])
+        conn.commit()
+        return resultado
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        if cur is not None:
+            cur.close()
+        conn.close()
 
 def inserir_produto(nome, cat, preco, qtd, forn_id, estoque_min):
-    return execute("""INSERT INTO produto (nome,categoria,preco,quantidade,id_fornecedor,estoque_minimo)
-                      VALUES (%s,%s,%s,%s,%s,%s)""",
-                   (nome,cat,preco,qtd,forn_id,estoque_min))
+    """Cadastra um produto; o estoque inicial entra no livro de movimentações."""
+    conn = get_conn()
+    cur = None
+    try:
+        conn.start_transaction()
+        cur = conn.cursor(dictionary=True)
+        cur.execute("""INSERT INTO produto (nome,categoria,preco,quantidade,id_fornecedor,estoque_minimo)
+                       VALUES (%s,%s,%s,%s,%s,%s)""",
+                    (nome,cat,preco,qtd,forn_id,estoque_min))
+        id_produto = cur.lastrowid
+        cur.execute("SELECT NOW() AS agora")
+        movimentos.registrar(cur, cur.fetchone()["agora"], movimentos.INICIAL, [(id_produto, qtd)])
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        if cur is not None:
+            cur.close()
+        conn.close()
+    busca_produtos.registrar_produto(id_produto, nome, cat, preco)
+    return id_produto
 
 def deletar_produto(id_produto):
-    """Remove produto pelo ID."""
-    return execute("DELETE FROM produto WHERE id_produto=%s", (id_produto,))
+    """Remove produto pelo ID (o saldo que restava sai do livro de movimentações)."""
+    resultado = _alterar_produto(id_produto, "DELETE FROM produto WHERE id_produto=%s", (id_produto,),
+                                 movimentos.EXCLUSAO, 0)
+    busca_produtos.remover_produto(id_produto)
+    return resultado
 
 def buscar_produto(id_produto):
     return fetchone("SELECT * FROM produto WHERE id_produto = %s", (id_produto,))
@@ -50,58 +170,313 @@ def buscar_produto_por_nome_fornecedor(nome, id_fornecedor):
 
 def atualizar_produto(id_prod, nome, cat, preco, qtd, forn, est_min):
     """
-    Atualiza as informações de um produto.
+    Atualiza as informações de um produto. Uma mudança na quantidade é
+    gravada como ajuste no livro de movimentações.
     """
     query = "UPDATE produto SET nome = %s, categoria=%s, preco = %s, quantidade = %s, id_fornecedor = %s, estoque_minimo = %s WHERE id_produto = %s"
     params = (nome, cat, preco, qtd, forn, est_min, id_prod)
     
-    return execute(query, params)
+    resultado = _alterar_produto(id_prod, query, params, movimentos.AJUSTE, qtd)
+    busca_produtos.registrar_produto(id_prod, nome, cat, preco)
+    return resultado
 #endregion
 
 # region Venda
-def inserir_venda(id_cliente, itens):
+def _placeholders(n):
+    """Retorna "%s,%s,..." com n marcadores para cláusulas IN."""
+    return ",".join(["%s"] * n)
+
+CENTAVO = Decimal("0.01")
+
+def subtotal_item(preco, qtd):
+    """Preço x quantidade, arredondado para centavos (metade para cima)."""
+    return (preco * qtd).quantize(CENTAVO, ROUND_HALF_UP)
+
+def _como_decimal(valor):
+    # float vira texto antes (Decimal(0.1) carregaria o erro de arredondamento)
+    return valor if isinstance(valor, Decimal) else Decimal(str(valor or 0))
+
+def _precificar(produtos, itens, reservado):
+    """
+    Calcula o carrinho com ``Decimal`` a partir dos dados atuais dos produtos.
+
+    Parameters
+    ----------
+    produtos : dict
+        id_produto -> registro com ``nome``, ``preco`` e ``quantidade``.
+    itens : list[tuple]
+        (id_produto, quantidade) de cada linha do carrinho.
+    reservado : dict
+        id_produto -> quantidade reservada por outros carrinhos.
+
+    Returns
+    -------
+    dict
+        ``itens`` (uma linha por item: id_produto, nome, quantidade,
+        preco_unitario, subtotal, disponivel, suficiente), ``total`` e
+        ``ok`` (todos os produtos existem e têm estoque).
+    """
+    pedido = {}
+    for id_produto, qtd in itens:
+        pedido[id_produto] = pedido.get(id_produto, 0) + qtd
+
+    linhas = []
+    total = Decimal("0")
+    ok = bool(itens)
+    for id_produto, qtd in itens:
+        p = produtos.get(id_produto)
+        if p is None:
+            linhas.append({"id_produto": id_produto, "nome": None, "quantidade": qtd, "preco_unitario": None,
+                           "subtotal": None, "disponivel": 0, "suficiente": False})
+            ok = False
+            continue
+        preco = _como_decimal(p["preco"])
+        subtotal = subtotal_item(preco, qtd)
+        disponivel = p["quantidade"] - reservado.get(id_produto, 0)
+        suficiente = disponivel >= pedido[id_produto] # somando linhas repetidas do mesmo produto
+        linhas.append({"id_produto": id_produto, "nome": p["nome"], "quantidade": qtd, "preco_unitario": preco,
+                       "subtotal": subtotal, "disponivel": disponivel, "suficiente": suficiente})
+        total += subtotal
+        ok = ok and suficiente
+    return {"itens": linhas, "total": total, "ok": ok}
+
+def cotar_carrinho(itens, sessao=None):
+    """
+    Confere e precifica um carrinho inteiro com uma única consulta.
+
+    Usado ao montar a venda e como conferência final antes de gravá-la;
+    ``inserir_venda`` calcula os valores da mesma forma.
+
+    Parameters
+    ----------
+    itens : list[tuple]
+        (id_produto, quantidade) de cada linha.
+    sessao : str, optional
+        Carrinho (``reservas``) cujas reservas não descontam do disponível.
+
+    Returns
+    -------
+    dict
+        Ver ``_precificar``: nomes e preços atuais, disponibilidade,
+        subtotais e total em ``Decimal``.
+    """
+    ids = sorted({id_produto for id_produto, _ in itens})
+    if not ids:
+        return _precificar({}, [], {})
+    rows = fetchall(
+        f"""SELECT p.id_produto, p.nome, p.preco, p.quantidade, COALESCE(SUM(r.quantidade), 0) AS reservado
+            FROM produto p
+            LEFT JOIN reserva_estoque r
+                   ON r.id_produto = p.id_produto AND r.expira_em > NOW() AND r.sessao <> %s
+            WHERE p.id_produto IN ({_placeholders(len(ids))})
+            GROUP BY p.id_produto, p.nome, p.preco, p.quantidade""",
+        (sessao or "",) + tuple(ids)
+    )
+    produtos = {r["id_produto"]: r for r in rows}
+    reservado = {r["id_produto"]: int(r["reservado"]) for r in rows}
+    return _precificar(produtos, itens, reservado)
+
+# Estratégias de concorrência do ``inserir_venda`` (ESTRATEGIA_VENDA no .env)
+PESSIMISTA = "pessimista"   # SELECT ... FOR UPDATE trava os produtos antes de conferir o estoque
+OTIMISTA = "otimista"       # lê sem travar; a baixa é um UPDATE condicional que confere o estoque
+ESTRATEGIAS_VENDA = (PESSIMISTA, OTIMISTA)
+ESTRATEGIA_VENDA = os.getenv("ESTRATEGIA_VENDA", PESSIMISTA).lower()
+
+# Tentativas de uma venda que esbarrou em deadlock/espera de bloqueio esgotada
+TENTATIVAS_VENDA = 5
+# Espera (segundos) antes da 2ª tentativa; dobra a cada nova tentativa (com variação aleatória)
+ESPERA_REPETICAO = 0.02
+
+_lock_estatisticas = threading.Lock()
+_estatisticas_venda = {"repeticoes": 0, "desistencias": 0}
+
+
+def estatisticas_venda():
+    """Vendas repetidas por deadlock/bloqueio (``repeticoes``) e as que esgotaram as tentativas."""
+    with _lock_estatisticas:
+        return dict(_estatisticas_venda)
+
+def zerar_estatisticas_venda():
+    with _lock_estatisticas:
+        for nome in _estatisticas_venda:
+            _estatisticas_venda[nome] = 0
+
+def _contar_venda(nome):
+    with _lock_estatisticas:
+        _estatisticas_venda[nome] += 1
+
+def inserir_venda(id_cliente, itens, sessao=None, chave=None, data_venda=None, estrategia=None):
     """
     Insere uma nova venda com múltiplos produtos e atualiza o estoque.
-    Usa transação e SELECT ... FOR UPDATE para evitar concorrência.
+
+    O estoque reservado por outros carrinhos (``reservas``) não pode ser
+    vendido; as reservas da ``sessao`` desta venda são apagadas na mesma
+    transação.
+
+    ``itens`` são tuplas (id_produto, quantidade). Os preços são os do
+    banco no momento da venda, lidos junto com o estoque (um terceiro valor
+    na tupla, o preço mostrado na tela, é ignorado), e os valores são
+    calculados com ``Decimal`` como em ``cotar_carrinho``.
+
+    ``chave`` (idempotência) identifica a venda no diário offline
+    (``diario_vendas``): se já existe uma venda com essa chave, ela não é
+    gravada de novo e o id existente é retornado. ``data_venda`` é o
+    momento da venda quando ela é gravada depois (reenvio); sem ela, vale a
+    hora do servidor. A movimentação de estoque (``movimentos``) é sempre
+    datada com a hora do servidor, quando a baixa acontece de fato.
+
+    A concorrência entre vendedores segue ``estrategia`` (padrão:
+    ``ESTRATEGIA_VENDA``):
+
+    - ``PESSIMISTA``: um único SELECT ... FOR UPDATE trava todos os
+      produtos do carrinho (em ordem de id, evitando deadlock entre vendas
+      simultâneas) antes de conferir o estoque; o estoque é baixado com um
+      único UPDATE;
+    - ``OTIMISTA``: o estoque e os preços são lidos sem travar, e cada
+      produto é baixado (em ordem de id) com um UPDATE condicional
+      (``WHERE quantidade - pedido >= reservas válidas de outras sessões``,
+      somadas na própria instrução); se nenhuma linha for alterada, outro
+      vendedor levou o estoque (ou outro carrinho o reservou) no meio tempo
+      e a venda é recusada. Os produtos ficam travados só da baixa até o
+      commit.
+
+    Nas duas, a transação que esbarra em deadlock ou em tempo de espera
+    por bloqueio esgotado é desfeita e repetida (até ``TENTATIVAS_VENDA``
+    vezes, com espera crescente). Os itens entram num único INSERT de
+    várias linhas, e os totais diários (``agregados``) e o livro de
+    movimentações (``movimentos``) são atualizados na mesma transação.
+
+    Raises
+    ------
+    reservas.EstoqueInsuficiente
+        Se algum produto não tiver estoque disponível (nada é gravado).
     """
-    conn = mysql.connector.connect(**DB_CONFIG)
+    estrategia = estrategia or ESTRATEGIA_VENDA
+    if estrategia not in ESTRATEGIAS_VENDA:
+        raise ValueError(f"Estratégia de venda inválida: '{estrategia}' (use {' ou '.join(ESTRATEGIAS_VENDA)}).")
+    itens = [(it[0], it[1]) for it in itens]
+    # Soma as quantidades de produtos repetidos no carrinho
+    qtd_por_produto = {}
+    for id_produto, qtd in itens:
+        qtd_por_produto[id_produto] = qtd_por_produto.get(id_produto, 0) + qtd
+    if not qtd_por_produto:
+        raise ValueError("A venda precisa de ao menos um produto.")
+
+    for tentativa in range(1, TENTATIVAS_VENDA + 1):
+        try:
+            return _gravar_venda(id_cliente, itens, qtd_por_produto, sessao, chave, data_venda, estrategia)
+        except Exception as e:
+            if not db.conflito_transitorio(e):
+                raise e
+            if tentativa == TENTATIVAS_VENDA:
+                _contar_venda("desistencias")
+                raise e
+            _contar_venda("repeticoes")
+        # Espera aleatória: vendas que colidiram não tentam de novo ao mesmo tempo
+        time.sleep(ESPERA_REPETICAO * 2 ** (tentativa - 1) * random.uniform(0.5, 1.5))
+
+# Reservas válidas de um produto feitas por outras sessões (params: id_produto, sessão)
+_SQL_RESERVADO_POR_OUTROS = """
+    SELECT COALESCE(SUM(r.quantidade), 0) FROM reserva_estoque r
+    WHERE r.id_produto = %s AND r.expira_em > NOW() AND r.sessao <> %s"""
+
+def _estoque_insuficiente(row, disponivel, pedido):
+    return reservas.EstoqueInsuficiente(
+        f"Estoque insuficiente para '{row['nome']}'. Disponível: {disponivel}, solicitado: {pedido}."
+    )
+
+def _gravar_venda(id_cliente, itens, qtd_por_produto, sessao, chave, data_venda, estrategia):
+    """Uma tentativa de ``inserir_venda`` (uma transação)."""
+    ids = sorted(qtd_por_produto)
+    otimista = estrategia == OTIMISTA
+    conn = get_conn()
+    cur = None
     try:
         conn.start_transaction()
         cur = conn.cursor(dictionary=True)
 
-        total = 0
-        # Verifica estoque com bloqueio da linha
-        for id_produto, qtd, preco in itens:
-            cur.execute("SELECT quantidade, nome FROM produto WHERE id_produto = %s FOR UPDATE", (id_produto,))
-            row = cur.fetchone()
+        if chave is not None:
+            cur.execute("SELECT id_venda FROM venda WHERE chave_idempotencia = %s", (chave,))
+            existente = cur.fetchone()
+            if existente is not None:
+                conn.rollback()
+                return existente["id_venda"]
+
+        # Verifica estoque (na pessimista, com bloqueio das linhas)
+        cur.execute(
+            f"""SELECT id_produto, quantidade, nome, preco, NOW() AS agora FROM produto
+                WHERE id_produto IN ({_placeholders(len(ids))})
+                ORDER BY id_produto{"" if otimista else " FOR UPDATE"}""",
+            tuple(ids)
+        )
+        estoque = {row["id_produto"]: row for row in cur.fetchall()}
+        reservado = reservas.reservado_por_outros(cur, ids, sessao)
+        for id_produto in ids:
+            row = estoque.get(id_produto)
             if not row:
                 raise ValueError(f"Produto {id_produto} não encontrado.")
-            if row["quantidade"] < qtd:
-                raise ValueError(
-                    f"Estoque insuficiente para '{row['nome']}'. "
-                    f"Disponível: {row['quantidade']}, solicitado: {qtd}."
+            disponivel = row["quantidade"] - reservado.get(id_produto, 0)
+            if disponivel < qtd_por_produto[id_produto]:
+                raise _estoque_insuficiente(row, disponivel, qtd_por_produto[id_produto])
+        cotacao = _precificar(estoque, itens, reservado)
+        total = cotacao["total"]
+        # Hora do servidor lida junto com o estoque: a venda e os totais do dia usam a mesma.
+        # Numa venda reenviada pelo diário, a venda e os totais ficam na data do caixa, mas a
+        # movimentação de estoque é de agora (um fechamento já feito não a veria no passado)
+        agora = estoque[ids[0]]["agora"]
+        data = data_venda or agora
+
+        if otimista:
+            # Baixa condicional: confere o estoque e as reservas atuais (não os lidos acima)
+            # ao travar a linha. As reservas são somadas na própria instrução, pois um
+            # ``reservas.reservar`` pode ter gravado outra desde a leitura; os seguintes
+            # esperam a linha do produto, travada aqui até o commit.
+            for id_produto in ids:
+                pedido = qtd_por_produto[id_produto]
+                cur.execute(
+                    f"""UPDATE produto SET quantidade = quantidade - %s
+                        WHERE id_produto = %s AND quantidade - %s >= ({_SQL_RESERVADO_POR_OUTROS})""",
+                    (pedido, id_produto, pedido, id_produto, sessao or "")
                 )
-            total += qtd * preco
+                if cur.rowcount == 0:
+                    cur.execute(
+                        f"""SELECT quantidade - ({_SQL_RESERVADO_POR_OUTROS}) AS disponivel FROM produto
+                            WHERE id_produto = %s FOR UPDATE""",
+                        (id_produto, sessao or "", id_produto)
+                    )
+                    atual = cur.fetchone()
+                    raise _estoque_insuficiente(estoque[id_produto], atual["disponivel"] if atual else 0, pedido)
 
         # Cria a venda
         cur.execute(
-            "INSERT INTO venda (id_cliente, valor_total, data_venda) VALUES (%s, %s, NOW())",
-            (id_cliente, total)
+            "INSERT INTO venda (id_cliente, valor_total, data_venda, chave_idempotencia) VALUES (%s, %s, %s, %s)",
+            (id_cliente, total, data, chave)
         )
         venda_id = cur.lastrowid
 
-        # Insere itens e atualiza estoque
-        for id_produto, qtd, preco in itens:
-            subtotal = qtd * preco
-            cur.execute(
-                """INSERT INTO produto_venda (id_venda, id_produto, quantidade, preco_unitario, subtotal)
-                   VALUES (%s, %s, %s, %s, %s)""",
-                (venda_id, id_produto, qtd, preco, subtotal)
-            )
+        # Insere todos os itens de uma vez
+        cur.executemany(
+            """INSERT INTO produto_venda (id_venda, id_produto, quantidade, preco_unitario, subtotal)
+               VALUES (%s, %s, %s, %s, %s)""",
+            [(venda_id, it["id_produto"], it["quantidade"], it["preco_unitario"], it["subtotal"])
+             for it in cotacao["itens"]]
+        )
+
+        if not otimista:
+            # Baixa o estoque de todos os produtos num único UPDATE
+            casos = " ".join(["WHEN %s THEN %s"] * len(ids))
+            params = [v for id_produto in ids for v in (id_produto, qtd_por_produto[id_produto])]
             cur.execute(
-                "UPDATE produto SET quantidade = quantidade - %s WHERE id_produto = %s",
-                (qtd, id_produto)
+                f"""UPDATE produto SET quantidade = quantidade - CASE id_produto {casos} END
+                    WHERE id_produto IN ({_placeholders(len(ids))})""",
+                tuple(params) + tuple(ids)
             )
+        movimentos.registrar(cur, agora, movimentos.VENDA,
+                             [(id_produto, -qtd_por_produto[id_produto]) for id_produto in ids], venda_id)
+
+        agregados.registrar_venda(cur, data, id_cliente, total,
+                                  [(it["id_produto"], it["quantidade"], it["subtotal"]) for it in cotacao["itens"]])
+        reservas.converter(cur, sessao)
 
         conn.commit()
         return venda_id
@@ -110,17 +485,36 @@ def inserir_venda(id_cliente, itens):
         conn.rollback()
         raise e
     finally:
-        cur.close()
+        if cur is not None:
+            cur.close()
         conn.close()
 
-def listar_vendas():
-    return fetchall("""
+_SQL_VENDAS = """
         SELECT v.id_venda, v.id_cliente, c.nome AS cliente,
                v.valor_total, v.data_venda
         FROM venda v
         JOIN cliente c ON v.id_cliente = c.id_cliente
-        ORDER BY v.data_venda DESC
-    """)
+"""
+
+def buscar_venda_por_chave(chave):
+    """Id da venda gravada com a chave de idempotência (ou None)."""
+    row = fetchone("SELECT id_venda FROM venda WHERE chave_idempotencia = %s", (chave,))
+    return row["id_venda"] if row else None
+
+def listar_vendas():
+    return fetchall(_SQL_VENDAS + " ORDER BY v.data_venda DESC")
+
+def listar_vendas_pagina(apos=None, limite=TAMANHO_PAGINA):
+    """
+    Página de vendas, das mais recentes para as mais antigas.
+
+    ``apos`` é a tupla (data_venda, id_venda) da última venda da página anterior.
+    """
+    return _pagina(_SQL_VENDAS, ("v.data_venda", "v.id_venda"), apos, limite, desc=True)
+
+def buscar_linha_venda(id_venda):
+    """Uma venda no mesmo formato de ``listar_vendas``."""
+    return fetchone(_SQL_VENDAS + " WHERE v.id_venda = %s", (id_venda,))
 
 def listar_itens_venda(id_venda):
     """
@@ -140,11 +534,37 @@ def listar_itens_venda(id_venda):
     """, (id_venda,))
 
 def deletar_venda(id_venda):
-    """Remove venda pelo ID."""
-    return execute("DELETE FROM venda WHERE id_venda=%s", (id_venda,))
+    """Remove venda pelo ID e a desconta dos totais diários (``agregados``)."""
+    conn = get_conn()
+    cur = None
+    try:
+        conn.start_transaction()
+        cur = conn.cursor(dictionary=True)
+        cur.execute("SELECT id_cliente, valor_total, data_venda FROM venda WHERE id_venda=%s FOR UPDATE",
+                    (id_venda,))
+        venda = cur.fetchone()
+        if venda is None:
+            conn.rollback()
+            return
+        cur.execute("SELECT id_produto, quantidade, subtotal FROM produto_venda WHERE id_venda=%s",
+                    (id_venda,))
+        itens = [(r["id_produto"], r["quantidade"], r["subtotal"]) for r in cur.fetchall()]
+
+        cur.execute("DELETE FROM venda WHERE id_venda=%s", (id_venda,))
+        if venda["data_venda"] is not None:
+            agregados.registrar_venda(cur, venda["data_venda"], venda["id_cliente"],
+                                      venda["valor_total"], itens, sinal=-1)
+        conn.commit()
 
-def historico_vendas_por_cliente(id_cliente):
-    return fetchall("""
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        if cur is not None:
+            cur.close()
+        conn.close()
+
+_SQL_HISTORICO_CLIENTE = """
         SELECT v.id_venda, v.data_venda, v.valor_total,
                p.nome AS produto, pv.quantidade, pv.preco_unitario, pv.subtotal
         FROM venda v
@@ -152,7 +572,14 @@ def historico_vendas_por_cliente(id_cliente):
         JOIN produto p ON pv.id_produto = p.id_produto
         WHERE v.id_cliente = %s
         ORDER BY v.data_venda DESC
-    """, (id_cliente,))
+"""
+
+def historico_vendas_por_cliente(id_cliente):
+    return fetchall(_SQL_HISTORICO_CLIENTE, (id_cliente,))
+
+def iterar_historico_vendas_por_cliente(id_cliente):
+    """Como ``historico_vendas_por_cliente``, mas entrega as linhas aos poucos (``iter_rows``)."""
+    return iter_rows(_SQL_HISTORICO_CLIENTE, (id_cliente,))
 
 def total_consumido_por_cliente(id_cliente):
     return fetchone("""
@@ -161,8 +588,7 @@ def total_consumido_por_cliente(id_cliente):
         WHERE v.id_cliente = %s
         """, (id_cliente,))
 
-def historico_vendas_por_produto(id_produto):
-    return fetchall("""
+_SQL_HISTORICO_PRODUTO = """
         SELECT v.id_venda, v.data_venda, v.valor_total,
                c.nome AS cliente, pv.quantidade, pv.preco_unitario, pv.subtotal
         FROM venda v
@@ -170,21 +596,163 @@ def historico_vendas_por_produto(id_produto):
         JOIN cliente c ON v.id_cliente = c.id_cliente
         WHERE pv.id_produto = %s
         ORDER BY v.data_venda DESC
-    """, (id_produto,))
+"""
 
-def historico_vendas_por_periodo(data_inicio, data_fim):
-    return fetchall("""
+def historico_vendas_por_produto(id_produto):
+    return fetchall(_SQL_HISTORICO_PRODUTO, (id_produto,))
+
+def iterar_historico_vendas_por_produto(id_produto):
+    """Como ``historico_vendas_por_produto``, mas entrega as linhas aos poucos (``iter_rows``)."""
+    return iter_rows(_SQL_HISTORICO_PRODUTO, (id_produto,))
+
+def _dia_seguinte(dia):
+    return agregados.como_dia(dia) + timedelta(days=1)
+
+_SQL_HISTORICO_PERIODO = """
         SELECT v.id_venda, c.nome AS cliente, v.valor_total, v.data_venda
         FROM venda v
         JOIN cliente c ON v.id_cliente = c.id_cliente
-        WHERE v.data_venda BETWEEN %s AND %s
+        WHERE v.data_venda >= %s AND v.data_venda < %s
         ORDER BY v.data_venda
-    """, (data_inicio, data_fim))
+"""
+
+def historico_vendas_por_periodo(data_inicio, data_fim):
+    """Vendas de ``data_inicio`` até ``data_fim`` (dia inteiro incluído)."""
+    return fetchall(_SQL_HISTORICO_PERIODO, (agregados.como_dia(data_inicio), _dia_seguinte(data_fim)))
+
+def iterar_historico_vendas_por_periodo(data_inicio, data_fim):
+    """Como ``historico_vendas_por_periodo``, mas entrega as linhas aos poucos (``iter_rows``)."""
+    return iter_rows(_SQL_HISTORICO_PERIODO, (agregados.como_dia(data_inicio), _dia_seguinte(data_fim)))
+
+def resumo_vendas_periodo(data_inicio, data_fim):
+    """
+    Totais de vendas de ``data_inicio`` até ``data_fim`` (inclusive).
+
+    Lidos dos totais diários (``venda_diaria``): uma linha por dia do
+    período, independentemente de quantas vendas houve.
+
+    Returns
+    -------
+    dict
+        qtd_vendas, receita e itens vendidos no período.
+    """
+    return fetchone("""
+        SELECT COALESCE(SUM(qtd_vendas), 0) AS qtd_vendas,
+               COALESCE(SUM(receita), 0) AS receita,
+               COALESCE(SUM(itens), 0) AS itens
+        FROM venda_diaria
+        WHERE dia BETWEEN %s AND %s
+    """, (agregados.como_dia(data_inicio), agregados.como_dia(data_fim)))
+
+def vendas_diarias(data_inicio, data_fim):
+    """Totais de cada dia do período (só os dias com vendas)."""
+    return fetchall("""
+        SELECT dia, qtd_vendas, receita, itens
+        FROM venda_diaria
+        WHERE dia BETWEEN %s AND %s AND qtd_vendas > 0
+        ORDER BY dia
+    """, (agregados.como_dia(data_inicio), agregados.como_dia(data_fim)))
+#endregion
+
+# region Entrada de produtos
+# Produtos por comando ao travar/atualizar o estoque (entregas com milhares de linhas)
+LOTE_ENTRADA = 500
+
+def registrar_entrada(itens, id_fornecedor=None):
+    """
+    Registra o recebimento de uma entrega de fornecedor e soma as
+    quantidades ao estoque, numa única transação.
+
+    Os produtos são travados em ordem de id (como em ``inserir_venda``),
+    todas as linhas entram em ``entrada_produto`` num único INSERT em lote
+    e o estoque sobe com um UPDATE por lote de ``LOTE_ENTRADA`` produtos,
+    em vez de editar produto a produto. O livro de movimentações recebe
+    uma entrada por produto.
+
+    Parameters
+    ----------
+    itens : list[tuple]
+        (id_produto, quantidade, preco_compra) de cada linha da nota; o
+        preço de compra pode ser None. O mesmo produto pode se repetir.
+    id_fornecedor : int, optional
+        Fornecedor da entrega.
+
+    Returns
+    -------
+    dict
+        ``linhas``, ``produtos`` (ids distintos), ``quantidade`` (unidades),
+        ``valor`` (soma de quantidade x preço de compra, em ``Decimal``) e
+        ``data_entrada``.
+
+    Raises
+    ------
+    ValueError
+        Sem itens, quantidade não positiva ou produto inexistente (nada é gravado).
+    """
+    linhas = []
+    qtd_por_produto = {}
+    for id_produto, qtd, preco in itens:
+        if qtd <= 0:
+            raise ValueError(f"Quantidade inválida para o produto {id_produto}: {qtd}.")
+        preco = None if preco is None else _como_decimal(preco)
+        linhas.append((id_produto, qtd, preco))
+        qtd_por_produto[id_produto] = qtd_por_produto.get(id_produto, 0) + qtd
+    ids = sorted(qtd_por_produto)
+    if not ids:
+        raise ValueError("A entrada precisa de ao menos um produto.")
+    lotes = [ids[i:i + LOTE_ENTRADA] for i in range(0, len(ids), LOTE_ENTRADA)]
+
+    conn = get_conn()
+    cur = None
+    try:
+        conn.start_transaction()
+        cur = conn.cursor(dictionary=True)
+
+        encontrados = set()
+        for lote in lotes:
+            cur.execute(f"""SELECT id_produto FROM produto WHERE id_produto IN ({_placeholders(len(lote))})
+                            ORDER BY id_produto FOR UPDATE""", tuple(lote))
+            encontrados.update(r["id_produto"] for r in cur.fetchall())
+        faltando = [i for i in ids if i not in encontrados]
+        if faltando:
+            raise ValueError("Produtos não encontrados: " + ", ".join(map(str, faltando[:20]))
+                             + (" ..." if len(faltando) > 20 else ""))
+
+        cur.execute("SELECT NOW() AS agora")
+        agora = cur.fetchone()["agora"]
+
+        cur.executemany(
+            """INSERT INTO entrada_produto (id_produto, quantidade, preco_compra, data_entrada, id_fornecedor)
+               VALUES (%s, %s, %s, %s, %s)""",
+            [(id_produto, qtd, preco, agora, id_fornecedor) for id_produto, qtd, preco in linhas]
+        )
+
+        for lote in lotes:
+            casos = " ".join(["WHEN %s THEN %s"] * len(lote))
+            params = [v for id_produto in lote for v in (id_produto, qtd_por_produto[id_produto])]
+            cur.execute(
+                f"""UPDATE produto SET quantidade = quantidade + CASE id_produto {casos} END
+                    WHERE id_produto IN ({_placeholders(len(lote))})""",
+                tuple(params) + tuple(lote)
+            )
+        movimentos.registrar(cur, agora, movimentos.ENTRADA, qtd_por_produto.items())
+
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        if cur is not None:
+            cur.close()
+        conn.close()
+
+    valor = sum((subtotal_item(preco, qtd) for _, qtd, preco in linhas if preco is not None), Decimal("0"))
+    return {"linhas": len(linhas), "produtos": ids, "quantidade": sum(qtd_por_produto.values()),
+            "valor": valor, "data_entrada": agora}
 #endregion
 
 # region Cliente
-def listar_clientes():
-    sql = """
+_SQL_CLIENTES = """
         SELECT cl.id_cliente, cl.nome, cl.telefone, cl.email,
                e.rua, e.numero, e.bairro, e.cep,
                c.nome AS cidade, est.sigla AS estado
@@ -192,8 +760,40 @@ def listar_clientes():
         JOIN endereco e ON cl.id_endereco = e.id_endereco
         JOIN cidade c ON e.id_cidade = c.id_cidade
         JOIN estado est ON c.id_estado = est.id_estado
+"""
+
+def listar_clientes():
+    return fetchall(_SQL_CLIENTES)
+
+def listar_clientes_pagina(apos=None, limite=TAMANHO_PAGINA):
+    """
+    Página de clientes ordenada por nome.
+
+    ``apos`` é a tupla (nome, id_cliente) do último cliente da página anterior.
+    """
+    return _pagina(_SQL_CLIENTES, ("cl.nome", "cl.id_cliente"), apos, limite)
+
+def buscar_clientes_por_prefixo(texto, limite=20):
+    """
+    Clientes para escolher numa lista enquanto se digita: o de id ``texto``
+    (se for um número) ou os ``limite`` primeiros, por nome, cujo nome
+    começa com ``texto`` (usa o índice de ``cliente.nome``).
+
+    Returns
+    -------
+    list[dict]
+        ``id_cliente`` e ``nome``.
     """
-    return fetchall(sql)
+    texto = texto.strip()
+    if texto.isdigit():
+        return fetchall("SELECT id_cliente, nome FROM cliente WHERE id_cliente = %s", (int(texto),))
+    prefixo = texto.replace("!", "!!").replace("%", "!%").replace("_", "!_") + "%"
+    return fetchall("SELECT id_cliente, nome FROM cliente WHERE nome LIKE %s ESCAPE '!' "
+                    "ORDER BY nome, id_cliente LIMIT %s", (prefixo, limite))
+
+def buscar_linha_cliente(id_cliente):
+    """Um cliente no mesmo formato de ``listar_clientes``."""
+    return fetchone(_SQL_CLIENTES + " WHERE cl.id_cliente = %s", (id_cliente,))
 
 def inserir_cliente(nome,tel,email,id_endereco=None):
     return execute("INSERT INTO cliente (nome,telefone,email,id_endereco) VALUES (%s,%s,%s,%s)",
@@ -228,8 +828,7 @@ def buscar_cliente(id_cliente):
 #endregion
 
 # region Fornecedor
-def listar_fornecedores():
-    sql = """
+_SQL_FORNECEDORES = """
         SELECT f.id_fornecedor, f.nome, f.telefone, f.email,
                e.rua, e.numero, e.bairro, e.cep,
                c.nome AS cidade, est.sigla AS estado
@@ -237,16 +836,34 @@ def listar_fornecedores():
         JOIN endereco e ON f.id_endereco = e.id_endereco
         JOIN cidade c ON e.id_cidade = c.id_cidade
         JOIN estado est ON c.id_estado = est.id_estado
+"""
+
+def listar_fornecedores():
+    return fetchall(_SQL_FORNECEDORES)
+
+def listar_fornecedores_pagina(apos=None, limite=TAMANHO_PAGINA):
     """
-    return fetchall(sql)
+    Página de fornecedores ordenada por nome.
+
+    ``apos`` é a tupla (nome, id_fornecedor) do último fornecedor da página anterior.
+    """
+    return _pagina(_SQL_FORNECEDORES, ("f.nome", "f.id_fornecedor"), apos, limite)
+
+def buscar_linha_fornecedor(id_fornecedor):
+    """Um fornecedor no mesmo formato de ``listar_fornecedores``."""
+    return fetchone(_SQL_FORNECEDORES + " WHERE f.id_fornecedor = %s", (id_fornecedor,))
 
 def inserir_fornecedor(nome,tel,email,id_endereco=None):
-    return execute("INSERT INTO fornecedor (nome,telefone,email,id_endereco) VALUES (%s,%s,%s,%s)",
-                   (nome,tel,email,id_endereco))
+    id_fornecedor = execute("INSERT INTO fornecedor (nome,telefone,email,id_endereco) VALUES (%s,%s,%s,%s)",
+                            (nome,tel,email,id_endereco))
+    catalogo.registrar_fornecedor(id_fornecedor, nome)
+    return id_fornecedor
 
 def deletar_fornecedor(id_fornecedor):
     """Remove fornecedor pelo ID."""
-    return execute("DELETE FROM fornecedor WHERE id_fornecedor=%s", (id_fornecedor,))
+    resultado = execute("DELETE FROM fornecedor WHERE id_fornecedor=%s", (id_fornecedor,))
+    catalogo.remover_fornecedor(id_fornecedor)
+    return resultado
 
 def buscar_fornecedor(id_fornecedor):
     return fetchone("""
@@ -269,7 +886,9 @@ def atualizar_fornecedor(id_fornecedor, nome, telefone, email, id_endereco):
     query = "UPDATE fornecedor SET nome = %s, telefone = %s, email = %s, id_endereco = %s WHERE id_fornecedor = %s"
     params = (nome, telefone, email, id_endereco, id_fornecedor)
 
-    return execute(query, params)
+    resultado = execute(query, params)
+    catalogo.registrar_fornecedor(id_fornecedor, nome)
+    return resultado
 #endregion
 
 # region Estado
@@ -282,7 +901,9 @@ def listar_cidades(id_estado):
     return fetchall("SELECT * FROM cidade WHERE id_estado=%s ORDER BY nome", (id_estado,))
 
 def inserir_cidade(nome, id_estado):
-    return execute("INSERT INTO cidade (nome, id_estado) VALUES (%s,%s)", (nome, id_estado))
+    id_cidade = execute("INSERT INTO cidade (nome, id_estado) VALUES (%s,%s)", (nome, id_estado))
+    catalogo.registrar_cidade(id_cidade, nome, id_estado)
+    return id_cidade
 #endregion
 
 #region Endereço
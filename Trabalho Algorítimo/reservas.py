@@ -0,0 +1,166 @@
+"""
+Módulo reservas
+---------------
+Reservas de estoque dos carrinhos em andamento (tabela ``reserva_estoque``).
+
+Cada tela de venda aberta é uma sessão (``nova_sessao``). Ao adicionar um
+item, a quantidade fica reservada para a sessão por ``DURACAO`` (renovada
+a cada novo item); o estoque disponível para os outros vendedores passa a
+ser ``quantidade - reservas válidas``. Assim a falta de estoque aparece ao
+adicionar o item, e não só ao salvar a venda depois de minutos digitando.
+
+``repository.inserir_venda`` desconta as reservas das outras sessões ao
+conferir o estoque e apaga as da própria sessão na mesma transação (a
+reserva vira venda). Reservas vencidas são ignoradas e removidas aos poucos.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+from db import fetchall, get_conn, execute
+
+# Tempo que um item fica reservado sem o carrinho ser mexido
+DURACAO = timedelta(minutes=15)
+
+
+class EstoqueInsuficiente(ValueError):
+    """A quantidade pedida passa do estoque disponível (descontadas as reservas)."""
+
+
+def _placeholders(n):
+    return ",".join(["%s"] * n)
+
+def _como_datetime(valor):
+    # NOW() no SQLite chega como texto
+    return valor if isinstance(valor, datetime) else datetime.fromisoformat(str(valor))
+
+def nova_sessao():
+    """Identificador de um carrinho (uma tela de venda aberta)."""
+    return uuid.uuid4().hex
+
+# region Dentro de uma transação
+def reservado_por_outros(cur, ids, sessao=None):
+    """
+    Quantidade reservada (reservas válidas) de cada produto por outras sessões.
+
+    Parameters
+    ----------
+    cur : cursor
+        Cursor da transação em andamento (``dictionary=True``).
+    ids : list[int]
+        Produtos.
+    sessao : str, optional
+        Sessão cujas reservas não contam (a do próprio carrinho).
+
+    Returns
+    -------
+    dict
+        id_produto -> quantidade reservada (só os que têm reserva).
+    """
+    if not ids:
+        return {}
+    cur.execute(
+        f"""SELECT id_produto, SUM(quantidade) AS reservado FROM reserva_estoque
+            WHERE id_produto IN ({_placeholders(len(ids))}) AND expira_em > NOW() AND sessao <> %s
+            GROUP BY id_produto""",
+        tuple(ids) + (sessao or "",)
+    )
+    return {r["id_produto"]: int(r["reservado"]) for r in cur.fetchall()}
+
+def converter(cur, sessao):
+    """Apaga as reservas da sessão (chamada ao gravar a venda, na mesma transação)."""
+    if sessao:
+        cur.execute("DELETE FROM reserva_estoque WHERE sessao = %s", (sessao,))
+#endregion
+
+def reservar(sessao, id_produto, quantidade):
+    """
+    Reserva ``quantidade`` de um produto para a sessão.
+
+    A linha do produto é travada (``FOR UPDATE``), então duas sessões não
+    reservam o mesmo estoque. As reservas da sessão são renovadas.
+
+    Returns
+    -------
+    dict
+        O produto (``id_produto``, ``nome``, ``preco``) e ``disponivel``
+        (o que sobrou para a sessão depois desta reserva).
+
+    Raises
+    ------
+    EstoqueInsuficiente
+        Se não houver estoque disponível (nada é reservado).
+    """
+    conn = get_conn()
+    cur = None
+    try:
+        conn.start_transaction()
+        cur = conn.cursor(dictionary=True)
+        cur.execute("""SELECT id_produto, nome, preco, quantidade, NOW() AS agora FROM produto
+                       WHERE id_produto = %s FOR UPDATE""", (id_produto,))
+        produto = cur.fetchone()
+        if produto is None:
+            raise ValueError(f"Produto {id_produto} não encontrado.")
+
+        cur.execute("""SELECT COALESCE(SUM(quantidade), 0) AS reservado FROM reserva_estoque
+                       WHERE id_produto = %s AND expira_em > NOW()""", (id_produto,))
+        reservado = int(cur.fetchone()["reservado"])
+        disponivel = produto["quantidade"] - reservado
+        if quantidade > disponivel:
+            detalhe = f" ({produto['quantidade']} em estoque, {reservado} reservados)" if reservado else ""
+            raise EstoqueInsuficiente(
+                f"O produto '{produto['nome']}' possui apenas {max(disponivel, 0)} disponíveis{detalhe}.\n"
+                f"Você tentou adicionar {quantidade}."
+            )
+
+        expira = _como_datetime(produto["agora"]) + DURACAO
+        # Só as vencidas deste produto: a linha travada acima as protege de outras sessões
+        cur.execute("DELETE FROM reserva_estoque WHERE id_produto = %s AND expira_em <= NOW()", (id_produto,))
+        cur.execute("UPDATE reserva_estoque SET expira_em = %s WHERE sessao = %s", (expira, sessao))
+        cur.execute("""INSERT INTO reserva_estoque (sessao, id_produto, quantidade, expira_em)
+                       VALUES (%s, %s, %s, %s)""", (sessao, id_produto, quantidade, expira))
+        conn.commit()
+        return {"id_produto": produto["id_produto"], "nome": produto["nome"], "preco": produto["preco"],
+                "disponivel": disponivel - quantidade}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if cur is not None:
+            cur.close()
+        conn.close()
+
+def liberar(sessao, id_produto=None):
+    """Cancela as reservas da sessão (só as de um produto, se informado)."""
+    if id_produto is None:
+        execute("DELETE FROM reserva_estoque WHERE sessao = %s", (sessao,))
+    else:
+        execute("DELETE FROM reserva_estoque WHERE sessao = %s AND id_produto = %s", (sessao, id_produto))
+
+def disponiveis(ids, sessao=None):
+    """
+    Estoque disponível de cada produto: quantidade menos as reservas válidas
+    de outras sessões.
+
+    Returns
+    -------
+    dict
+        id_produto -> {"quantidade", "reservado", "disponivel"}.
+    """
+    if not ids:
+        return {}
+    rows = fetchall(
+        f"""SELECT p.id_produto, p.quantidade, COALESCE(SUM(r.quantidade), 0) AS reservado
+            FROM produto p
+            LEFT JOIN reserva_estoque r
+                   ON r.id_produto = p.id_produto AND r.expira_em > NOW() AND r.sessao <> %s
+            WHERE p.id_produto IN ({_placeholders(len(ids))})
+            GROUP BY p.id_produto, p.quantidade""",
+        (sessao or "",) + tuple(ids)
+    )
+    return {r["id_produto"]: {"quantidade": r["quantidade"], "reservado": int(r["reservado"]),
+                              "disponivel": r["quantidade"] - int(r["reservado"])} for r in rows}
+
+def limpar_expiradas():
+    """Remove as reservas vencidas."""
+    execute("DELETE FROM reserva_estoque WHERE expira_em <= NOW()")
@@ -0,0 +1,173 @@
+"""
+Módulo tarefas
+--------------
+Executa chamadas ao banco (repository) fora da thread do Tkinter.
+
+O Tkinter não é thread-safe: as funções rodam num pool de threads e os
+resultados voltam para a thread principal por uma fila, lida com
+``root.after()``. Só a thread principal toca nos widgets.
+"""
+
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentacao
+
+
+class Tarefa:
+    """Chamada agendada no executor; pode ser cancelada."""
+
+    def __init__(self, chave=None):
+        self.chave = chave
+        self.cancelada = False
+        self.future = None
+
+    def cancelar(self):
+        """
+        Cancela a tarefa. Se ela ainda não começou, nem chega a rodar;
+        se já está rodando, o resultado é descartado.
+        """
+        self.cancelada = True
+        if self.future is not None:
+            self.future.cancel()
+
+
+class ExecutorTk:
+    """
+    Pool de threads para consultas ao banco integrado ao loop do Tk.
+
+    Tarefas com a mesma ``chave`` se substituem: ao agendar uma nova, a
+    anterior é cancelada (ex: clicar "Atualizar" várias vezes seguidas).
+    """
+
+    # Intervalo (ms) entre leituras da fila de resultados
+    INTERVALO = 20
+
+    def __init__(self, root, workers=4, ao_mudar_ocupado=None, ao_falhar=None):
+        """
+        Parameters
+        ----------
+        root : tk.Tk
+            Janela principal (usada para o ``after``).
+        workers : int
+            Quantidade de threads.
+        ao_mudar_ocupado : callable, optional
+            Chamado na thread do Tk com a quantidade de tarefas pendentes,
+            sempre que ela muda (para mostrar o indicador de carregamento).
+        ao_falhar : callable, optional
+            Tratamento padrão de erro, usado quando a tarefa não informa um.
+        """
+        self.root = root
+        self.ao_mudar_ocupado = ao_mudar_ocupado
+        self.ao_falhar = ao_falhar
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="repo")
+        self._resultados = queue.Queue()
+        self._por_chave = {}
+        self._pendentes = 0
+        self._agendado = False
+        self._encerrado = False
+
+    @property
+    def pendentes(self):
+        return self._pendentes
+
+    def executar(self, func, *args, ao_concluir=None, ao_falhar=None, chave=None, **kwargs):
+        """
+        Agenda ``func(*args, **kwargs)`` numa thread de trabalho.
+
+        Parameters
+        ----------
+        func : callable
+            Função a executar (normalmente do repository).
+        ao_concluir : callable, optional
+            Recebe o retorno de ``func``, na thread do Tk.
+        ao_falhar : callable, optional
+            Recebe a exceção levantada por ``func``, na thread do Tk.
+        chave : hashable, optional
+            Identifica requisições equivalentes; a anterior é cancelada.
+
+        Returns
+        -------
+        Tarefa
+        """
+        tarefa = Tarefa(chave)
+        # Tela/ação que pediu a consulta, para o diagnóstico saber quem a disparou
+        origem = instrumentacao.local_chamada(2, pular_privadas=True)
+        if chave is not None:
+            anterior = self._por_chave.get(chave)
+            if anterior is not None:
+                anterior.cancelar()
+            self._por_chave[chave] = tarefa
+
+        def rodar():
+            if tarefa.cancelada:
+                self._resultados.put((tarefa, None, None, None, None))
+                return
+            instrumentacao.definir_origem(origem)
+            try:
+                resultado = func(*args, **kwargs)
+            except Exception as e:
+                self._resultados.put((tarefa, None, e, ao_concluir, ao_falhar))
+            else:
+                self._resultados.put((tarefa, resultado, None, ao_concluir, ao_falhar))
+
+        def ao_terminar(future):
+            # Cancelada antes de rodar: avisa a fila para descontar a pendência
+            if future.cancelled():
+                self._resultados.put((tarefa, None, None, None, None))
+
+        tarefa.future = self._pool.submit(rodar)
+        tarefa.future.add_done_callback(ao_terminar)
+        self._mudar_pendentes(+1)
+        self._agendar()
+        return tarefa
+
+    def cancelar(self, chave):
+        """Cancela a tarefa pendente com essa chave (se houver)."""
+        tarefa = self._por_chave.pop(chave, None)
+        if tarefa is not None:
+            tarefa.cancelar()
+
+    def _mudar_pendentes(self, delta):
+        self._pendentes += delta
+        if self.ao_mudar_ocupado:
+            self.ao_mudar_ocupado(self._pendentes)
+
+    def _agendar(self):
+        if not self._agendado and not self._encerrado:
+            self._agendado = True
+            self.root.after(self.INTERVALO, self._processar)
+
+    def _processar(self):
+        """Entrega os resultados prontos às callbacks (thread do Tk)."""
+        self._agendado = False
+        try:
+            while True:
+                try:
+                    tarefa, resultado, erro, ao_concluir, ao_falhar = self._resultados.get_nowait()
+                except queue.Empty:
+                    break
+                self._mudar_pendentes(-1)
+                if self._por_chave.get(tarefa.chave) is tarefa:
+                    del self._por_chave[tarefa.chave]
+                if tarefa.cancelada:
+                    continue
+                if erro is not None:
+                    tratar = ao_falhar or self.ao_falhar
+                    if tratar:
+                        tratar(erro)
+                    else:
+                        raise erro
+                elif ao_concluir:
+                    ao_concluir(resultado)
+        finally:
+            # Uma callback com erro não pode travar a entrega das demais
+            if self._pendentes > 0:
+                self._agendar()
+
+    def encerrar(self):
+        """Cancela o que ainda não começou e libera as threads."""
+        self._encerrado = True
+        for tarefa in list(self._por_chave.values()):
+            tarefa.cancelar()
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,218 @@
+"""
+Módulo teste_carga
+------------------
+Teste de carga das vendas: N vendedores simulados (threads) gravando
+vendas ao mesmo tempo, com cada estratégia de concorrência do
+``repository.inserir_venda`` (pessimista e otimista).
+
+Para haver disputa, os carrinhos sorteiam produtos de um conjunto pequeno
+de mais vendidos (``--quentes``). Para cada estratégia são medidos vendas
+por segundo, taxa de aborto (vendas recusadas por falta de estoque ou que
+esgotaram as tentativas), repetições por deadlock/bloqueio e latência
+(p50/p95/p99) das vendas gravadas.
+
+Uso:
+    python teste_carga.py --perfil pequeno --vendedores 16 --duracao 20
+    python teste_carga.py --backend mysql --sem-gerar --vendedores 32 --estoque 500 --saida carga.json
+
+Por padrão usa um banco SQLite em memória, que executa uma transação por
+vez (as estratégias ficam parecidas); para medir a disputa de bloqueios
+use ``--backend mysql`` com um banco local só para teste: as vendas
+gravadas (e o ``--estoque``) alteram os dados.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+import benchmark
+import db
+import gerador_dados
+
+
+def _vendedor(estrategia, clientes, quentes, itens_por_venda, fim, rng, resultado, lock):
+    """Grava vendas até ``fim`` (relógio monotônico), anotando cada uma em ``resultado``."""
+    import repository as repo
+    import reservas
+
+    tempos, abortos, erros = [], {"estoque": 0, "conflito": 0}, []
+    while time.monotonic() < fim:
+        itens = [(id_produto, 1) for id_produto in rng.sample(quentes, min(itens_por_venda, len(quentes)))]
+        inicio = time.perf_counter()
+        try:
+            repo.inserir_venda(rng.choice(clientes), itens, estrategia=estrategia)
+        except reservas.EstoqueInsuficiente:
+            abortos["estoque"] += 1
+        except Exception as e:
+            if db.conflito_transitorio(e):
+                abortos["conflito"] += 1 # esgotou as tentativas
+            else:
+                erros.append(str(e))
+        else:
+            tempos.append(time.perf_counter() - inicio)
+
+    with lock:
+        resultado["tempos"] += tempos
+        resultado["estoque"] += abortos["estoque"]
+        resultado["conflito"] += abortos["conflito"]
+        resultado["erros"] += erros
+
+def rodar(estrategia, contexto, vendedores=8, duracao=10.0, quentes=20, itens_por_venda=3,
+          estoque=None, semente=42):
+    """
+    Roda uma estratégia por ``duracao`` segundos com ``vendedores`` threads.
+
+    Parameters
+    ----------
+    contexto : dict
+        Ids disponíveis (``gerador_dados.gerar`` ou ``benchmark.contexto_do_banco``).
+    quentes : int
+        Quantidade de produtos sorteados nos carrinhos (menos = mais disputa).
+    estoque : int, optional
+        Se informado, o estoque dos produtos quentes volta a esse valor antes
+        do teste (as estratégias começam iguais).
+
+    Returns
+    -------
+    dict
+        Vendas gravadas e por segundo, abortos (por estoque e por
+        conflito), taxa de aborto, repetições, erros e latência em ms.
+    """
+    import repository as repo
+
+    rng = random.Random(semente)
+    produtos = sorted(contexto["produtos"])
+    quentes = produtos if quentes >= len(produtos) else sorted(rng.sample(produtos, quentes))
+    if estoque is not None:
+        db.execute(f"UPDATE produto SET quantidade = %s WHERE id_produto IN ({','.join(['%s'] * len(quentes))})",
+                   (estoque,) + tuple(quentes))
+
+    repo.zerar_estatisticas_venda()
+    resultado = {"tempos": [], "estoque": 0, "conflito": 0, "erros": []}
+    lock = threading.Lock()
+    inicio = time.monotonic()
+    fim = inicio + duracao
+    threads = [
+        threading.Thread(target=_vendedor, daemon=True,
+                         args=(estrategia, contexto["clientes"], quentes, itens_por_venda, fim,
+                               random.Random(semente + i), resultado, lock))
+        for i in range(vendedores)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    decorrido = time.monotonic() - inicio
+
+    tempos = sorted(resultado["tempos"])
+    abortos = resultado["estoque"] + resultado["conflito"]
+    tentadas = len(tempos) + abortos + len(resultado["erros"])
+
+    def ms(p):
+        valor = benchmark.percentil(tempos, p)
+        return None if valor is None else valor * 1000
+
+    return {
+        "vendas": len(tempos),
+        "vendas_por_s": len(tempos) / decorrido,
+        "abortos_estoque": resultado["estoque"],
+        "abortos_conflito": resultado["conflito"],
+        "taxa_aborto": abortos / tentadas if tentadas else 0.0,
+        "repeticoes": repo.estatisticas_venda()["repeticoes"],
+        "erros": len(resultado["erros"]),
+        "primeiro_erro": resultado["erros"][0] if resultado["erros"] else None,
+        "p50_ms": ms(50),
+        "p95_ms": ms(95),
+        "p99_ms": ms(99),
+        "segundos": decorrido,
+    }
+
+def _formatar(estrategia, r):
+    latencia = (f"p50 {r['p50_ms']:.1f} ms | p95 {r['p95_ms']:.1f} ms | p99 {r['p99_ms']:.1f} ms"
+                if r["vendas"] else "sem vendas gravadas")
+    texto = (f"{estrategia:<11} {r['vendas']} vendas ({r['vendas_por_s']:.1f}/s) | "
+             f"abortos {r['taxa_aborto']:.1%} (estoque {r['abortos_estoque']}, conflito {r['abortos_conflito']}) | "
+             f"repetições {r['repeticoes']} | {latencia}")
+    if r["erros"]:
+        texto += f"\n{'':<11} {r['erros']} erros, ex: {r['primeiro_erro']}"
+    return texto
+
+
+def main(argv=None):
+    import repository as repo
+
+    parser = argparse.ArgumentParser(description="Teste de carga das estratégias de gravação de vendas.")
+    parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--sqlite-caminho", default=":memory:",
+                        help="arquivo do banco SQLite (padrão: em memória)")
+    parser.add_argument("--sem-gerar", action="store_true",
+                        help="usa os dados que já estão no banco, sem gerar novos")
+    gerador_dados.argumentos_volumes(parser)
+    parser.add_argument("--estrategias", nargs="+", choices=repo.ESTRATEGIAS_VENDA,
+                        default=list(repo.ESTRATEGIAS_VENDA))
+    parser.add_argument("--vendedores", type=int, default=8, help="vendedores simultâneos (padrão: 8)")
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos por estratégia (padrão: 10)")
+    parser.add_argument("--quentes", type=int, default=20,
+                        help="produtos sorteados nos carrinhos; menos = mais disputa (padrão: 20)")
+    parser.add_argument("--itens", type=int, default=3, help="produtos por venda (padrão: 3)")
+    parser.add_argument("--estoque", type=int,
+                        help="estoque dos produtos quentes no início de cada estratégia (padrão: não altera)")
+    parser.add_argument("--saida", help="arquivo JSON do relatório")
+    args = parser.parse_args(argv)
+
+    def log(msg):
+        print(msg, file=sys.stderr)
+
+    if args.backend == "sqlite":
+        db.configurar_backend("sqlite", caminho=args.sqlite_caminho)
+    else:
+        # Uma conexão por vendedor: a espera medida é a do banco, não a do pool
+        db.configurar_backend("mysql", tamanho=args.vendedores)
+    db.iniciar_backend()
+
+    volumes = gerador_dados.volumes_dos_argumentos(args)
+    if args.sem_gerar:
+        contexto = benchmark.contexto_do_banco()
+    else:
+        inicio = time.perf_counter()
+        contexto = gerador_dados.gerar(volumes, semente=args.semente, log=log)
+        log(f"Dados gerados em {time.perf_counter() - inicio:.1f}s")
+
+    resultados = {}
+    for estrategia in args.estrategias:
+        log(f"{estrategia}: {args.vendedores} vendedores por {args.duracao:g}s...")
+        resultados[estrategia] = rodar(estrategia, contexto, args.vendedores, args.duracao, args.quentes,
+                                       args.itens, args.estoque, args.semente)
+        print(_formatar(estrategia, resultados[estrategia]))
+
+    db.get_backend().fechar()
+
+    if args.saida:
+        relatorio = {
+            "meta": {
+                "data": datetime.now().isoformat(timespec="seconds"),
+                "backend": args.backend,
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "volumes": None if args.sem_gerar else volumes,
+                "semente": args.semente,
+                "vendedores": args.vendedores,
+                "duracao": args.duracao,
+                "quentes": args.quentes,
+                "itens": args.itens,
+                "estoque": args.estoque,
+            },
+            "resultados": resultados,
+        }
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
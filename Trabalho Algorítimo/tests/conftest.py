@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os módulos do sistema ficam soltos na pasta do projeto
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,24 @@
+import busca_produtos
+
+
+def _indice(*produtos):
+    indice = busca_produtos._Indice()
+    for id_produto, nome, categoria in produtos:
+        indice.adicionar({"id_produto": id_produto, "nome": nome, "categoria": categoria, "preco": None})
+    return indice
+
+
+def test_prefixo_de_palavra_so_da_categoria():
+    indice = _indice((1, "Suco de Uva", "Bebidas"), (2, "Biscoito Maizena", "Mercearia"))
+
+    ids = [p["id_produto"] for p in indice.buscar("b", 10)]
+
+    # "Biscoito" é do nome, "Bebidas" só da categoria
+    assert ids == [2, 1]
+    assert [p["id_produto"] for p in indice.buscar("bebidas", 10)] == [1]
+
+
+def test_palavra_do_nome_vale_mais_que_da_categoria():
+    indice = _indice((1, "Suco Doce", "Bebidas"), (2, "Bebida Lactea", "Laticinios"))
+
+    assert [p["id_produto"] for p in indice.buscar("bebida", 10)] == [2, 1]
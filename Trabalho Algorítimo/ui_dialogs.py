@@ -5,16 +5,49 @@ Define janelas de diálogo (forms) para adicionar/editar dados.
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox
+from decimal import Decimal
+from tkinter import ttk, messagebox, filedialog
 import repository as repo
-from tkcalendar import DateEntry
+import catalogo
+import db
+import busca_produtos
+import importacao
+import reservas
+
+def carregar_dados(top, executor, func, *args, ao_concluir, ao_falhar=None):
+    """
+    Executa ``func(*args)`` em segundo plano (se houver executor) e entrega
+    o resultado a ``ao_concluir``, desde que a janela ainda esteja aberta.
+    Um erro vai para ``ao_falhar``, se informado (senão, para o aviso
+    padrão do executor).
+    """
+    def entregar(resultado):
+        if top.winfo_exists():
+            ao_concluir(resultado)
+
+    def falhar(erro):
+        if top.winfo_exists():
+            ao_falhar(erro)
+
+    if executor is None:
+        try:
+            resultado = func(*args)
+        except Exception as e:
+            if ao_falhar is None:
+                raise
+            falhar(e)
+        else:
+            entregar(resultado)
+    else:
+        executor.executar(func, *args, ao_concluir=entregar, ao_falhar=falhar if ao_falhar else None)
 
 # region Modal Produto
 class ProdutoDialog:
-    def __init__(self, parent, produto = None):
+    def __init__(self, parent, produto = None, executor=None):
         """
         Dialog para adicionar/editar Produto.
         Se 'produto' for passado, os campos são preenchidos para edição.
+        Se 'executor' for passado, os fornecedores são carregados em segundo plano.
         """
         self.top = tk.Toplevel(parent)
         if (produto):
@@ -46,11 +79,8 @@ class ProdutoDialog:
         tk.Label(self.top, text="Fornecedor:").grid(row=4, column=0, padx=5, pady=5)
 
         self.valores_cb_forn = []
-        for item in repo.listar_fornecedores():
-            self.valores_cb_forn.append({"id": item["id_fornecedor"],
-                                    "nome": item["nome"]})
-
-        self.cb_forn = ttk.Combobox(self.top, values=[item["nome"] for item in self.valores_cb_forn], state="readonly")
+        self.cb_forn = ttk.Combobox(self.top, values=[], state="disabled")
+        self.cb_forn.set("Carregando...")
         self.cb_forn.grid(row=4, column=1, padx=5, pady=5)
 
         tk.Label(self.top, text="Estoque mínimo:").grid(row=5, column=0, padx=5, pady=5)
@@ -67,11 +97,22 @@ class ProdutoDialog:
             self.entry_qtd.insert(0, produto["quantidade"])
             self.entry_est_min.insert(0, produto["estoque_minimo"])
 
-            if produto.get("id_fornecedor"):
-                forn = repo.buscar_fornecedor(produto["id_fornecedor"])
-                self.cb_forn.set(forn["nome"])
-            else:
-                self.cb_forn.set("")
+        id_forn_atual = produto.get("id_fornecedor") if produto else None
+
+        # Fornecedores vêm do catálogo em memória (sem consulta após a primeira carga)
+        def buscar():
+            forn = catalogo.buscar_fornecedor(id_forn_atual) if id_forn_atual else None
+            return catalogo.listar_fornecedores(), forn
+
+        def preencher(resultado):
+            fornecedores, forn = resultado
+            for item in fornecedores:
+                self.valores_cb_forn.append({"id": item["id_fornecedor"],
+                                        "nome": item["nome"]})
+            self.cb_forn.config(values=[item["nome"] for item in self.valores_cb_forn], state="readonly")
+            self.cb_forn.set(forn["nome"] if forn else "")
+
+        carregar_dados(self.top, executor, buscar, ao_concluir=preencher)
 
     def ok(self):
         try:
@@ -130,12 +171,14 @@ class ProdutoDialog:
 
 # region Modal Pessoa
 class PessoaDialog:
-    def __init__(self, parent, title="Nova Pessoa", pessoa=None):
+    def __init__(self, parent, title="Nova Pessoa", pessoa=None, executor=None):
         """
         Dialog para adicionar/editar Cliente ou Fornecedor.
         Se 'pessoa' for passado, os campos são preenchidos para edição.
+        Se 'executor' for passado, estados e cidades são carregados em segundo plano.
         """
         self.result = None
+        self.executor = executor
         self.top = tk.Toplevel(parent)
         self.top.title(title)
         self.top.transient(parent)
@@ -156,31 +199,49 @@ class PessoaDialog:
 
         # Endereço
         self.valores_cb_estado = []
-        for e in repo.listar_estados():
-            self.valores_cb_estado.append({"id": e["id_estado"], "nome": e["nome"]})
         
         ttk.Label(self.top, text="Estado:").grid(row=3, column=0, padx=5, pady=5)
-        self.cb_estado = ttk.Combobox(self.top, values=[e["nome"] for e in self.valores_cb_estado], state="readonly")
+        self.cb_estado = ttk.Combobox(self.top, values=[], state="disabled")
         self.cb_estado.grid(row=3, column=1, sticky="w", padx=5, pady=5)
 
         ttk.Label(self.top, text="Cidade:").grid(row=4, column=0, padx=5, pady=5)
         self.cb_cidade = ttk.Combobox(self.top)
         self.cb_cidade.grid(row=4, column=1, sticky="w", padx=5, pady=5)
 
+        # Estado cujas cidades estão no combobox (o índice por prefixo já está montado)
+        self.id_estado_cidades = None
+
+        def buscar_cidades(estado_nome):
+            estado = catalogo.buscar_estado_por_nome(estado_nome)
+            if not estado:
+                return None
+            # Monta o índice por prefixo aqui, fora da thread da interface
+            return estado["id_estado"], catalogo.buscar_cidades_por_prefixo(estado["id_estado"], "")
+
+        def mostrar_cidades(resultado):
+            if resultado is not None:
+                self.id_estado_cidades, cidades = resultado
+                self.cb_cidade["values"] = [c["nome"] for c in cidades]
+
+                #Se a cidade atual não é do estado, limpa
+                if not catalogo.buscar_cidade_por_nome(self.id_estado_cidades, self.cb_cidade.get().strip()):
+                    self.cb_cidade.set("")
+
         def carregar_cidades(event=None):
             estado_nome = self.cb_estado.get()
             if estado_nome:
-                estado = next((e for e in repo.listar_estados() if e["nome"] == estado_nome), None)
-                if estado:
-                    cidades = repo.listar_cidades(estado["id_estado"])
-                    lista_cidades = [c["nome"] for c in cidades]
-                    self.cb_cidade["values"] = lista_cidades
+                self.id_estado_cidades = None
+                carregar_dados(self.top, executor, buscar_cidades, estado_nome, ao_concluir=mostrar_cidades)
 
-                    #Se a cidade atual não está na lista, limpa
-                    if self.cb_cidade.get() not in lista_cidades:
-                        self.cb_cidade.set("")
+        def filtrar_cidades(event):
+            """Deixa na lista só as cidades que começam com o texto digitado."""
+            if event.keysym in ("Up", "Down", "Return", "Escape", "Tab") or self.id_estado_cidades is None:
+                return
+            cidades = catalogo.buscar_cidades_por_prefixo(self.id_estado_cidades, self.cb_cidade.get())
+            self.cb_cidade["values"] = [c["nome"] for c in cidades]
 
         self.cb_estado.bind("<<ComboboxSelected>>", carregar_cidades)
+        self.cb_cidade.bind("<KeyRelease>", filtrar_cidades)
 
         ttk.Label(self.top, text="Logradouro:").grid(row=5, column=0, padx=5, pady=5)
         self.e_rua = ttk.Entry(self.top, width=30)
@@ -199,7 +260,8 @@ class PessoaDialog:
         self.e_cep.grid(row=8, column=1, sticky="w", padx=5, pady=5)
 
         # Botões
-        ttk.Button(self.top, text="Salvar", command=self.on_save).grid(row=9, column=0, pady=10)
+        self.btn_salvar = ttk.Button(self.top, text="Salvar", command=self.on_save)
+        self.btn_salvar.grid(row=9, column=0, pady=10)
         ttk.Button(self.top, text="Cancelar", command=self.top.destroy).grid(row=9, column=1, pady=10)
 
         # Preenche se for edição
@@ -209,14 +271,22 @@ class PessoaDialog:
             self.e_tel.insert(0, pessoa["telefone"])
             self.e_email.insert(0, pessoa["email"])
             self.id_endereco = pessoa["id_endereco"]
-            self.cb_estado.set(pessoa["estado"])
-            carregar_cidades()
             self.cb_cidade.set(pessoa["cidade"])
             self.e_rua.insert(0, pessoa["rua"])
             self.e_numero.insert(0, pessoa["numero"])
             self.e_bairro.insert(0, pessoa["bairro"])
             self.e_cep.insert(0, pessoa["cep"])
 
+        def mostrar_estados(estados):
+            for e in estados:
+                self.valores_cb_estado.append({"id": e["id_estado"], "nome": e["nome"]})
+            self.cb_estado.config(values=[e["nome"] for e in self.valores_cb_estado], state="readonly")
+            if pessoa:
+                self.cb_estado.set(pessoa["estado"])
+                carregar_cidades()
+
+        carregar_dados(self.top, executor, catalogo.listar_estados, ao_concluir=mostrar_estados)
+
     def on_save(self):
         try:
             nome = self.e_nome.get().strip()
@@ -268,44 +338,84 @@ class PessoaDialog:
                 if not cidade_nome:
                     raise ValueError("Selecione ou insira uma cidade!")
                 else: #Se estado e cidade forem válidos
-                    cidade = next((c for c in repo.listar_cidades(id_estado) if c["nome"] == cidade_nome), None)
-                    if cidade:
-                        id_cidade = cidade["id_cidade"]
-                    else:
-                        # Se a cidade não existir, cria no banco
-                        id_cidade = repo.inserir_cidade(cidade_nome, id_estado)
+                    # Sem diferenciar acentos/maiúsculas: "sao paulo" é a cidade "São Paulo"
+                    cidade = catalogo.buscar_cidade_por_nome(id_estado, cidade_nome)
+                    id_cidade = cidade["id_cidade"] if cidade else None
 
         except Exception as e:
             messagebox.showerror("Erro", f"Preencha corretamente os campos!\n{e}")
             return
 
-        # Atualizando ou criando o endereço
-        if self.id_endereco:
-            repo.atualizar_endereco(self.id_endereco, rua, numero, bairro, cep, id_cidade)
-        else:
-            self.id_endereco = repo.inserir_endereco(rua, numero, bairro, cep, id_cidade)
+        id_endereco = self.id_endereco
+
+        def gravar():
+            # Se a cidade não existir, cria no banco
+            cidade = id_cidade if id_cidade is not None else repo.inserir_cidade(cidade_nome, id_estado)
+            # Atualizando ou criando o endereço
+            if id_endereco:
+                repo.atualizar_endereco(id_endereco, rua, numero, bairro, cep, cidade)
+                return id_endereco
+            return repo.inserir_endereco(rua, numero, bairro, cep, cidade)
+
+        def concluir(novo_endereco):
+            # Resultado final
+            self.id_endereco = novo_endereco
+            self.result = (nome, tel, email, novo_endereco)
+            self.top.destroy()
 
-        # Resultado final
-        self.result = (nome, tel, email, self.id_endereco)
-        self.top.destroy()
+        def falhou(erro):
+            messagebox.showerror("Erro", f"Erro ao salvar o endereço!\n{erro}")
+            self.btn_salvar.config(state="normal")
+
+        # Desabilita o botão enquanto grava, para evitar clique duplo
+        self.btn_salvar.config(state="disabled")
+        carregar_dados(self.top, self.executor, gravar, ao_concluir=concluir, ao_falhar=falhou)
 #end region
 
 # region Modal Venda
 class VendaDialog:
-    """Janela para cadastrar venda"""
-    def __init__(self, parent):
-        
+    """
+    Janela para cadastrar venda.
+
+    Cada item adicionado reserva o estoque (``reservas``) para esta janela;
+    fechar sem salvar cancela as reservas.
+
+    Se o banco estiver fora do ar, a janela passa ao modo sem conexão
+    (``offline``): clientes e produtos vêm de ``contingencia`` (as grades
+    da tela principal), os itens entram sem reserva pelo preço conhecido e
+    a venda é salva sem a conferência final; quem a grava é o diário local
+    (``diario_vendas``), que a envia quando o banco voltar.
+    """
+
+    # Quantidade de produtos mostrados na busca
+    LIMITE_RESULTADOS = 15
+
+    def __init__(self, parent, executor=None, contingencia=None):
+        """
+        Parameters
+        ----------
+        contingencia : callable, optional
+            Sem argumentos; retorna ``(clientes, produtos)`` já em memória
+            (dicts como os do repository), usados se o banco não responder.
+        """
+        self.executor = executor
+        self.contingencia = contingencia
+        self.offline = False
         self.top = tk.Toplevel(parent)
         self.top.title("Adicionar Venda")
         self.result = None
         self.top.transient(parent) #Deixa a janela sempre na frente e minimiza junto com a janela principal (parent).
         self.top.grab_set() #Bloqueia a interação com outras janelas da aplicação enquanto essa tiver aberta.
+        self.top.protocol("WM_DELETE_WINDOW", self.cancelar)
+
+        # Carrinho: as reservas de estoque ficam nessa sessão
+        self.sessao = reservas.nova_sessao()
 
-        # Seleção de cliente
+        # Seleção de cliente (id ou começo do nome; a lista traz só os que combinam)
         tk.Label(self.top, text="Cliente:").grid(row=0, column=0, padx=5, pady=5)
-        clientes = repo.listar_clientes()
-        self.cb_cliente = ttk.Combobox(self.top, values=[f"{c['id_cliente']} - {c['nome']}" for c in clientes], state="readonly")
+        self.cb_cliente = ttk.Combobox(self.top, values=[], state="disabled")
         self.cb_cliente.grid(row=0, column=1, padx=5, pady=5, columnspan=3, sticky="ew")
+        self.cb_cliente.bind("<KeyRelease>", self.filtrar_clientes)
 
 
         # Tree para itens da venda
@@ -319,32 +429,138 @@ class VendaDialog:
         self.tree_itens.grid(row=1, column=0, columnspan=4, padx=5, pady=5)
 
 
-        # Seleção de produto
+        # Busca de produto (por id ou começo das palavras do nome/categoria)
         tk.Label(self.top, text="Produto:").grid(row=2, column=0, padx=5, pady=5)
-        produtos = repo.listar_produtos()
-        self.cb_produto = ttk.Combobox(self.top, values=[f"{p['id_produto']} - {p['nome']} ({p['quantidade']} em estoque)" for p in produtos], width=50, state="readonly")
-        self.cb_produto.grid(row=2, column=1, padx=5, pady=5)
+        self.e_busca = ttk.Entry(self.top, width=50, state="disabled")
+        self.e_busca.grid(row=2, column=1, padx=5, pady=5)
 
         tk.Label(self.top, text="Quantidade:").grid(row=2, column=2, padx=5, pady=5)
         self.entry_qtd = tk.Entry(self.top)
         self.entry_qtd.grid(row=2, column=3, padx=5, pady=5)
 
-
-        ttk.Button(self.top, text="Adicionar Item", command=self.add_item).grid(row=3, column=0, columnspan=4, pady=5)
+        self.resultados = []
+        self.lb_produtos = tk.Listbox(self.top, height=6, width=60, exportselection=False)
+        self.lb_produtos.grid(row=3, column=1, padx=5, pady=5, sticky="ew")
+        self.lbl_estoque = ttk.Label(self.top, text="")
+        self.lbl_estoque.grid(row=3, column=2, columnspan=2, padx=5, pady=5, sticky="nw")
+
+        self.e_busca.bind("<KeyRelease>", self.filtrar_produtos)
+        self.e_busca.bind("<Down>", lambda e: self._ir_para_lista())
+        self.e_busca.bind("<Return>", lambda e: self.entry_qtd.focus_set())
+        self.lb_produtos.bind("<<ListboxSelect>>", self.mostrar_estoque)
+        self.lb_produtos.bind("<Return>", lambda e: self.entry_qtd.focus_set())
+        self.entry_qtd.bind("<Return>", lambda e: self.add_item())
+
+        ttk.Button(self.top, text="Adicionar Item", command=self.add_item).grid(row=4, column=0, columnspan=3, pady=5)
+        self.lbl_total = ttk.Label(self.top, text="Total: R$ 0.00")
+        self.lbl_total.grid(row=4, column=3, padx=5, pady=5, sticky="e")
+        # Linhas do carrinho: iid da tree -> (id_produto, quantidade, preço em Decimal)
+        self.itens = {}
 
         # Botão de salvar (precisa da referência para desabilitar no clique)
         self.btn_salvar = ttk.Button(self.top, text="Salvar Venda", command=self.salvar_venda)
-        self.btn_salvar.grid(row=4, column=0, columnspan=4, pady=10)
+        self.btn_salvar.grid(row=5, column=0, columnspan=4, pady=10)
+
+        def buscar():
+            # O índice de busca é montado aqui, fora da thread da interface
+            busca_produtos.carregar()
+            return repo.buscar_clientes_por_prefixo("", self.LIMITE_RESULTADOS)
+
+        def preencher(clientes):
+            self._mostrar_clientes(clientes)
+            self.cb_cliente.config(state="normal")
+            self.e_busca.config(state="normal")
+            self.e_busca.focus_set()
+
+        def falhou(erro):
+            if not db.servidor_indisponivel(erro) or self.contingencia is None:
+                messagebox.showerror("Erro", f"Erro ao acessar o banco!\n{erro}")
+                return
+            self._entrar_offline()
+            clientes, produtos = self.contingencia()
+            busca_produtos.carregar_de(produtos)
+            if not busca_produtos.carregado() or not clientes:
+                messagebox.showerror("Sem conexão", "O banco está fora do ar e não há clientes/produtos "
+                                     "carregados nesta tela para vender sem conexão.")
+                return
+            preencher(clientes)
+
+        carregar_dados(self.top, executor, buscar, ao_concluir=preencher, ao_falhar=falhou)
+
+    def _mostrar_clientes(self, clientes):
+        self.cb_cliente["values"] = [f"{c['id_cliente']} - {c['nome']}" for c in clientes[:self.LIMITE_RESULTADOS]]
+
+    def filtrar_clientes(self, event):
+        """Deixa na lista só os clientes com o id ou o começo do nome digitado."""
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        texto = self.cb_cliente.get()
+        if self.offline:
+            procurado = catalogo.normalizar_nome(texto)
+            self._mostrar_clientes([c for c in self.contingencia()[0]
+                                    if str(c["id_cliente"]) == texto.strip()
+                                    or catalogo.normalizar_nome(c["nome"]).startswith(procurado)])
+            return
+
+        def mostrar(clientes):
+            if self.cb_cliente.get() == texto: # resposta de um texto que já mudou é descartada
+                self._mostrar_clientes(clientes)
+
+        carregar_dados(self.top, self.executor, repo.buscar_clientes_por_prefixo, texto, self.LIMITE_RESULTADOS,
+                       ao_concluir=mostrar, ao_falhar=lambda erro: None)
+
+    def _entrar_offline(self):
+        """Passa ao modo sem conexão (a venda vai para o diário local)."""
+        if not self.offline:
+            self.offline = True
+            self.top.title("Adicionar Venda (sem conexão)")
+
+    def filtrar_produtos(self, event=None):
+        """Atualiza a lista com os produtos mais relevantes para o texto digitado."""
+        if event is not None and event.keysym in ("Down", "Up", "Return", "Tab", "Escape"):
+            return
+        self.resultados = busca_produtos.buscar(self.e_busca.get(), self.LIMITE_RESULTADOS)
+        self.lb_produtos.delete(0, "end")
+        for p in self.resultados:
+            categoria = f" ({p['categoria']})" if p["categoria"] else ""
+            self.lb_produtos.insert("end", f"{p['id_produto']} - {p['nome']}{categoria}")
+        if self.resultados:
+            self.lb_produtos.selection_set(0)
+        self.lbl_estoque.config(text="")
+
+    def _ir_para_lista(self):
+        if self.resultados:
+            self.lb_produtos.focus_set()
+            self.lb_produtos.activate(self.lb_produtos.curselection()[0])
+
+    def _produto_escolhido(self):
+        sel = self.lb_produtos.curselection()
+        return self.resultados[sel[0]]["id_produto"] if sel else None
+
+    def mostrar_estoque(self, event=None):
+        """Mostra o estoque atual do produto selecionado."""
+        id_produto = self._produto_escolhido()
+        if id_produto is None or self.offline:
+            return
+
+        def mostrar(estoque):
+            info = estoque.get(id_produto)
+            if info and self._produto_escolhido() == id_produto:
+                texto = f"{info['disponivel']} disponíveis"
+                if info["reservado"]:
+                    texto += f"\n({info['quantidade']} em estoque, {info['reservado']} reservados)"
+                self.lbl_estoque.config(text=texto)
+
+        carregar_dados(self.top, self.executor, reservas.disponiveis, [id_produto], ao_concluir=mostrar,
+                       ao_falhar=lambda erro: None)
 
 
         # Função para adicionar item na tree
     def add_item(self):
         try:
             #Verifica se um produto foi selecionado
-            if self.cb_produto.get():
-                valor_cb = self.cb_produto.get()
-                id_produto = int(valor_cb.split(" - ")[0])
-            else:
+            id_produto = self._produto_escolhido()
+            if id_produto is None:
                 raise ValueError("Selecione um produto!")
             
             #Validação de quantidade
@@ -364,31 +580,51 @@ class VendaDialog:
             messagebox.showerror("Erro", f"Preencha corretamente os campos!\n{e}")
             return
 
-        # Busca direto pelo ID (mais seguro que pelo nome)
-        produto = repo.buscar_produto(id_produto)
-        nome_produto = produto["nome"]
-        estoque_disponivel = produto["quantidade"]
-
+        # Reserva o estoque já ao adicionar o item (e traz nome e preço do produto)
+        def reservar():
+            if self.offline:
+                return None
+            try:
+                return reservas.reservar(self.sessao, id_produto, qtd)
+            except reservas.EstoqueInsuficiente as e:
+                return e
+            except Exception as e:
+                if self.contingencia is not None and db.servidor_indisponivel(e):
+                    return None # sem conexão: o item entra sem reserva
+                raise
+
+        carregar_dados(self.top, self.executor, reservar,
+                       ao_concluir=lambda reserva: self.inserir_item(id_produto, qtd, reserva))
+
+    def inserir_item(self, id_produto, qtd, reserva):
         # Valida quantidade disponível
-        if qtd > estoque_disponivel:
-            messagebox.showerror(
-                "Estoque insuficiente",
-                f"O produto '{nome_produto}' possui apenas {estoque_disponivel} em estoque.\n"
-                f"Você tentou adicionar {qtd}."
-            )
+        if isinstance(reserva, reservas.EstoqueInsuficiente):
+            messagebox.showerror("Estoque insuficiente", str(reserva))
             return
+        if reserva is None:
+            # Sem conexão: nome e preço conhecidos pela busca; o banco confere ao receber a venda
+            self._entrar_offline()
+            reserva = busca_produtos.buscar_por_id(id_produto)
+            if reserva is None or reserva["preco"] is None:
+                messagebox.showerror("Sem conexão", "Preço do produto desconhecido sem conexão com o banco.")
+                return
+        nome_produto = reserva["nome"]
+        preco = Decimal(str(reserva["preco"]))
 
         # Se passou na validação, insere na tree
-        preco = repo.get_preco_produto(id_produto)
-        subtotal = qtd * preco
-        self.tree_itens.insert(
+        subtotal = repo.subtotal_item(preco, qtd)
+        iid = self.tree_itens.insert(
             "", "end",
             values=(id_produto, nome_produto, qtd, f"{preco:.2f}", f"{subtotal:.2f}")
         )
+        self.itens[iid] = (id_produto, qtd, preco)
+        self.atualizar_total()
 
         # Limpa os campos para uma nova inserção
         self.entry_qtd.delete(0, "end")
-        self.cb_produto.set("")
+        self.e_busca.delete(0, "end")
+        self.filtrar_produtos()
+        self.e_busca.focus_set()
 
 
     # Função para salvar venda
@@ -396,25 +632,246 @@ class VendaDialog:
         # Desabilita o botão imediatamente para evitar clique duplo
         self.btn_salvar.config(state="disabled")
 
-        if not self.cb_cliente.get():
-            messagebox.showerror("Erro", "Selecione um cliente.")
+        if not self.cb_cliente.get() or self.cb_cliente.get() not in self.cb_cliente["values"]:
+            messagebox.showerror("Erro", "Selecione um cliente da lista.")
             self.btn_salvar.config(state="normal")
             return
         
         id_cliente = int(self.cb_cliente.get().split(" - ")[0])
 
-        itens = []
-        for it in self.tree_itens.get_children():
-            vals = self.tree_itens.item(it)["values"]
-            id_produto, _, qtd, preco, subtotal = vals
-            itens.append((id_produto, int(qtd), float(preco)))
+        linhas = self.tree_itens.get_children()
+        itens = [self.itens[iid][:2] for iid in linhas]
 
         if not itens:
             messagebox.showerror("Erro", "Adicione ao menos um produto.")
             self.btn_salvar.config(state="normal")
             return
 
-        self.result = (id_cliente, itens)
+        if self.offline:
+            self._concluir(id_cliente, linhas)
+            return
+
+        def falhou(erro):
+            if self.contingencia is not None and db.servidor_indisponivel(erro):
+                # O banco caiu entre os itens e o salvar: a venda vai para o diário sem conferência
+                self._entrar_offline()
+                self._concluir(id_cliente, linhas)
+                return
+            messagebox.showerror("Erro", f"Erro ao acessar o banco!\n{erro}")
+            self.btn_salvar.config(state="normal")
+
+        # Conferência final: preços e estoque atuais, numa única consulta
+        carregar_dados(self.top, self.executor, repo.cotar_carrinho, itens, self.sessao,
+                       ao_concluir=lambda cotacao: self.conferir(id_cliente, linhas, cotacao), ao_falhar=falhou)
+
+    def conferir(self, id_cliente, linhas, cotacao):
+        """Grava a venda se o carrinho confere com o banco; senão mostra o que mudou."""
+        faltando = [it for it in cotacao["itens"] if not it["suficiente"]]
+        if faltando:
+            messagebox.showerror("Estoque insuficiente", "\n".join(
+                f"{it['nome'] or 'Produto ' + str(it['id_produto'])}: {max(it['disponivel'], 0)} disponíveis"
+                for it in faltando))
+            self.btn_salvar.config(state="normal")
+            return
+
+        alterados = []
+        for iid, it in zip(linhas, cotacao["itens"]):
+            id_produto, qtd, preco = self.itens[iid]
+            if it["preco_unitario"] != preco:
+                alterados.append(f"{it['nome']}: R$ {preco:.2f} -> R$ {it['preco_unitario']:.2f}")
+                self.itens[iid] = (id_produto, qtd, it["preco_unitario"])
+                self.tree_itens.item(iid, values=(id_produto, it["nome"], qtd, f"{it['preco_unitario']:.2f}",
+                                                  f"{it['subtotal']:.2f}"))
+        if alterados:
+            self.atualizar_total()
+            messagebox.showwarning("Preços alterados", "Os preços mudaram desde que os itens foram "
+                                   "adicionados:\n" + "\n".join(alterados) + "\n\nConfira o total e salve novamente.")
+            self.btn_salvar.config(state="normal")
+            return
+
+        self._concluir(id_cliente, linhas)
+
+    def _concluir(self, id_cliente, linhas):
+        # Itens (id_produto, quantidade, preço mostrado); o banco usa o preço dele
+        self.result = (id_cliente, [self.itens[iid] for iid in linhas])
+        self.top.destroy()
+
+    def atualizar_total(self):
+        total = sum((repo.subtotal_item(preco, qtd) for _, qtd, preco in self.itens.values()), Decimal("0"))
+        self.lbl_total.config(text=f"Total: R$ {total:.2f}")
+
+    def cancelar(self):
+        """Fecha sem salvar, devolvendo o estoque reservado."""
+        if self.tree_itens.get_children() and not self.offline:
+            if self.executor is None:
+                reservas.liberar(self.sessao)
+            else:
+                self.executor.executar(reservas.liberar, self.sessao)
+        self.top.destroy()
+#endregion
+
+# region Modal Entrada de Mercadorias
+class EntradaDialog:
+    """
+    Janela para receber uma entrega de fornecedor.
+
+    As linhas são digitadas (busca de produto como na venda) ou importadas
+    de um CSV (``importacao``); ao salvar, ``result`` é
+    ``(id_fornecedor, [(id_produto, quantidade, preco_compra), ...])``.
+    """
+
+    LIMITE_RESULTADOS = 15
+
+    def __init__(self, parent, executor=None):
+        self.executor = executor
+        self.top = tk.Toplevel(parent)
+        self.top.title("Entrada de Mercadorias")
+        self.result = None
+        self.top.transient(parent)
+        self.top.grab_set()
+
+        tk.Label(self.top, text="Fornecedor:").grid(row=0, column=0, padx=5, pady=5)
+        self.cb_fornecedor = ttk.Combobox(self.top, values=[], state="disabled")
+        self.cb_fornecedor.grid(row=0, column=1, padx=5, pady=5, columnspan=3, sticky="ew")
+
+        colunas = ("ID", "Produto", "Quantidade", "Preço de Compra", "Subtotal")
+        self.tree_itens = ttk.Treeview(self.top, columns=colunas, show="headings", height=10)
+        for col in colunas:
+            self.tree_itens.heading(col, text=col)
+            self.tree_itens.column(col, width=150)
+        self.tree_itens.grid(row=1, column=0, columnspan=4, padx=5, pady=5)
+        # Linhas da nota: iid da tree -> (id_produto, quantidade, preço de compra em Decimal ou None)
+        self.itens = {}
+
+        tk.Label(self.top, text="Produto:").grid(row=2, column=0, padx=5, pady=5)
+        self.e_busca = ttk.Entry(self.top, width=50, state="disabled")
+        self.e_busca.grid(row=2, column=1, padx=5, pady=5)
+        tk.Label(self.top, text="Quantidade:").grid(row=2, column=2, padx=5, pady=5)
+        self.entry_qtd = tk.Entry(self.top)
+        self.entry_qtd.grid(row=2, column=3, padx=5, pady=5)
+
+        self.resultados = []
+        self.lb_produtos = tk.Listbox(self.top, height=6, width=60, exportselection=False)
+        self.lb_produtos.grid(row=3, column=1, rowspan=2, padx=5, pady=5, sticky="ew")
+        tk.Label(self.top, text="Preço de compra:").grid(row=3, column=2, padx=5, pady=5)
+        self.entry_preco = tk.Entry(self.top)
+        self.entry_preco.grid(row=3, column=3, padx=5, pady=5)
+
+        self.e_busca.bind("<KeyRelease>", self.filtrar_produtos)
+        self.e_busca.bind("<Down>", lambda e: self.lb_produtos.focus_set() if self.resultados else None)
+        self.e_busca.bind("<Return>", lambda e: self.entry_qtd.focus_set())
+        self.lb_produtos.bind("<Return>", lambda e: self.entry_qtd.focus_set())
+        self.entry_qtd.bind("<Return>", lambda e: self.entry_preco.focus_set())
+        self.entry_preco.bind("<Return>", lambda e: self.add_item())
+
+        frame_botoes = ttk.Frame(self.top)
+        frame_botoes.grid(row=5, column=0, columnspan=4, pady=5)
+        ttk.Button(frame_botoes, text="Adicionar Item", command=self.add_item).pack(side="left", padx=5)
+        ttk.Button(frame_botoes, text="Remover Item", command=self.remover_item).pack(side="left", padx=5)
+        ttk.Button(frame_botoes, text="Importar CSV", command=self.importar_csv).pack(side="left", padx=5)
+        self.lbl_total = ttk.Label(self.top, text="")
+        self.lbl_total.grid(row=6, column=0, columnspan=4, padx=5, pady=5)
+
+        self.btn_salvar = ttk.Button(self.top, text="Registrar Entrada", command=self.salvar)
+        self.btn_salvar.grid(row=7, column=0, columnspan=4, pady=10)
+
+        def buscar():
+            busca_produtos.carregar()
+            return catalogo.listar_fornecedores()
+
+        def preencher(fornecedores):
+            self.cb_fornecedor.config(values=[f"{f['id_fornecedor']} - {f['nome']}" for f in fornecedores],
+                                      state="readonly")
+            self.e_busca.config(state="normal")
+            self.e_busca.focus_set()
+
+        carregar_dados(self.top, executor, buscar, ao_concluir=preencher)
+        self.atualizar_total()
+
+    def filtrar_produtos(self, event=None):
+        if event is not None and event.keysym in ("Down", "Up", "Return", "Tab", "Escape"):
+            return
+        self.resultados = busca_produtos.buscar(self.e_busca.get(), self.LIMITE_RESULTADOS)
+        self.lb_produtos.delete(0, "end")
+        for p in self.resultados:
+            self.lb_produtos.insert("end", f"{p['id_produto']} - {p['nome']}")
+        if self.resultados:
+            self.lb_produtos.selection_set(0)
+
+    def add_item(self):
+        try:
+            sel = self.lb_produtos.curselection()
+            if not sel:
+                raise ValueError("Selecione um produto!")
+            produto = self.resultados[sel[0]]
+            try:
+                qtd = int(self.entry_qtd.get())
+            except ValueError:
+                raise ValueError("Insira uma quantidade válida!")
+            if qtd <= 0:
+                raise ValueError("A quantidade deve ser maior que zero!")
+            texto = self.entry_preco.get().strip()
+            preco = importacao.ler_preco(texto) if texto else None
+        except ValueError as e:
+            messagebox.showerror("Erro", f"Preencha corretamente os campos!\n{e}")
+            return
+
+        self.inserir_linhas([(produto["id_produto"], qtd, preco)])
+        for entry in (self.entry_qtd, self.entry_preco, self.e_busca):
+            entry.delete(0, "end")
+        self.filtrar_produtos()
+        self.e_busca.focus_set()
+
+    def inserir_linhas(self, linhas):
+        """Inclui linhas (id_produto, quantidade, preco_compra) na nota."""
+        for id_produto, qtd, preco in linhas:
+            produto = busca_produtos.buscar_por_id(id_produto)
+            nome = produto["nome"] if produto else "(produto não cadastrado)"
+            iid = self.tree_itens.insert("", "end", values=(
+                id_produto, nome, qtd,
+                "" if preco is None else f"{preco:.2f}",
+                "" if preco is None else f"{repo.subtotal_item(preco, qtd):.2f}"))
+            self.itens[iid] = (id_produto, qtd, preco)
+        self.atualizar_total()
+
+    def remover_item(self):
+        for iid in self.tree_itens.selection():
+            self.tree_itens.delete(iid)
+            del self.itens[iid]
+        self.atualizar_total()
+
+    def importar_csv(self):
+        caminho = filedialog.askopenfilename(
+            parent=self.top, title="Importar entrada",
+            filetypes=[("CSV (id_produto;quantidade;preco_compra)", "*.csv"), ("Todos os arquivos", "*.*")])
+        if not caminho:
+            return
+        try:
+            linhas = importacao.ler_entrada_csv(caminho)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Erro", f"Não foi possível importar o arquivo.\n{e}", parent=self.top)
+            return
+        self.inserir_linhas(linhas)
+
+    def atualizar_total(self):
+        unidades = sum(qtd for _, qtd, _ in self.itens.values())
+        valor = sum((repo.subtotal_item(preco, qtd) for _, qtd, preco in self.itens.values() if preco is not None),
+                    Decimal("0"))
+        self.lbl_total.config(text=f"{len(self.itens)} linhas | {unidades} unidades | Total: R$ {valor:.2f}")
+
+    def salvar(self):
+        if not self.itens:
+            messagebox.showerror("Erro", "Adicione ao menos um produto.", parent=self.top)
+            return
+        desconhecidos = sorted({id_produto for id_produto, _, _ in self.itens.values()
+                                if busca_produtos.buscar_por_id(id_produto) is None})
+        if desconhecidos:
+            messagebox.showerror("Erro", "Produtos não cadastrados: " + ", ".join(map(str, desconhecidos[:20])),
+                                 parent=self.top)
+            return
+        fornecedor = self.cb_fornecedor.get()
+        id_fornecedor = int(fornecedor.split(" - ")[0]) if fornecedor else None
+        self.result = (id_fornecedor, [self.itens[iid] for iid in self.tree_itens.get_children()])
         self.top.destroy()
 #endregion
 
@@ -422,6 +879,9 @@ class VendaDialog:
 class PeriodoDataDialog:
     def __init__(self, parent):
         """Abre uma janela com calendário para escolher data inicial e final."""
+        # Importado só aqui: o tkcalendar (e o babel) pesam na abertura do sistema
+        from tkcalendar import DateEntry
+
         self.top = tk.Toplevel(parent)
         self.top.title("Selecionar Período")
 
@@ -445,4 +905,28 @@ class PeriodoDataDialog:
         self.result["data_fim"] = self.cal_fim.get_date().strftime("%Y-%m-%d")
         self.top.destroy()
         return self.result
-#endregion
\ No newline at end of file
+#endregion
+
+# region Modal Data
+class DataDialog:
+    def __init__(self, parent, titulo="Selecionar Data"):
+        """Abre uma janela com calendário para escolher uma data."""
+        from tkcalendar import DateEntry
+
+        self.top = tk.Toplevel(parent)
+        self.top.title(titulo)
+        self.top.transient(parent)
+        self.top.grab_set()
+
+        self.result = None
+
+        tk.Label(self.top, text="Data:").grid(row=0, column=0, padx=5, pady=5)
+        self.cal = DateEntry(self.top, date_pattern="dd-mm-yyyy", firstweekday="sunday", locale="pt_BR", state="readonly")
+        self.cal.grid(row=0, column=1, padx=5, pady=5)
+
+        ttk.Button(self.top, text="OK", command=self.confirmar).grid(row=1, column=0, columnspan=2, pady=10)
+
+    def confirmar(self):
+        self.result = self.cal.get_date().strftime("%Y-%m-%d")
+        self.top.destroy()
+#endregion
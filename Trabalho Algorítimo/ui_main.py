@@ -4,18 +4,513 @@ Módulo ui_main
 Interface principal (Tkinter + abas).
 """
 
+import bisect
+import queue
+import threading
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox, simpledialog, filedialog
 import repository as repo
-from ui_dialogs import ProdutoDialog, PessoaDialog, VendaDialog, PeriodoDataDialog
+import busca_produtos
+import cache_local
+import catalogo
+import db
+import diario_vendas
+import exportacao
+import relatorios
+import reservas
+from tarefas import ExecutorTk
+from ui_dialogs import ProdutoDialog, PessoaDialog, VendaDialog, EntradaDialog, PeriodoDataDialog, DataDialog
+
+
+# region Grade paginada
+class _Decrescente:
+    """Inverte a comparação de uma chave (para usar bisect em ordem decrescente)."""
+
+    __slots__ = ("valor",)
+
+    def __init__(self, valor):
+        self.valor = valor
+
+    def __lt__(self, outro):
+        return outro.valor < self.valor
+
+    def __eq__(self, outro):
+        return self.valor == outro.valor
+
+
+def _comparavel(ordem):
+    """
+    Chave de ordenação com os textos normalizados (sem acentos, minúsculas),
+    como o MySQL ordena os nomes (collation ``utf8mb4_unicode_ci``).
+    """
+    if isinstance(ordem, _Decrescente):
+        return _Decrescente(_comparavel(ordem.valor))
+    return tuple(catalogo.normalizar_nome(v) if isinstance(v, str) else v for v in ordem)
+
+
+class GradeVirtual:
+    """
+    Treeview que busca as linhas do banco por páginas, conforme a rolagem.
+
+    Abre apenas a primeira página; quando a barra de rolagem chega perto
+    do fim, a próxima página é buscada a partir da chave do último
+    registro (paginação keyset do ``repository``). Assim o tempo para
+    abrir uma aba não depende do tamanho da tabela.
+
+    Cada linha usa a chave primária como ``iid``. Ao recarregar, só as
+    diferenças são aplicadas na Treeview (seleção e rolagem são mantidas),
+    e ``atualizar_linha``/``remover_linha`` mexem numa única linha.
+
+    ``instantaneo``/``restaurar`` levam o conteúdo para o cache local
+    (``cache_local``), para a grade aparecer preenchida ao abrir o sistema.
+    """
+
+    # Fração da rolagem a partir da qual a próxima página é buscada
+    LIMIAR_ROLAGEM = 0.9
+
+    def __init__(self, parent, colunas, buscar_pagina, formatar, chave, id_linha,
+                 buscar_linha=None, desc=False, tamanho_pagina=repo.TAMANHO_PAGINA,
+                 executor=None, **tree_opts):
+        """
+        Parameters
+        ----------
+        parent : widget
+            Widget pai.
+        colunas : tuple[str]
+            Títulos das colunas.
+        buscar_pagina : callable
+            Função ``(apos, limite) -> list[dict]`` do repository.
+        formatar : callable
+            Converte um registro (dict) na tupla de valores da Treeview.
+        chave : callable
+            Extrai do registro a chave do keyset (ex: (nome, id)).
+        id_linha : callable
+            Extrai do registro a chave primária (usada como iid).
+        buscar_linha : callable, optional
+            Função ``(id) -> dict | None`` que relê um único registro.
+        desc : bool
+            Se a ordenação de ``buscar_pagina`` é decrescente.
+        executor : tarefas.ExecutorTk, optional
+            Se informado, as páginas são buscadas em segundo plano.
+        """
+        self.buscar_pagina = buscar_pagina
+        self.formatar = formatar
+        self.chave = chave
+        self.id_linha = id_linha
+        self.buscar_linha = buscar_linha
+        self.desc = desc
+        self.tamanho_pagina = tamanho_pagina
+        self.executor = executor
+        self.iniciada = False
+        # Muda a cada alteração do conteúdo (para saber se o cache local está em dia)
+        self.versao = 0
+        # Duração da última recarga completa e quem avisar quando ela termina
+        self.tempo_carga = None
+        self.ao_carregar = None
+        self._inicio_carga = None
+
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=colunas, show="headings", **tree_opts)
+        self.scroll = ttk.Scrollbar(self.frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_rolagem)
+
+        for col in colunas:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=150)
+
+        self.scroll.pack(side="right", fill="y")
+        self.tree.pack(side="left", fill="both", expand=True)
+
+        self._cursor = None
+        self._fim = False
+        self._carregando = False
+        # Espelho do conteúdo da Treeview, na mesma ordem
+        self._iids = []
+        self._ordem = []
+        self._valores = {}
+
+    def pack(self, **opts):
+        self.frame.pack(**opts)
+
+    def _ordenacao(self, row):
+        chave = self.chave(row)
+        return _Decrescente(chave) if self.desc else chave
+
+    def _on_rolagem(self, primeiro, ultimo):
+        self.scroll.set(primeiro, ultimo)
+        if float(ultimo) >= self.LIMIAR_ROLAGEM:
+            self.carregar_mais()
+
+    def _executar(self, func, *args, ao_concluir, **kwargs):
+        if self.executor is None:
+            try:
+                resultado = func(*args, **kwargs)
+            except Exception:
+                self._carregando = False
+                raise
+            ao_concluir(resultado)
+        else:
+            self.executor.executar(func, *args, chave=("grade", id(self)),
+                                   ao_concluir=ao_concluir, ao_falhar=self._falhou, **kwargs)
+
+    def recarregar(self):
+        """
+        Relê do banco o trecho já carregado (no mínimo uma página) e aplica
+        na Treeview apenas as inserções, alterações e remoções.
+        """
+        self.iniciada = True
+        self._inicio_carga = time.perf_counter()
+        limite = max(self.tamanho_pagina, len(self._iids))
+        self._carregando = True # a busca anterior (se houver) é substituída
+        self._executar(self.buscar_pagina, apos=None, limite=limite,
+                       ao_concluir=lambda rows: self._aplicar_diff(rows, limite))
+
+    def carregar_mais(self):
+        """Busca e insere a próxima página (se houver)."""
+        if self._fim or self._carregando or not self.iniciada:
+            return
+        self._carregando = True
+        self._executar(self.buscar_pagina, apos=self._cursor, limite=self.tamanho_pagina,
+                       ao_concluir=self._inserir_pagina)
+
+    def _inserir_pagina(self, rows):
+        self._carregando = False
+        for r in rows:
+            iid = str(self.id_linha(r))
+            if iid in self._valores: # já inserida por atualizar_linha
+                self._descartar(iid)
+            valores = self.formatar(r)
+            self.tree.insert("", "end", iid=iid, values=valores)
+            self._iids.append(iid)
+            self._ordem.append(self._ordenacao(r))
+            self._valores[iid] = valores
+        if rows:
+            self._cursor = self.chave(rows[-1])
+            self.versao += 1
+        self._fim = len(rows) < self.tamanho_pagina
+
+    def _aplicar_diff(self, rows, limite):
+        self._carregando = False
+        novos = [(str(self.id_linha(r)), r) for r in rows]
+        ids_novos = {iid for iid, _ in novos}
+
+        removidos = [iid for iid in self._iids if iid not in ids_novos]
+        if removidos:
+            self.tree.delete(*removidos)
+            for iid in removidos:
+                del self._valores[iid]
+
+        # Se as linhas que continuam mudaram de ordem, é preciso movê-las
+        mantidos = [iid for iid in self._iids if iid in ids_novos]
+        reordenar = mantidos != [iid for iid, _ in novos if iid in self._valores]
+
+        for pos, (iid, r) in enumerate(novos):
+            valores = self.formatar(r)
+            if iid in self._valores:
+                if self._valores[iid] != valores:
+                    self.tree.item(iid, values=valores)
+                if reordenar:
+                    self.tree.move(iid, "", pos)
+            else:
+                self.tree.insert("", pos, iid=iid, values=valores)
+            self._valores[iid] = valores
+
+        self._iids = [iid for iid, _ in novos]
+        self._ordem = [self._ordenacao(r) for _, r in novos]
+        self._cursor = self.chave(rows[-1]) if rows else None
+        self._fim = len(rows) < limite
+        self.versao += 1
+        if self._inicio_carga is not None:
+            self.tempo_carga = time.perf_counter() - self._inicio_carga
+            self._inicio_carga = None
+            if self.ao_carregar:
+                self.ao_carregar(self, len(rows))
+
+    def atualizar_linha(self, id_registro):
+        """Relê um único registro do banco e o insere/atualiza/remove na grade."""
+        if not self.iniciada or self.buscar_linha is None:
+            return
+        if self.executor is None:
+            self._aplicar_linha(id_registro, self.buscar_linha(id_registro))
+        else:
+            self.executor.executar(self.buscar_linha, id_registro,
+                                   ao_concluir=lambda row: self._aplicar_linha(id_registro, row))
+
+    def _aplicar_linha(self, id_registro, row):
+        if row is None:
+            self.remover_linha(id_registro)
+            return
+        iid = str(id_registro)
+        ordem = self._ordenacao(row)
+        valores = self.formatar(row)
+
+        if iid in self._valores:
+            pos = self._iids.index(iid)
+            if self._ordem[pos] == ordem: # mesma posição: só troca os valores
+                if self._valores[iid] != valores:
+                    self.tree.item(iid, values=valores)
+                    self._valores[iid] = valores
+                    self.versao += 1
+                return
+            self._descartar(iid)
+
+        # A posição é decidida pela ordem do banco: sem distinção de maiúsculas/acentos
+        # no MySQL, a do Python puro no SQLite. Se as duas divergem sobre a linha estar
+        # depois do trecho carregado (ou a chave não puder ser comparada), relê a grade:
+        # pular a linha a perderia, já que o cursor da paginação pode estar além dela.
+        try:
+            depois = bool(self._ordem) and _comparavel(self._ordem[-1]) < _comparavel(ordem)
+            if not self._fim and depois != (bool(self._ordem) and self._ordem[-1] < ordem):
+                raise TypeError("ordem ambígua")
+            pos = bisect.bisect(self._ordem, _comparavel(ordem), key=_comparavel)
+        except TypeError:
+            self.recarregar()
+            return
+
+        # Depois do trecho carregado: a linha virá com a próxima página
+        if not self._fim and depois:
+            return
+        self.tree.insert("", pos, iid=iid, values=valores)
+        self._iids.insert(pos, iid)
+        self._ordem.insert(pos, ordem)
+        self._valores[iid] = valores
+        self.versao += 1
+
+    def remover_linha(self, id_registro):
+        """Remove uma linha da grade (sem consultar o banco)."""
+        iid = str(id_registro)
+        if iid in self._valores:
+            self._descartar(iid)
+
+    def _descartar(self, iid):
+        pos = self._iids.index(iid)
+        del self._iids[pos]
+        del self._ordem[pos]
+        del self._valores[iid]
+        self.tree.delete(iid)
+        self.versao += 1
+
+    def linhas(self):
+        """Valores (como passados por ``formatar``) das linhas carregadas, na ordem da grade."""
+        return [self._valores[iid] for iid in self._iids]
+
+    def instantaneo(self, limite=None):
+        """
+        Conteúdo atual da grade, para gravar no cache local.
+
+        Returns
+        -------
+        dict
+            ``{"linhas": [[iid, valores, chave], ...], "fim": bool}`` com as
+            primeiras ``limite`` linhas.
+        """
+        qtd = len(self._iids) if limite is None else min(limite, len(self._iids))
+        linhas = []
+        for iid, ordem in zip(self._iids[:qtd], self._ordem[:qtd]):
+            chave = ordem.valor if self.desc else ordem
+            linhas.append([iid, list(self._valores[iid]), list(chave)])
+        return {"linhas": linhas, "fim": self._fim and qtd == len(self._iids)}
+
+    def restaurar(self, dados):
+        """
+        Preenche a grade com o conteúdo do cache local, sem consultar o
+        banco. A primeira ``recarregar`` corrige o que tiver mudado.
+        """
+        if self.iniciada or self._iids:
+            return
+        for iid, valores, chave in dados.get("linhas", ()):
+            valores, chave = tuple(valores), tuple(chave)
+            self.tree.insert("", "end", iid=iid, values=valores)
+            self._iids.append(iid)
+            self._ordem.append(_Decrescente(chave) if self.desc else chave)
+            self._valores[iid] = valores
+            self._cursor = chave
+        self._fim = dados.get("fim", False)
+
+    def _falhou(self, erro):
+        self._carregando = False
+        if self.executor.ao_falhar:
+            self.executor.ao_falhar(erro)
+#endregion
+
+
+# region Relatório incremental
+class RelatorioIncremental:
+    """
+    Preenche um ``Text`` aos poucos com as linhas de um relatório.
+
+    As linhas vêm de um gerador (``repository.iterar_*``) lido numa thread
+    do executor e formatadas em blocos de ``LINHAS_POR_BLOCO``; a thread do
+    Tk insere um bloco inteiro por vez, com ``after()``. A fila entre as
+    duas é limitada, então o relatório começa a aparecer logo e nunca fica
+    inteiro em memória.
+    """
+
+    LINHAS_POR_BLOCO = 200
+    # Blocos em espera na fila (a leitura do banco pausa quando enche)
+    BLOCOS_NA_FILA = 10
+    # Intervalo (ms) entre as inserções no Text
+    INTERVALO = 30
+
+    def __init__(self, texto, lbl_contador, btn_cancelar, executor):
+        self.texto = texto
+        self.lbl_contador = lbl_contador
+        self.btn_cancelar = btn_cancelar
+        self.executor = executor
+        self._cancelado = None
+        self._fila = None
+        self._linhas = 0
+
+    def iniciar(self, linhas, formatar, cabecalho="", rodape=None):
+        """
+        Começa um relatório (cancelando o que estiver em andamento).
+
+        Parameters
+        ----------
+        linhas : callable
+            Sem argumentos; retorna o iterador de registros (roda na thread de trabalho).
+        formatar : callable
+            Recebe um registro e retorna o texto dele.
+        cabecalho : str
+            Texto antes do primeiro registro (omitido se não houver nenhum).
+        rodape : callable, optional
+            Recebe a quantidade de registros e retorna o texto final
+            (roda na thread de trabalho; pode consultar o banco).
+        """
+        self.cancelar()
+        cancelado = self._cancelado = threading.Event()
+        fila = self._fila = queue.Queue(maxsize=self.BLOCOS_NA_FILA)
+        self._linhas = 0
+
+        self.texto.config(state="normal")
+        self.texto.delete("1.0", "end")
+        self.texto.config(state="disabled")
+        self.lbl_contador.config(text="0 linhas")
+        self.btn_cancelar.config(state="normal")
+
+        def enviar(item):
+            # Espera espaço na fila, desistindo se o relatório for cancelado
+            while not cancelado.is_set():
+                try:
+                    fila.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produzir():
+            iterador = linhas()
+            bloco, qtd = [], 0
+            try:
+                for row in iterador:
+                    if cancelado.is_set():
+                        return
+                    if qtd == 0 and cabecalho:
+                        bloco.append(cabecalho)
+                    bloco.append(formatar(row))
+                    qtd += 1
+                    if qtd % self.LINHAS_POR_BLOCO == 0:
+                        if not enviar(("".join(bloco), qtd)):
+                            return
+                        bloco = []
+            finally:
+                # Fecha o cursor (e devolve a conexão) mesmo se interrompido
+                if hasattr(iterador, "close"):
+                    iterador.close()
+            if rodape is not None:
+                bloco.append(rodape(qtd))
+            enviar(("".join(bloco), qtd))
+            enviar(None)
+
+        self.executor.executar(produzir, ao_falhar=lambda e: self._falhou(e, cancelado))
+        self.texto.after(self.INTERVALO, self._consumir, fila, cancelado)
+
+    def _consumir(self, fila, cancelado):
+        """Insere no Text os blocos prontos (thread do Tk)."""
+        if cancelado.is_set():
+            return
+        blocos = []
+        fim = False
+        # Alguns blocos por vez, para a janela continuar respondendo
+        for _ in range(5):
+            try:
+                item = fila.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                fim = True
+                break
+            texto, self._linhas = item
+            blocos.append(texto)
+
+        if blocos:
+            self.texto.config(state="normal")
+            self.texto.insert("end", "".join(blocos))
+            self.texto.config(state="disabled")
+            self.lbl_contador.config(text=f"{self._linhas} linhas")
+
+        if fim:
+            cancelado.set()
+            self.lbl_contador.config(text=f"{self._linhas} linhas (concluído)")
+            self.btn_cancelar.config(state="disabled")
+        else:
+            self.texto.after(self.INTERVALO, self._consumir, fila, cancelado)
+
+    def cancelar(self):
+        """Interrompe o relatório em andamento (o texto já exibido permanece)."""
+        if self._cancelado is not None and not self._cancelado.is_set():
+            self._cancelado.set()
+            self.lbl_contador.config(text=f"{self._linhas} linhas (cancelado)")
+        self.btn_cancelar.config(state="disabled")
+
+    def _falhou(self, erro, cancelado):
+        if cancelado is self._cancelado:
+            self.cancelar()
+            self.lbl_contador.config(text=f"{self._linhas} linhas (erro)")
+        if self.executor.ao_falhar:
+            self.executor.ao_falhar(erro)
+#endregion
 
 
 class App:
     """Classe principal da aplicação."""
 
-    def __init__(self, root):
+    # Intervalo (ms) entre as gravações do cache local, para sobreviver a uma queda
+    INTERVALO_CACHE = 60000
+    # Produtos alterados de uma vez acima dos quais a grade é recarregada inteira
+    MAX_LINHAS_ATUALIZADAS = 50
+    # Intervalo (ms) entre os reenvios das vendas guardadas no diário local
+    INTERVALO_DIARIO = 30000
+    # Clientes/produtos listados ao escolher um para os relatórios
+    LIMITE_ESCOLHA = 20
+
+    def __init__(self, root, perfil=None):
+        """
+        Parameters
+        ----------
+        root : tk.Tk
+            Janela principal.
+        perfil : object, optional
+            Medidor da inicialização (``app.py --profile-startup``): recebe
+            ``registrar(etapa, segundos, detalhe)`` e, quando todas as abas
+            carregaram, ``concluir()``.
+        """
         self.root = root
+        self.perfil = perfil
         self.root.title("Distribuidora - Sistema")
+
+        # Consultas ao banco rodam em segundo plano; a janela não congela
+        self.executor = ExecutorTk(root, ao_mudar_ocupado=self.on_ocupado, ao_falhar=self.mostrar_erro)
+        self.root.protocol("WM_DELETE_WINDOW", self.fechar)
+
+        # Barra de status com indicador de carregamento
+        frame_status = ttk.Frame(root)
+        frame_status.pack(side="bottom", fill="x")
+        self.progresso = ttk.Progressbar(frame_status, mode="indeterminate", length=120)
+        self.lbl_status = ttk.Label(frame_status, text="")
+        self.lbl_status.pack(side="left", padx=5)
+
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(fill="both", expand=True)
 
@@ -25,19 +520,140 @@ class App:
         self.frame_fornecedores = ttk.Frame(self.notebook)
         self.frame_vendas = ttk.Frame(self.notebook)
         self.frame_relatorios = ttk.Frame(self.notebook)
+        self.frame_diagnostico = ttk.Frame(self.notebook)
 
         self.notebook.add(self.frame_produtos, text="Produtos")
         self.notebook.add(self.frame_clientes, text="Clientes")
         self.notebook.add(self.frame_fornecedores, text="Fornecedores")
         self.notebook.add(self.frame_vendas, text="Vendas")
         self.notebook.add(self.frame_relatorios, text="Relatórios")
+        self.notebook.add(self.frame_diagnostico, text="Diagnóstico")
 
-        # Setup
+        # Setup (só monta os widgets; os dados são carregados ao abrir cada aba)
         self.setup_produtos()
         self.setup_clientes()
         self.setup_fornecedores()
         self.setup_vendas()
         self.setup_relatorios()
+        self.setup_diagnostico()
+
+        self.grades_por_aba = {
+            str(self.frame_produtos): self.grade_prod,
+            str(self.frame_clientes): self.grade_clientes,
+            str(self.frame_fornecedores): self.grade_fornecedores,
+            str(self.frame_vendas): self.grade_vend,
+        }
+        # Grades gravadas no cache local (nome no arquivo -> grade)
+        self.grades_cache = {
+            "produtos": self.grade_prod,
+            "clientes": self.grade_clientes,
+            "fornecedores": self.grade_fornecedores,
+            "vendas": self.grade_vend,
+        }
+        self._versoes_cache = None
+        self.restaurar_cache()
+
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_aba_selecionada)
+        if perfil is not None:
+            self.root.after_idle(self._perfilar_abas)
+        else:
+            self.root.after_idle(self.on_aba_selecionada)
+        self.root.after(self.INTERVALO_CACHE, self._salvar_cache_periodico)
+        self.root.after_idle(self._reenviar_diario)
+
+    def on_aba_selecionada(self, event=None):
+        """Carrega os dados de uma aba na primeira vez que ela é aberta."""
+        aba = self.notebook.select()
+        grade = self.grades_por_aba.get(aba)
+        if grade is not None and not grade.iniciada:
+            grade.recarregar()
+        elif aba == str(self.frame_diagnostico):
+            self.atualizar_diagnostico()
+
+    def on_ocupado(self, pendentes):
+        """Mostra/esconde o indicador de carregamento."""
+        if pendentes > 0:
+            self.lbl_status.config(text="Carregando...")
+            if not self.progresso.winfo_ismapped():
+                self.progresso.pack(side="right", padx=5)
+                self.progresso.start(10)
+        else:
+            self.lbl_status.config(text="")
+            self.progresso.stop()
+            self.progresso.pack_forget()
+
+    def mostrar_erro(self, erro):
+        messagebox.showerror("Erro", f"Erro ao acessar o banco!\n{erro}")
+
+    def fechar(self):
+        self.salvar_cache(em_segundo_plano=False)
+        self.executor.encerrar()
+        diario_vendas.fechar()
+        self.root.destroy()
+
+    # region Cache local
+    def restaurar_cache(self):
+        """Preenche as grades com o cache local (antes de qualquer consulta)."""
+        inicio = time.perf_counter()
+        dados = cache_local.carregar()
+        linhas = 0
+        for nome, grade in self.grades_cache.items():
+            if nome in dados:
+                grade.restaurar(dados[nome])
+                linhas += len(dados[nome].get("linhas", ()))
+        # O que veio do cache já está gravado
+        self._versoes_cache = tuple(g.versao for g in self.grades_cache.values())
+        if self.perfil is not None:
+            self.perfil.registrar("cache local (leitura)", time.perf_counter() - inicio, f"{linhas} linhas")
+
+    def salvar_cache(self, em_segundo_plano=True):
+        """Grava o conteúdo das grades no cache local, se mudou desde a última vez."""
+        versoes = tuple(g.versao for g in self.grades_cache.values())
+        if versoes == self._versoes_cache:
+            return
+        # A cópia é feita aqui (thread da interface); compactar e gravar fica para outra thread
+        dados = {}
+        for nome, grade in self.grades_cache.items():
+            conteudo = grade.instantaneo(cache_local.LINHAS_POR_GRADE)
+            if conteudo["linhas"]:
+                dados[nome] = conteudo
+        self._versoes_cache = versoes
+
+        def gravar():
+            try:
+                cache_local.salvar(dados)
+            except Exception:
+                pass # o cache é só um atalho; sem ele as abas carregam do banco
+
+        if em_segundo_plano:
+            threading.Thread(target=gravar, daemon=True).start()
+        else:
+            gravar()
+
+    def _salvar_cache_periodico(self):
+        self.salvar_cache()
+        self.root.after(self.INTERVALO_CACHE, self._salvar_cache_periodico)
+    #endregion
+
+    # region Perfil da inicialização
+    def _perfilar_abas(self):
+        """Carrega todas as grades de uma vez, medindo cada uma (``--profile-startup``)."""
+        self.perfil.registrar("janela pronta", None)
+        pendentes = set(self.grades_cache)
+        nomes = {id(grade): nome for nome, grade in self.grades_cache.items()}
+
+        def carregou(grade, qtd):
+            nome = nomes[id(grade)]
+            grade.ao_carregar = None
+            self.perfil.registrar(f"aba {nome}", grade.tempo_carga, f"{qtd} linhas")
+            pendentes.discard(nome)
+            if not pendentes:
+                self.perfil.concluir()
+
+        for grade in self.grades_cache.values():
+            grade.ao_carregar = carregou
+            grade.recarregar()
+    #endregion
 
     # region Produtos
     def setup_produtos(self):
@@ -50,41 +666,69 @@ class App:
         ttk.Button(frame_botoes, text="Adicionar", takefocus=False, command=self.add_produto).pack(side="left", padx=5)
         ttk.Button(frame_botoes, text="Editar", takefocus=False, command=self.edit_produto).pack(side="left", padx=5)
         ttk.Button(frame_botoes, text="Excluir", takefocus=False, command=self.del_produto).pack(side="left", padx=5)
-        ttk.Button(frame_botoes, text="Atualizar", takefocus=False, command=self.load_produtos).pack(side="left", padx=5)
+        ttk.Button(frame_botoes, text="Atualizar", takefocus=False, command=self.atualizar_produtos).pack(side="left", padx=5)
+        ttk.Button(frame_botoes, text="Entrada de Mercadorias", takefocus=False, command=self.add_entrada).pack(side="left", padx=5)
 
 
-        # Treeview
+        # Treeview (carregada por páginas)
         colunas = ("ID","Nome","Categoria","Preço","Quantidade","Fornecedor","Estoque Mínimo")
-        self.tree_prod = ttk.Treeview(self.frame_produtos, columns=colunas, show="headings")
+        self.grade_prod = GradeVirtual(
+            self.frame_produtos, colunas, repo.listar_produtos_pagina, self.linha_produto,
+            chave=lambda p: (p["nome"], p["id_produto"]), id_linha=lambda p: p["id_produto"],
+            buscar_linha=repo.buscar_linha_produto, executor=self.executor
+        )
+        self.tree_prod = self.grade_prod.tree
+
+        self.grade_prod.pack(fill="both", expand=True)
 
-        for col in colunas:
-            self.tree_prod.heading(col, text=col)
-            self.tree_prod.column(col, width=150)
 
-        self.tree_prod.pack(fill="both", expand=True)
+    def linha_produto(self, p):
+        return (p["id_produto"],p["nome"],p["categoria"],
+                p["preco"],p["quantidade"],p["fornecedor"],p["estoque_minimo"])
 
+    def load_produtos(self):
+        self.grade_prod.recarregar()
+
+    def atualizar_produtos(self):
+        # Pega também alterações feitas em outros terminais (o índice é relido em segundo plano)
+        busca_produtos.invalidar()
+        self.executor.executar(busca_produtos.carregar, chave="busca_produtos", ao_falhar=lambda e: None)
         self.load_produtos()
 
+    def add_entrada(self):
+        dlg = EntradaDialog(self.root, executor=self.executor)
+        self.root.wait_window(dlg.top)
+        if not dlg.result:
+            return
+        id_fornecedor, itens = dlg.result
 
-    def load_produtos(self):
-        for i in self.tree_prod.get_children(): self.tree_prod.delete(i)
-        for p in repo.listar_produtos():
-            self.tree_prod.insert("", "end", values=(p["id_produto"],p["nome"],p["categoria"],
-                                                     p["preco"],p["quantidade"],p["fornecedor"],p["estoque_minimo"]))
+        def concluido(entrada):
+            messagebox.showinfo("Sucesso", f"Entrada registrada: {entrada['linhas']} linhas, "
+                                           f"{entrada['quantidade']} unidades, R$ {entrada['valor']:.2f}.")
+            if len(entrada["produtos"]) > self.MAX_LINHAS_ATUALIZADAS:
+                self.load_produtos()
+            else:
+                for id_produto in entrada["produtos"]:
+                    self.grade_prod.atualizar_linha(id_produto)
+
+        self.executor.executar(repo.registrar_entrada, itens, id_fornecedor, ao_concluir=concluido,
+                               ao_falhar=lambda e: messagebox.showerror("Erro", f"Erro ao registrar entrada!\n{e}"))
 
     def add_produto(self):
-        dlg = ProdutoDialog(self.root)
+        dlg = ProdutoDialog(self.root, executor=self.executor)
         self.root.wait_window(dlg.top)
         if dlg.result:
             #Captura as informações vindas do modal de adição de produto
             nome, cat, preco, qtd, forn, est_min = dlg.result
 
-            # Insere novo produto
-            repo.inserir_produto(nome, cat, preco, qtd, forn, est_min)
-            messagebox.showinfo("Sucesso", f"Produto '{nome}' adicionado.")
+            def concluido(id_produto):
+                messagebox.showinfo("Sucesso", f"Produto '{nome}' adicionado.")
+                #Atualiza só a linha nova na tree de produtos
+                self.grade_prod.atualizar_linha(id_produto)
 
-            #Atualiza a tree de produtos
-            self.load_produtos()
+            # Insere novo produto
+            self.executor.executar(repo.inserir_produto, nome, cat, preco, qtd, forn, est_min,
+                                   ao_concluir=concluido)
 
     def del_produto(self):
         """Deleta produto selecionado da tabela e do banco"""
@@ -97,8 +741,7 @@ class App:
         id_prod = item["values"][0]
 
         if messagebox.askyesno("Confirmar", f"Tem certeza que deseja deletar o produto {id_prod}?"):
-            repo.deletar_produto(id_prod)
-            self.load_produtos()
+            self.executor.executar(repo.deletar_produto, id_prod, ao_concluir=lambda _: self.grade_prod.remover_linha(id_prod))
     
     def edit_produto(self):
         """Edita o produto selecionado."""
@@ -109,16 +752,22 @@ class App:
 
         item = self.tree_prod.item(sel[0])
         id_produto = item["values"][0]
-        produto = repo.buscar_produto(id_produto)
 
-        dlg = ProdutoDialog(self.root, produto)
-        self.root.wait_window(dlg.top)
+        def abrir_dialogo(produto):
+            dlg = ProdutoDialog(self.root, produto, executor=self.executor)
+            self.root.wait_window(dlg.top)
 
-        if dlg.result:
-            nome, cat, preco, qtd, forn, est_min = dlg.result
-            repo.atualizar_produto(id_produto, nome, cat, preco, qtd, forn, est_min)
-            messagebox.showinfo("Sucesso", f"Produto {id_produto} atualizado!")
-            self.load_produtos()
+            if dlg.result:
+                nome, cat, preco, qtd, forn, est_min = dlg.result
+
+                def concluido(_):
+                    messagebox.showinfo("Sucesso", f"Produto {id_produto} atualizado!")
+                    self.grade_prod.atualizar_linha(id_produto)
+
+                self.executor.executar(repo.atualizar_produto, id_produto, nome, cat, preco, qtd, forn, est_min,
+                                       ao_concluir=concluido)
+
+        self.executor.executar(repo.buscar_produto, id_produto, ao_concluir=abrir_dialogo)
     #endregion
 
 
@@ -133,40 +782,38 @@ class App:
         ttk.Button(frame_botoes, text="Excluir", takefocus=False, command=self.del_cliente).pack(side="left", padx=5)
         ttk.Button(frame_botoes, text="Atualizar", takefocus=False, command=self.load_clientes).pack(side="left", padx=5)
 
-        # Treeview de clientes
+        # Treeview de clientes (carregada por páginas)
         colunas = ("ID", "Nome", "Telefone", "Email", "Endereço")
-        self.tree_clientes = ttk.Treeview(self.frame_clientes, columns=colunas, show="headings")
-
-        for col in colunas:
-            self.tree_clientes.heading(col, text=col)
-            self.tree_clientes.column(col, width=150)
-
-        self.tree_clientes.pack(fill="both", expand=True)
+        self.grade_clientes = GradeVirtual(
+            self.frame_clientes, colunas, repo.listar_clientes_pagina, self.linha_cliente,
+            chave=lambda c: (c["nome"], c["id_cliente"]), id_linha=lambda c: c["id_cliente"],
+            buscar_linha=repo.buscar_linha_cliente, executor=self.executor
+        )
+        self.tree_clientes = self.grade_clientes.tree
 
-        self.load_clientes()
+        self.grade_clientes.pack(fill="both", expand=True)
         self.tree_clientes.focus_set()
 
 
-    def load_clientes(self):
-        for item in self.tree_clientes.get_children():
-            self.tree_clientes.delete(item)
+    def linha_cliente(self, c):
+        endereco_fmt = f"{c['rua']}, {c['numero']} - {c['bairro']}, {c['cidade']}/{c['estado']} - {c['cep']}"
+        return (c["id_cliente"], c["nome"], c["telefone"], c["email"], endereco_fmt)
 
-        for c in repo.listar_clientes():
-            endereco_fmt = f"{c['rua']}, {c['numero']} - {c['bairro']}, {c['cidade']}/{c['estado']} - {c['cep']}"
-            self.tree_clientes.insert(
-                "", "end",
-                values=(c["id_cliente"], c["nome"], c["telefone"], c["email"], endereco_fmt)
-            )
+    def load_clientes(self):
+        self.grade_clientes.recarregar()
 
     def add_cliente(self):
-        dlg = PessoaDialog(self.root, title="Novo Cliente")
+        dlg = PessoaDialog(self.root, title="Novo Cliente", executor=self.executor)
         self.root.wait_window(dlg.top)
 
         if dlg.result:
             nome, tel, email, id_endereco = dlg.result
-            repo.inserir_cliente(nome, tel, email, id_endereco)
-            messagebox.showinfo("Sucesso", "Cliente adicionado!")
-            self.load_clientes()
+
+            def concluido(id_cliente):
+                messagebox.showinfo("Sucesso", "Cliente adicionado!")
+                self.grade_clientes.atualizar_linha(id_cliente)
+
+            self.executor.executar(repo.inserir_cliente, nome, tel, email, id_endereco, ao_concluir=concluido)
 
 
     def edit_cliente(self):
@@ -178,15 +825,24 @@ class App:
         item = self.tree_clientes.item(sel[0])
         id_cliente = item["values"][0]
 
-        cliente = repo.buscar_cliente(id_cliente)
-        dlg = PessoaDialog(self.root, title="Editar Cliente", pessoa=cliente)
-        self.root.wait_window(dlg.top)
+        def abrir_dialogo(cliente):
+            dlg = PessoaDialog(self.root, title="Editar Cliente", pessoa=cliente, executor=self.executor)
+            self.root.wait_window(dlg.top)
 
-        if dlg.result:
-            nome, tel, email, id_endereco = dlg.result
-            repo.atualizar_cliente(id_cliente, nome, tel, email, id_endereco)
-            messagebox.showinfo("Sucesso", f"Cliente {id_cliente} atualizado!")
-            self.load_clientes()
+            if dlg.result:
+                nome, tel, email, id_endereco = dlg.result
+
+                def concluido(_):
+                    messagebox.showinfo("Sucesso", f"Cliente {id_cliente} atualizado!")
+                    self.grade_clientes.atualizar_linha(id_cliente)
+                    # O nome do cliente também aparece na grade de vendas
+                    if self.grade_vend.iniciada:
+                        self.load_vendas()
+
+                self.executor.executar(repo.atualizar_cliente, id_cliente, nome, tel, email, id_endereco,
+                                       ao_concluir=concluido)
+
+        self.executor.executar(repo.buscar_cliente, id_cliente, ao_concluir=abrir_dialogo)
 
 
     def del_cliente(self):
@@ -199,8 +855,7 @@ class App:
         id_cliente = item["values"][0]
 
         if messagebox.askyesno("Confirmar", f"Excluir cliente {id_cliente}?"):
-            repo.deletar_cliente(id_cliente)
-            self.load_clientes()
+            self.executor.executar(repo.deletar_cliente, id_cliente, ao_concluir=lambda _: self.grade_clientes.remover_linha(id_cliente))
     #endregion
 
     #region Fornecedores
@@ -212,30 +867,31 @@ class App:
         ttk.Button(frame_botoes, text="Adicionar", takefocus=False, command=self.add_fornecedor).pack(side="left", padx=5)
         ttk.Button(frame_botoes, text="Editar", takefocus=False, command=self.edit_fornecedor).pack(side="left", padx=5)
         ttk.Button(frame_botoes, text="Excluir", takefocus=False, command=self.del_fornecedor).pack(side="left", padx=5)
-        ttk.Button(frame_botoes, text="Atualizar", takefocus=False, command=self.load_fornecedores).pack(side="left", padx=5)
+        ttk.Button(frame_botoes, text="Atualizar", takefocus=False, command=self.atualizar_fornecedores).pack(side="left", padx=5)
 
-        # Treeview de fornecedores
+        # Treeview de fornecedores (carregada por páginas)
         colunas = ("ID", "Nome", "Telefone", "Email", "Endereço")
-        self.tree_fornecedores = ttk.Treeview(self.frame_fornecedores, columns=colunas, show="headings")
+        self.grade_fornecedores = GradeVirtual(
+            self.frame_fornecedores, colunas, repo.listar_fornecedores_pagina, self.linha_fornecedor,
+            chave=lambda f: (f["nome"], f["id_fornecedor"]), id_linha=lambda f: f["id_fornecedor"],
+            buscar_linha=repo.buscar_linha_fornecedor, executor=self.executor
+        )
+        self.tree_fornecedores = self.grade_fornecedores.tree
 
-        for col in colunas:
-            self.tree_fornecedores.heading(col, text=col)
-            self.tree_fornecedores.column(col, width=150)
+        self.grade_fornecedores.pack(fill="both", expand=True)
 
-        self.tree_fornecedores.pack(fill="both", expand=True)
-        self.load_fornecedores()
 
+    def linha_fornecedor(self, f):
+        endereco_fmt = f"{f['rua']}, {f['numero']} - {f['bairro']}, {f['cidade']}/{f['estado']} - {f['cep']}"
+        return (f["id_fornecedor"], f["nome"], f["telefone"], f["email"], endereco_fmt)
 
     def load_fornecedores(self):
-        for item in self.tree_fornecedores.get_children():
-            self.tree_fornecedores.delete(item)
+        self.grade_fornecedores.recarregar()
 
-        for f in repo.listar_fornecedores():
-            endereco_fmt = f"{f['rua']}, {f['numero']} - {f['bairro']}, {f['cidade']}/{f['estado']} - {f['cep']}"
-            self.tree_fornecedores.insert(
-                "", "end",
-                values=(f["id_fornecedor"], f["nome"], f["telefone"], f["email"], endereco_fmt)
-            )
+    def atualizar_fornecedores(self):
+        # Pega também alterações feitas em outros terminais
+        catalogo.invalidar_fornecedores()
+        self.load_fornecedores()
 
     
     def del_fornecedor(self):
@@ -248,19 +904,21 @@ class App:
         id_forn = item["values"][0]
 
         if messagebox.askyesno("Confirmar", f"Tem certeza que deseja deletar o fornecedor {id_forn}?"):
-            repo.deletar_fornecedor(id_forn)
-            self.load_fornecedores()
+            self.executor.executar(repo.deletar_fornecedor, id_forn, ao_concluir=lambda _: self.grade_fornecedores.remover_linha(id_forn))
 
 
     def add_fornecedor(self):
-        dlg = PessoaDialog(self.root, title="Novo Fornecedor")
+        dlg = PessoaDialog(self.root, title="Novo Fornecedor", executor=self.executor)
         self.root.wait_window(dlg.top)
 
         if dlg.result:
             nome, tel, email, id_endereco = dlg.result
-            repo.inserir_fornecedor(nome, tel, email, id_endereco)
-            messagebox.showinfo("Sucesso", "Fornecedor atualizado!")
-            self.load_fornecedores()
+
+            def concluido(id_fornecedor):
+                messagebox.showinfo("Sucesso", "Fornecedor atualizado!")
+                self.grade_fornecedores.atualizar_linha(id_fornecedor)
+
+            self.executor.executar(repo.inserir_fornecedor, nome, tel, email, id_endereco, ao_concluir=concluido)
 
 
     def edit_fornecedor(self):
@@ -272,15 +930,24 @@ class App:
         item = self.tree_fornecedores.item(sel[0])
         id_fornecedor = item["values"][0]
 
-        fornecedor = repo.buscar_fornecedor(id_fornecedor)
-        dlg = PessoaDialog(self.root, title="Editar Fornecedor", pessoa=fornecedor)
-        self.root.wait_window(dlg.top)
+        def abrir_dialogo(fornecedor):
+            dlg = PessoaDialog(self.root, title="Editar Fornecedor", pessoa=fornecedor, executor=self.executor)
+            self.root.wait_window(dlg.top)
 
-        if dlg.result:
-            nome, tel, email, id_endereco = dlg.result
-            repo.atualizar_fornecedor(id_fornecedor, nome, tel, email, id_endereco)
-            messagebox.showinfo("Sucesso", f"Fornecedor {id_fornecedor} atualizado!")
-            self.load_fornecedores()
+            if dlg.result:
+                nome, tel, email, id_endereco = dlg.result
+
+                def concluido(_):
+                    messagebox.showinfo("Sucesso", f"Fornecedor {id_fornecedor} atualizado!")
+                    self.grade_fornecedores.atualizar_linha(id_fornecedor)
+                    # O nome do fornecedor também aparece na grade de produtos
+                    if self.grade_prod.iniciada:
+                        self.load_produtos()
+
+                self.executor.executar(repo.atualizar_fornecedor, id_fornecedor, nome, tel, email, id_endereco,
+                                       ao_concluir=concluido)
+
+        self.executor.executar(repo.buscar_fornecedor, id_fornecedor, ao_concluir=abrir_dialogo)
     #endregion
 
 
@@ -293,18 +960,22 @@ class App:
         ttk.Button(frame_botoes, text="Adicionar", takefocus=False, command=self.add_venda).pack(side="left", padx=5)
         ttk.Button(frame_botoes, text="Atualizar", takefocus=False, command=self.load_vendas).pack(side="left", padx=5)
         ttk.Button(frame_botoes, text="Excluir", takefocus=False, command=self.del_venda).pack(side="left", padx=5)
+        ttk.Button(frame_botoes, text="Enviar pendentes", takefocus=False,
+                   command=lambda: self._reenviar_diario(agendar=False)).pack(side="left", padx=5)
+        # Vendas guardadas no diário local, ainda não gravadas no banco
+        self.lbl_pendentes = ttk.Label(frame_botoes, text="")
+        self.lbl_pendentes.pack(side="left", padx=5)
 
-
-        # Treeview principal (vendas)
+        # Treeview principal (vendas, carregada por páginas)
         colunas = ("ID Venda", "ID Cliente", "Cliente", "Valor Total", "Data")
-        self.tree_vend = ttk.Treeview(self.frame_vendas, columns=colunas, show="headings", height=8)
-
-        for col in colunas:
-            self.tree_vend.heading(col, text=col)
-            self.tree_vend.column(col, width=150)
+        self.grade_vend = GradeVirtual(
+            self.frame_vendas, colunas, repo.listar_vendas_pagina, self.linha_venda,
+            chave=lambda v: (v["data_venda"], v["id_venda"]), id_linha=lambda v: v["id_venda"],
+            buscar_linha=repo.buscar_linha_venda, desc=True, executor=self.executor, height=8
+        )
+        self.tree_vend = self.grade_vend.tree
 
-        self.tree_vend.pack(fill="both", expand=True, pady=5)
-        self.load_vendas()
+        self.grade_vend.pack(fill="both", expand=True, pady=5)
 
         # Quando selecionar uma venda, carrega os itens
         self.tree_vend.bind("<<TreeviewSelect>>", self.on_venda_select)
@@ -334,51 +1005,108 @@ class App:
             return
 
         venda_id = self.tree_vend.item(selected[0])["values"][0]
-        itens = repo.listar_itens_venda(venda_id)
-
-        for it in itens:
-            self.tree_itens.insert("","end",values=(
-                    it["id_produto"],
-                    it["produto"],
-                    it["quantidade"],
-                    f"{it['preco_unitario']:.2f}",
-                    f"{it['subtotal']:.2f}"
+
+        def mostrar_itens(itens):
+            for it in itens:
+                self.tree_itens.insert("","end",values=(
+                        it["id_produto"],
+                        it["produto"],
+                        it["quantidade"],
+                        f"{it['preco_unitario']:.2f}",
+                        f"{it['subtotal']:.2f}"
+                    )
                 )
-            )
+
+        # Trocar de venda rapidamente cancela a busca anterior
+        self.executor.executar(repo.listar_itens_venda, venda_id, chave="itens_venda", ao_concluir=mostrar_itens)
 
     def add_venda(self):
-        dlg = VendaDialog(self.root)
+        dlg = VendaDialog(self.root, executor=self.executor, contingencia=self._dados_contingencia)
         self.root.wait_window(dlg.top)
 
         if dlg.result:
             id_cliente, itens = dlg.result
-            
-            try:
-                repo.inserir_venda(id_cliente, itens)
-            except Exception as e:
+            # Gravada primeiro no diário local: a venda não se perde se o banco não responder
+            chave = diario_vendas.registrar(id_cliente, itens, dlg.sessao, enviar_depois=not dlg.offline)
+            if dlg.offline:
+                self._venda_guardada()
+                return
+
+            def concluido(id_venda):
+                if id_venda == diario_vendas.EM_ENVIO:
+                    messagebox.showinfo("Venda em envio", "A venda já está sendo enviada ao banco e "
+                                        "aparece na lista quando o envio terminar.")
+                    return
+                if id_venda is None:
+                    self._venda_guardada()
+                    return
+                messagebox.showinfo("Sucesso", "Venda registrada!")
+                self.grade_vend.atualizar_linha(id_venda)
+                #Atualiza automaticamente o estoque dos produtos vendidos na tree de produtos
+                for id_produto in {it[0] for it in itens}:
+                    self.grade_prod.atualizar_linha(id_produto)
+
+            def falhou(e):
+                # O banco recusou a venda: sai do diário e devolve o estoque reservado pelo carrinho
+                diario_vendas.descartar(chave)
+                self.executor.executar(reservas.liberar, dlg.sessao)
                 messagebox.showerror("Erro", f"Erro ao inserir venda!\n{e}")
-            
-            messagebox.showinfo("Sucesso", "Venda registrada!")
-            self.load_vendas()
-            self.load_produtos() #Atualiza automaticamente a tree de produtos com o novo estoque
-            
+
+            self.executor.executar(diario_vendas.enviar, chave, ao_concluir=concluido, ao_falhar=falhou)
+
+    def _dados_contingencia(self):
+        """Clientes e produtos das grades, para vender sem conexão com o banco."""
+        clientes = [{"id_cliente": v[0], "nome": v[1]} for v in self.grade_clientes.linhas()]
+        produtos = [{"id_produto": v[0], "nome": v[1], "categoria": v[2], "preco": v[3]}
+                    for v in self.grade_prod.linhas()]
+        return clientes, produtos
+
+    def _venda_guardada(self):
+        self._mostrar_pendentes(diario_vendas.contar()[diario_vendas.PENDENTE])
+        messagebox.showinfo("Venda guardada", "Sem conexão com o banco: a venda foi guardada neste caixa "
+                            "e será enviada automaticamente quando o banco voltar.")
+
+    def _mostrar_pendentes(self, qtd):
+        self.lbl_pendentes.config(text=f"{qtd} vendas aguardando envio" if qtd else "")
+
+    def _reenviar_diario(self, agendar=True):
+        """Envia ao banco as vendas guardadas no diário local (em segundo plano)."""
+        if agendar:
+            self.root.after(self.INTERVALO_DIARIO, self._reenviar_diario)
+        qtd = diario_vendas.contar()
+        self._mostrar_pendentes(qtd[diario_vendas.PENDENTE])
+        if not qtd[diario_vendas.PENDENTE]:
+            return
+
+        def concluido(resultado):
+            self._mostrar_pendentes(resultado["pendentes"])
+            if resultado["enviadas"]:
+                for grade in (self.grade_vend, self.grade_prod):
+                    if grade.iniciada:
+                        grade.recarregar()
+            if resultado["conflitos"]:
+                messagebox.showwarning("Vendas não gravadas", "O banco recusou vendas feitas sem conexão:\n"
+                                       + "\n".join(f"{v['criada_em']} (cliente {v['id_cliente']}): {v['erro']}"
+                                                    for v in resultado["conflitos"])
+                                       + "\n\nVeja o relatório 'Vendas não Enviadas'.")
+            elif resultado["pendentes"] and not agendar:
+                messagebox.showwarning("Sem conexão", "O banco continua fora do ar; as vendas serão "
+                                       "enviadas automaticamente quando ele voltar.")
+
+        self.executor.executar(diario_vendas.reenviar, chave="diario", ao_concluir=concluido,
+                               ao_falhar=lambda e: None)
+
+    def linha_venda(self, v):
+        return (
+            v["id_venda"],
+            v["id_cliente"],
+            v["cliente"],
+            f"{v['valor_total']:.2f}",
+            v["data_venda"].strftime("%d/%m/%Y %H:%M") if v["data_venda"] else ""
+        )
+
     def load_vendas(self):
-        for i in self.tree_vend.get_children():
-            self.tree_vend.delete(i)
-
-        rows = repo.listar_vendas()
-        for v in rows:
-            self.tree_vend.insert(
-                "",
-                "end",
-                values=(
-                    v["id_venda"],
-                    v["id_cliente"],
-                    v["cliente"],
-                    f"{v['valor_total']:.2f}",
-                    v["data_venda"].strftime("%d/%m/%Y %H:%M") if v["data_venda"] else ""
-                )
-            )
+        self.grade_vend.recarregar()
 
     def del_venda(self):
         """Deleta venda selecionada da tabela e do banco"""
@@ -391,8 +1119,7 @@ class App:
         id_venda = item["values"][0]
 
         if messagebox.askyesno("Confirmar", f"Tem certeza que deseja deletar a venda {id_venda}?"):
-            repo.deletar_venda(id_venda)
-            self.load_vendas()
+            self.executor.executar(repo.deletar_venda, id_venda, ao_concluir=lambda _: self.grade_vend.remover_linha(id_venda))
     #endregion
 
     # region Relatórios
@@ -404,86 +1131,93 @@ class App:
 
         largura_padrao = 25  #Largura fixa dos botões
 
-        ttk.Button(frame_botoes, text="Estoque baixo", width=largura_padrao,
-                takefocus=False, command=self.report_estoque_baixo).pack(pady=5)
-        ttk.Button(frame_botoes, text="Histórico por Cliente", width=largura_padrao,
-                takefocus=False, command=self.report_vendas_cliente).pack(pady=5)
-        ttk.Button(frame_botoes, text="Histórico por Produto", width=largura_padrao,
-                takefocus=False, command=self.report_vendas_produto).pack(pady=5)
-        ttk.Button(frame_botoes, text="Histórico por Período", width=largura_padrao,
-                takefocus=False, command=self.report_vendas_periodo).pack(pady=5)
+        botoes = [
+            ("Estoque baixo", self.report_estoque_baixo),
+            ("Histórico por Cliente", self.report_vendas_cliente),
+            ("Histórico por Produto", self.report_vendas_produto),
+            ("Histórico por Período", self.report_vendas_periodo),
+            ("Curva ABC de Produtos", self.report_curva_abc),
+            ("Melhores Clientes", self.report_top_clientes),
+            ("Sugestão de Compra", self.report_reposicao),
+            ("Estoque em Data", self.report_estoque_em),
+            ("Divergências de Estoque", self.report_divergencias),
+            ("Vendas não Enviadas", self.report_vendas_offline),
+        ]
+        # Em colunas, para sobrar altura para o texto do relatório
+        colunas = 3
+        for i, (texto, comando) in enumerate(botoes):
+            ttk.Button(frame_botoes, text=texto, width=largura_padrao,
+                    takefocus=False, command=comando).grid(row=i // colunas, column=i % colunas, padx=5, pady=5)
+        self.btn_exportar = ttk.Button(frame_botoes, text="Exportar (CSV/XLSX)", width=largura_padrao,
+                takefocus=False, state="disabled", command=self.exportar_relatorio)
+        self.btn_exportar.grid(row=(len(botoes) + colunas - 1) // colunas, column=0, columnspan=colunas, pady=5)
+
+        # Relatório exibido (relatorios.Relatorio), para exportação
+        self._exportavel = None
+        self._exportacao_cancelada = None
+
+        # Progresso dos relatórios longos (preenchidos aos poucos)
+        frame_progresso = ttk.Frame(self.frame_relatorios)
+        frame_progresso.pack(fill="x", padx=5)
+        self.lbl_rel_contador = ttk.Label(frame_progresso, text="")
+        self.lbl_rel_contador.pack(side="left")
+        self.btn_rel_cancelar = ttk.Button(frame_progresso, text="Cancelar", takefocus=False, state="disabled")
+        self.btn_rel_cancelar.pack(side="right")
 
         # Área de texto somente leitura
         self.txt_rel = tk.Text(self.frame_relatorios, height=20, state="disabled")
         self.txt_rel.pack(fill="both", expand=True)
 
+        self.relatorio = RelatorioIncremental(self.txt_rel, self.lbl_rel_contador,
+                                              self.btn_rel_cancelar, self.executor)
+        self.btn_rel_cancelar.config(command=self.cancelar_relatorio)
+
+
+    def _mostrar_relatorio(self, relatorio):
+        """Exibe um relatório de ``relatorios`` aos poucos e o deixa disponível para exportar."""
+        self._exportavel = relatorio
+        self.btn_exportar.config(state="normal")
+        self.relatorio.iniciar(relatorio.linhas, relatorio.formatar,
+                               cabecalho=relatorio.cabecalho, rodape=relatorio.rodape)
 
     def report_estoque_baixo(self):
-        self.txt_rel.config(state="normal")   # habilita para edição
-        #Exclui todo o texto, começando da primeira linha (inicia em 1) e primeira coluna (inicia em 0) -> "1.0"
-        self.txt_rel.delete("1.0", "end")
-        rows = [p for p in repo.listar_produtos() if p["quantidade"] <= p["estoque_minimo"]]
-        if not rows:
-            self.txt_rel.insert("end", "Nenhum produto com estoque baixo\n")
-        else:
-            for r in rows:
-                self.txt_rel.insert("end", f"{r['id_produto']} - {r['nome']} | Qtd {r['quantidade']} | Min {r['estoque_minimo']}\n")
-        self.txt_rel.config(state="disabled")  # trava novamente
+        self._mostrar_relatorio(relatorios.estoque_baixo())
 
 
-    def report_vendas_cliente(self):
-        clientes = repo.listar_clientes()
-        if not clientes:
-            messagebox.showwarning("Aviso", "Nenhum cliente cadastrado.")
-            return
-        escolha = simpledialog.askinteger(
-            "Histórico por Cliente",
-            "Digite o ID do cliente:\n" + "\n".join(f"{c['id_cliente']} - {c['nome']}" for c in clientes)
-        )
-        if not escolha:
+    def _escolher(self, titulo, rotulo, buscar, campo_id, ao_escolher):
+        """
+        Pede o id ou o começo do nome, busca só os que combinam (em segundo
+        plano, no máximo ``LIMITE_ESCOLHA``) e, se houver mais de um, pede o
+        id entre eles.
+        """
+        texto = simpledialog.askstring(titulo, f"Digite o ID ou o começo do nome do {rotulo}:")
+        if not texto or not texto.strip():
             return
 
-        rows = repo.historico_vendas_por_cliente(escolha)
-        self.txt_rel.config(state="normal")
-        self.txt_rel.delete("1.0", "end")
-        if not rows:
-            self.txt_rel.insert("end", "Nenhuma venda encontrada.\n")
-        else:
-            self.txt_rel.insert("end", f"Histórico de vendas do Cliente {escolha}:\n\n")
-            for r in rows:
-                self.txt_rel.insert("end",
-                    f"Venda {r['id_venda']} | Data: {r['data_venda']} | Total: R$ {r['valor_total']:.2f}\n"
-                    f"   Produto: {r['produto']} x{r['quantidade']} @ {r['preco_unitario']:.2f} = {r['subtotal']:.2f}\n\n"
-                )
-            total_historico = repo.total_consumido_por_cliente(escolha)["SUM(valor_total)"]
-            self.txt_rel.insert("end", f"Total consumido: {total_historico:.2f}\n")
-        self.txt_rel.config(state="disabled")
+        def escolher(encontrados):
+            if not encontrados:
+                messagebox.showwarning("Aviso", f"Nenhum {rotulo} encontrado para \"{texto.strip()}\".")
+                return
+            if len(encontrados) == 1:
+                ao_escolher(encontrados[0][campo_id])
+                return
+            lista = "\n".join(f"{r[campo_id]} - {r['nome']}" for r in encontrados)
+            if len(encontrados) == self.LIMITE_ESCOLHA:
+                lista += "\n... (digite mais do nome para ver outros)"
+            escolha = simpledialog.askinteger(titulo, f"Digite o ID do {rotulo}:\n" + lista)
+            if escolha:
+                ao_escolher(escolha)
+
+        self.executor.executar(buscar, texto.strip(), self.LIMITE_ESCOLHA, chave="relatorio", ao_concluir=escolher)
 
-    def report_vendas_produto(self):
-        produtos = repo.listar_produtos()
-        if not produtos:
-            messagebox.showwarning("Aviso", "Nenhum produto cadastrado.")
-            return
-        escolha = simpledialog.askinteger(
-            "Histórico por Produto",
-            "Digite o ID do produto:\n" + "\n".join(f"{p['id_produto']} - {p['nome']}" for p in produtos)
-        )
-        if not escolha:
-            return
+    def report_vendas_cliente(self):
+        self._escolher("Histórico por Cliente", "cliente", repo.buscar_clientes_por_prefixo, "id_cliente",
+                       lambda id_cliente: self._mostrar_relatorio(relatorios.historico_cliente(id_cliente)))
 
-        rows = repo.historico_vendas_por_produto(escolha)
-        self.txt_rel.config(state="normal")
-        self.txt_rel.delete("1.0", "end")
-        if not rows:
-            self.txt_rel.insert("end", "Nenhuma venda encontrada.\n")
-        else:
-            self.txt_rel.insert("end", f"Histórico de vendas do Produto {escolha}:\n\n")
-            for r in rows:
-                self.txt_rel.insert("end",
-                    f"Venda {r['id_venda']} | Data: {r['data_venda']} | Cliente: {r['cliente']} | Total: R$ {r['valor_total']:.2f}\n"
-                    f"   Quantidade: {r['quantidade']} @ {r['preco_unitario']:.2f} = {r['subtotal']:.2f}\n\n"
-                )
-        self.txt_rel.config(state="disabled")
+    def report_vendas_produto(self):
+        # Busca no índice de produtos (lido em segundo plano, se ainda não foi)
+        self._escolher("Histórico por Produto", "produto", busca_produtos.buscar, "id_produto",
+                       lambda id_produto: self._mostrar_relatorio(relatorios.historico_produto(id_produto)))
 
     def report_vendas_periodo(self):
         dlg = PeriodoDataDialog(self.root)
@@ -495,25 +1229,166 @@ class App:
         else:
             return
 
-        rows = repo.historico_vendas_por_periodo(data_inicio, data_fim)
-        self.txt_rel.config(state="normal")
-        self.txt_rel.delete("1.0", "end")
+        self._mostrar_relatorio(relatorios.vendas_periodo(data_inicio, data_fim))
 
-        if not rows:
-            self.txt_rel.insert("end", "Nenhuma venda encontrada nesse período.\n")
-        else:
-            total = 0
-            for r in rows:
-                self.txt_rel.insert(
-                    "end",
-                    f"Venda {r['id_venda']} | Cliente: {r['cliente']} | "
-                    f"Total: R$ {r['valor_total']:.2f} | Data: {r['data_venda']}\n"
-                )
-                total += r["valor_total"]
-            self.txt_rel.insert("end", f"Total faturado no período: R$ {total:.2f}\n")
-            
-        self.txt_rel.config(state="disabled")
+    def _pedir_periodo(self):
+        """Abre o seletor de período; retorna (data_inicio, data_fim) ou None."""
+        dlg = PeriodoDataDialog(self.root)
+        self.root.wait_window(dlg.top)
+        if not dlg.result:
+            return None
+        return dlg.result["data_inicio"], dlg.result["data_fim"]
+
+    def report_curva_abc(self):
+        periodo = self._pedir_periodo()
+        if periodo:
+            self._mostrar_relatorio(relatorios.curva_abc(*periodo))
+
+    def report_reposicao(self):
+        self._mostrar_relatorio(relatorios.reposicao())
+
+    def report_estoque_em(self):
+        dlg = DataDialog(self.root, "Estoque em Data")
+        self.root.wait_window(dlg.top)
+        if dlg.result:
+            self._mostrar_relatorio(relatorios.estoque_em(dlg.result))
+
+    def report_divergencias(self):
+        self._mostrar_relatorio(relatorios.divergencias_estoque())
+
+    def report_vendas_offline(self):
+        self._mostrar_relatorio(relatorios.vendas_offline())
+
+    def report_top_clientes(self):
+        periodo = self._pedir_periodo()
+        if not periodo:
+            return
+        n = simpledialog.askinteger("Melhores Clientes", "Quantos clientes listar?",
+                                    initialvalue=10, minvalue=1, parent=self.root)
+        if n:
+            self._mostrar_relatorio(relatorios.top_clientes(*periodo, n))
+
+    def cancelar_relatorio(self):
+        """Botão Cancelar: interrompe a exibição ou a exportação em andamento."""
+        self.relatorio.cancelar()
+        if self._exportacao_cancelada is not None:
+            self._exportacao_cancelada.set()
+
+    def exportar_relatorio(self):
+        """Exporta o último relatório gerado, lendo de novo do banco direto para o arquivo."""
+        if self._exportavel is None or self._exportacao_cancelada is not None:
+            return
+        rel = self._exportavel
+        caminho = filedialog.asksaveasfilename(
+            parent=self.root, title="Exportar relatório", defaultextension=".csv",
+            initialfile=rel.titulo.replace("/", "-"),
+            filetypes=[("CSV (Excel)", "*.csv"), ("Planilha Excel", "*.xlsx")])
+        if not caminho:
+            return
+
+        self.relatorio.cancelar()
+        cancelada = self._exportacao_cancelada = threading.Event()
+        progresso = {"linhas": 0}
+        self.btn_exportar.config(state="disabled")
+        self.btn_rel_cancelar.config(state="normal")
+
+        def acompanhar():
+            if self._exportacao_cancelada is cancelada:
+                self.lbl_rel_contador.config(text=f"Exportando... {progresso['linhas']} linhas")
+                self.root.after(200, acompanhar)
+
+        def terminar(texto):
+            self._exportacao_cancelada = None
+            self.btn_exportar.config(state="normal")
+            self.btn_rel_cancelar.config(state="disabled")
+            self.lbl_rel_contador.config(text=texto)
+
+        def concluido(total):
+            terminar(f"{total} linhas exportadas para {caminho}")
+
+        def falhou(erro):
+            if isinstance(erro, exportacao.ExportacaoCancelada):
+                terminar("Exportação cancelada")
+            else:
+                terminar("Falha na exportação")
+                messagebox.showerror("Erro", f"Não foi possível exportar o relatório!\n{erro}")
+
+        self.executor.executar(
+            lambda: exportacao.exportar(rel.linhas(), rel.colunas, caminho, cancelado=cancelada, titulo=rel.titulo,
+                                        progresso=lambda n: progresso.__setitem__("linhas", n)),
+            ao_concluir=concluido, ao_falhar=falhou)
+        acompanhar()
 
     #endregion
 
+    # region Diagnóstico
+    def setup_diagnostico(self):
+        """Monta a aba Diagnóstico (consultas mais custosas desde a abertura)."""
 
+        frame_botoes = ttk.Frame(self.frame_diagnostico)
+        frame_botoes.pack(fill="x", pady=5)
+        ttk.Button(frame_botoes, text="Atualizar", takefocus=False,
+                   command=self.atualizar_diagnostico).pack(side="left", padx=5)
+        ttk.Button(frame_botoes, text="Zerar", takefocus=False,
+                   command=self.zerar_diagnostico).pack(side="left", padx=5)
+        self.lbl_conexoes = ttk.Label(frame_botoes, text="")
+        self.lbl_conexoes.pack(side="left", padx=10)
+
+        colunas = ("Consulta", "Chamadas", "Total (ms)", "Média (ms)", "p95 (ms)", "Máx (ms)", "Linhas", "Origem")
+        self.tree_diag = ttk.Treeview(self.frame_diagnostico, columns=colunas, show="headings", height=12)
+        for col in colunas:
+            self.tree_diag.heading(col, text=col)
+            self.tree_diag.column(col, width=80, anchor="e")
+        self.tree_diag.column("Consulta", width=300, anchor="w")
+        self.tree_diag.column("Origem", width=220, anchor="w")
+        self.tree_diag.pack(fill="both", expand=True)
+        self.tree_diag.bind("<<TreeviewSelect>>", self.on_diagnostico_select)
+
+        # Detalhe da consulta selecionada: SQL completo, locais e histograma
+        self.txt_diag = tk.Text(self.frame_diagnostico, height=10, state="disabled")
+        self.txt_diag.pack(fill="both", expand=False)
+        self._diag_linhas = {}
+
+    def atualizar_diagnostico(self):
+        """Mostra as consultas que mais somaram tempo (dados em memória, sem ir ao banco)."""
+        self.tree_diag.delete(*self.tree_diag.get_children())
+        self._diag_linhas = {}
+        if db.coletor is None:
+            self.lbl_conexoes.config(text="Instrumentação desligada (DB_INSTRUMENTACAO=0).")
+            return
+
+        for i, r in enumerate(db.coletor.resumo(limite=50)):
+            origem = r["locais"][0][0] if r["locais"] else ""
+            iid = self.tree_diag.insert("", "end", values=(
+                r["sql"][:120], r["chamadas"], f"{r['tempo_total_ms']:.1f}", f"{r['media_ms']:.2f}",
+                f"{r['p95_ms']:.0f}", f"{r['max_ms']:.1f}", r["linhas"], origem))
+            self._diag_linhas[iid] = r
+
+        con = db.coletor.resumo_conexoes()
+        pool = db.estatisticas_backend()
+        vendas = repo.estatisticas_venda()
+        self.lbl_conexoes.config(text=(
+            f"Conexões obtidas: {con['chamadas']} | espera média {con['media_ms']:.2f} ms, "
+            f"máx {con['max_ms']:.1f} ms | backend {pool['backend']}, empréstimos {pool['emprestimos']} | "
+            f"vendas repetidas (deadlock/bloqueio) {vendas['repeticoes']}, desistências {vendas['desistencias']}"))
+
+    def zerar_diagnostico(self):
+        if db.coletor is not None:
+            db.coletor.zerar()
+        repo.zerar_estatisticas_venda()
+        self.atualizar_diagnostico()
+
+    def on_diagnostico_select(self, event):
+        sel = self.tree_diag.selection()
+        r = self._diag_linhas.get(sel[0]) if sel else None
+        if r is None:
+            return
+        self.txt_diag.config(state="normal")
+        self.txt_diag.delete("1.0", "end")
+        self.txt_diag.insert("end", r["sql"] + "\n\nChamado por:\n")
+        for local, qtd in r["locais"]:
+            self.txt_diag.insert("end", f"  {qtd}x {local}\n")
+        faixas = "  ".join(f"{faixa}: {qtd}" for faixa, qtd in r["histograma"].items() if qtd)
+        self.txt_diag.insert("end", f"\nLatência: {faixas}\n")
+        self.txt_diag.config(state="disabled")
+    #endregion